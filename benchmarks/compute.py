@@ -0,0 +1,237 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Measure the time and memory of the local processing paths of the client.
+
+Every case runs on synthetic data of each size: the best time of ``--repeat``
+runs (with the garbage collector paused) and the peak memory of one run traced
+with tracemalloc are recorded. The raster cases use square arrays whose side
+is the size, up to ``MAX_SIDE``. Saved results can be compared with a new run:
+cases slower or using more memory than ``--threshold`` fail the comparison.
+``baselines/compute.json`` holds the results of the default sizes; timings
+depend on the machine, so refresh it on the machine that compares.
+
+Usage::
+
+    python benchmarks/compute.py --sizes 10 1000 10000 --output compute.json
+    python benchmarks/compute.py --compare benchmarks/baselines/compute.json --threshold 0.25
+"""
+import argparse
+import datetime
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from json_backends import synthetic_classes, synthetic_mappings
+
+import lccs
+from lccs.classes import ClassesGroup
+from lccs.mappings import MappingGroup
+from lccs.utils import Utils, json_backend
+
+# Largest side of the square arrays of the raster cases, to keep them within memory.
+MAX_SIDE = 2000
+
+
+def decode_classes(size):
+    """Decode a classes response."""
+    payload = json.dumps(synthetic_classes(size)).encode("utf-8")
+    return lambda: Utils._loads(payload)
+
+
+def classes_group(size):
+    """Build a ClassesGroup and its lookup indexes."""
+    data = synthetic_classes(size)
+
+    def case():
+        group = ClassesGroup({"classes": data})
+        group.get_class(data[-1]["name"], by="name")
+        return group
+    return case
+
+
+def class_lookups(size):
+    """Look up every class of a group by name."""
+    data = synthetic_classes(size)
+    group = ClassesGroup({"classes": data})
+    names = [i["name"] for i in data]
+    return lambda: group.get_classes(names, by="name")
+
+
+def mapping_group(size):
+    """Build a MappingGroup and read its columns."""
+    data = synthetic_mappings(size)
+    return lambda: MappingGroup({"mappings": data}).columns()
+
+
+def similarity_matrix(size):
+    """Build the sparse similarity matrix of a mapping (requires numpy)."""
+    Utils._require("numpy", "numpy")
+    group = MappingGroup({"mappings": synthetic_mappings(size)})
+    return lambda: group.similarity_matrix()
+
+
+def create_sld(size):
+    """Generate a SLD document with one rule per class."""
+    rules = [
+        dict(rule_label=f"Class {i}", fill_color=f"#{i % 0xFFFFFF:06x}", property_literal=i)
+        for i in range(size)
+    ]
+    return lambda: lccs.SldGenerator.create_sld(options={}, rules=rules, layer_name="benchmark")
+
+
+def render_html(size):
+    """Render the first page of a classes group as HTML."""
+    group = ClassesGroup({"classes": synthetic_classes(size)})
+    return lambda: group.html_page()
+
+
+def apply_palette(size):
+    """Colorize a square array of class values with the class colors (requires numpy)."""
+    np = Utils._require("numpy", "numpy")
+    group = ClassesGroup({"classes": synthetic_classes(min(size, 255))})
+    side = min(size, MAX_SIDE)
+    array = np.random.default_rng(0).integers(0, min(size, 255) + 1, (side, side), dtype=np.uint8)
+    return lambda: group.apply_palette(array)
+
+
+def reclassify(size):
+    """Convert a column of source class names to target class names (requires numpy)."""
+    np = Utils._require("numpy", "numpy")
+    classes = ClassesGroup({"classes": synthetic_classes(1000)})
+    group = MappingGroup({"mappings": synthetic_mappings(1000)})
+    names = np.array([i["name"] for i in classes.classes])[np.random.default_rng(0).integers(0, 1000, size)]
+    return lambda: group.reclassify(names, by="name", to="name", source_classes=classes, target_classes=classes)
+
+
+def agreement(size):
+    """Compare two square arrays of class ids through a mapping (requires numpy)."""
+    np = Utils._require("numpy", "numpy")
+    group = MappingGroup({"mappings": synthetic_mappings(250)})
+    rng = np.random.default_rng(0)
+    side = min(size, MAX_SIDE)
+    source = rng.integers(0, 250, (side, side), dtype=np.uint8)
+    target = rng.integers(0, 250, (side, side), dtype=np.uint8)
+    return lambda: group.agreement(source, target)
+
+
+CASES = dict(
+    decode_classes=decode_classes,
+    classes_group=classes_group,
+    class_lookups=class_lookups,
+    mapping_group=mapping_group,
+    similarity_matrix=similarity_matrix,
+    create_sld=create_sld,
+    render_html=render_html,
+    apply_palette=apply_palette,
+    reclassify=reclassify,
+    agreement=agreement,
+)
+
+
+def measure(case, repeat):
+    """Return the best time of ``repeat`` runs and the peak memory of one run."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            case()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(name, size, repeat):
+    """Return the measures of a case, or None if it cannot run here."""
+    try:
+        case = CASES[name](size)
+    except ImportError:
+        return None
+    seconds, peak = measure(case, repeat)
+    return dict(case=name, size=size, seconds=seconds, peak_bytes=peak)
+
+
+def compare(baseline, results, threshold):
+    """Return the regressions of the results against a baseline."""
+    previous = {(r["case"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = previous.get((r["case"], r["size"]))
+        if before is None:
+            continue
+        if r["seconds"] > before["seconds"] * (1 + threshold):
+            regressions.append(f"{r['case']}[{r['size']}]: {before['seconds']:.6f}s -> {r['seconds']:.6f}s")
+        if r["peak_bytes"] > before["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{r['case']}[{r['size']}]: {before['peak_bytes']} -> {r['peak_bytes']} bytes")
+    return regressions
+
+
+def main():
+    """Run the benchmark, save or print the results as JSON and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with this JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Accepted relative increase of time and memory when comparing.")
+    args = parser.parse_args()
+
+    results = [run(name, size, args.repeat) for name in args.cases for size in args.sizes]
+    document = dict(
+        meta=dict(
+            date=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            python=platform.python_version(),
+            machine=platform.machine(),
+            lccs=lccs.__version__,
+            json_backend=json_backend,
+            repeat=args.repeat,
+        ),
+        results=[r for r in results if r is not None],
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(json.load(file), document["results"], args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Compare the JSON backends decoding large synthetic LCCS-WS responses.
+
+Usage::
+
+    python benchmarks/json_backends.py --classes 20000 --mappings 50000
+"""
+import argparse
+import json
+import time
+
+from lccs.utils import _select_json_backend
+
+
+def synthetic_classes(count, url="http://localhost:5000"):
+    """Return a classes response with ``count`` classes."""
+    return [
+        dict(
+            id=i,
+            name=f"class-{i}",
+            code=f"CLASS_{i}",
+            title=f"Classe {i} - Formação Florestal",
+            description="Área com predomínio de vegetação arbórea " * 3,
+            color=f"#{i % 0xFFFFFF:06x}",
+            class_parent_id=i // 10 or None,
+            links=[
+                dict(href=f"{url}/classification_systems/1/classes/{i}", rel="self",
+                     title="Link to this document", type="application/json"),
+                dict(href=f"{url}/classification_systems/1/classes", rel="parent",
+                     title="Link to this document", type="application/json"),
+            ],
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def synthetic_mappings(count, url="http://localhost:5000"):
+    """Return a mappings response with ``count`` mappings."""
+    return [
+        dict(
+            source_class_id=i,
+            target_class_id=i % 997 + 1,
+            degree_of_similarity=(i % 100) / 100,
+            description="alguma descricao",
+            links=[
+                dict(href=f"{url}/classification_systems/1/classes/{i}", rel="item",
+                     title="Link to source class", type="application/json"),
+                dict(href=f"{url}/classification_systems/3/classes/{i % 997 + 1}", rel="item",
+                     title="Link to target class", type="application/json"),
+            ],
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(loads, payload, repeat):
+    """Return the best time of ``repeat`` decodings of the payload."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        loads(payload)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    """Run the benchmark and print the results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", type=int, default=20000)
+    parser.add_argument("--mappings", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = {
+        "classes": json.dumps(synthetic_classes(args.classes)).encode("utf-8"),
+        "mappings": json.dumps(synthetic_mappings(args.mappings)).encode("utf-8"),
+    }
+
+    results = []
+    for backend in ("json", "orjson", "msgspec"):
+        try:
+            name, loads, _ = _select_json_backend(backend)
+        except ImportError:
+            continue
+        for payload_name, payload in payloads.items():
+            seconds = measure(loads, payload, args.repeat)
+            results.append(dict(backend=name, payload=payload_name, bytes=len(payload), seconds=seconds))
+
+    baseline = {r["payload"]: r["seconds"] for r in results if r["backend"] == "json"}
+    for r in results:
+        r["speedup"] = baseline[r["payload"]] / r["seconds"]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
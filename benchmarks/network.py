@@ -0,0 +1,190 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Measure the client workflows end to end against the in-process LCCS-WS emulator.
+
+Each workflow runs with a new client (cold caches) for every catalog size and
+injected latency, and the time, number of requests and bytes received are
+recorded. A workflow making more requests than expected, or more requests
+for a larger catalog (e.g. a new N+1), fails the run. Saved results can be
+compared with a new run: any workflow making more requests than before or
+slower than ``--tolerance`` fails the comparison.
+
+Usage::
+
+    python benchmarks/network.py --classes 10 100 1000 --latency 0 0.005 --output network.json
+    python benchmarks/network.py --compare network.json
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import tempfile
+import time
+
+import lccs
+from lccs.emulator import LCCSEmulator
+from lccs.utils import json_backend
+
+SYSTEM = "system-1-1.0"
+TARGET = "system-2-1.0"
+
+
+def list_systems(service):
+    """List the classification systems."""
+    return service.classification_systems
+
+
+def classes_with_parents(service):
+    """Load the classes of a system and resolve the name of their parents, one class at a time."""
+    classes = service.classification_system(SYSTEM).classes()
+    return [i.class_parent_name for i in classes]
+
+
+def large_mapping(service):
+    """Load the mapping between two systems and read its columns."""
+    return service.mappings(SYSTEM, TARGET).columns()
+
+
+def style_formats(service):
+    """Discover the style formats of a system and download its styles."""
+    formats = service.style_formats(SYSTEM)
+    with tempfile.TemporaryDirectory() as path:
+        return service.get_styles([(SYSTEM, i.name) for i in formats], path=path)
+
+
+def catalog(service):
+    """Prefetch the classes, style formats and mappings of every system."""
+    return service.prefetch()
+
+
+WORKFLOWS = dict(
+    list_systems=list_systems,
+    classes_with_parents=classes_with_parents,
+    large_mapping=large_mapping,
+    style_formats=style_formats,
+    catalog=catalog,
+)
+
+# Requests of the workflows whose count does not depend on the number of systems.
+EXPECTED_REQUESTS = dict(
+    list_systems=1,
+    classes_with_parents=2,
+    large_mapping=1,
+    style_formats=5,
+)
+
+
+def run(workflow, classes, latency, systems, repeat):
+    """Return the best time, the requests and the bytes of a workflow."""
+    best = None
+    with LCCSEmulator(systems=systems, classes=classes, latency=latency) as emulator:
+        for _ in range(repeat):
+            service = lccs.LCCS(emulator.url)
+            emulator.reset_stats()
+            start = time.perf_counter()
+            WORKFLOWS[workflow](service)
+            seconds = time.perf_counter() - start
+            if best is None or seconds < best["seconds"]:
+                best = dict(seconds=seconds, requests=emulator.stats["requests"], bytes=emulator.stats["bytes"])
+    return dict(workflow=workflow, classes=classes, latency=latency, **best)
+
+
+def check_requests(results):
+    """Return the workflows making more requests than expected, or more requests for larger catalogs."""
+    errors = []
+    counts = {}
+    for r in results:
+        expected = EXPECTED_REQUESTS.get(r["workflow"])
+        if expected is not None and r["requests"] > expected:
+            errors.append(f"{r['workflow']} with {r['classes']} classes: {r['requests']} requests, "
+                          f"expected {expected}")
+        counts.setdefault(r["workflow"], set()).add(r["requests"])
+    for workflow, values in counts.items():
+        if len(values) > 1:
+            errors.append(f"{workflow}: the requests grow with the catalog: {sorted(values)}")
+    return errors
+
+
+def compare(baseline, results, tolerance):
+    """Return the regressions of the results against a baseline."""
+    def key(r):
+        return r["workflow"], r["classes"], r["latency"]
+
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        before = previous.get(key(r))
+        if before is None:
+            continue
+        if r["requests"] > before["requests"]:
+            regressions.append(f"{key(r)}: {before['requests']} -> {r['requests']} requests")
+        if r["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append(f"{key(r)}: {before['seconds']:.4f}s -> {r['seconds']:.4f}s")
+    return regressions
+
+
+def main():
+    """Run the benchmark, save or print the results as JSON and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workflows", nargs="+", choices=list(WORKFLOWS), default=list(WORKFLOWS))
+    parser.add_argument("--classes", nargs="+", type=int, default=[10, 100, 1000],
+                        help="Catalog sizes, as classes per system.")
+    parser.add_argument("--latency", nargs="+", type=float, default=[0.0, 0.005],
+                        help="Injected latencies in seconds.")
+    parser.add_argument("--systems", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with this JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Accepted relative slowdown when comparing.")
+    args = parser.parse_args()
+
+    results = [
+        run(workflow, classes, latency, args.systems, args.repeat)
+        for workflow in args.workflows for classes in args.classes for latency in args.latency
+    ]
+    document = dict(
+        meta=dict(
+            date=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            python=platform.python_version(),
+            lccs=lccs.__version__,
+            json_backend=json_backend,
+            systems=args.systems,
+            repeat=args.repeat,
+        ),
+        results=results,
+    )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+
+    regressions = check_requests(results)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions += compare(json.load(file), results, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
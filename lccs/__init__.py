@@ -17,12 +17,18 @@
 #
 """Python Client Library for the LCCS Web Service."""
 from .lccs import LCCS
+from .agreement import Agreement
 from .classification_system import ClassificationSystem
 from . import cli
 from .classes import ClassificationSystemClass
+from .coverage import MappingCoverage
 from .mappings import Mapping, MappingGroup
+from .mapping_graph import MappingGraph
+from .search import ClassSearchIndex
+from .sync import SyncPlan
 from .utils import Utils
 from .style_utils import SldGenerator
+from .style_exporters import StyleExporter
 from .version import __version__
 from .lccs import LCCS
 
@@ -0,0 +1,237 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python Client Library for the LCCS Web Service."""
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from .utils import Utils
+
+
+def _dense_lut(table: Dict[int, int], dtype, missing: int, nodata: Optional[int]):
+    """Return a lookup table from class values to label positions, and whether values must be range checked.
+
+    The last entry of a checked table is ``missing``, used for values outside the table.
+    """
+    np = Utils._require('numpy', 'numpy')
+
+    keys = np.fromiter(table, dtype=np.int64, count=len(table))
+    if len(keys) and keys.min() < 0:
+        raise ValueError(f"Class values must be non-negative integers, got {keys.min()}")
+    size = int(keys.max()) + 1 if len(keys) else 0
+    if nodata is not None and nodata >= 0:
+        size = max(size, nodata + 1)
+
+    # Small unsigned types index a table covering all their values directly.
+    full = dtype.kind == 'u' and dtype.itemsize <= 2
+    lut = np.full((1 << (8 * dtype.itemsize)) if full else size + 1, missing, dtype=np.int32)
+    inside = keys < len(lut) - (0 if full else 1)
+    lut[keys[inside]] = np.fromiter(table.values(), dtype=np.int32, count=len(table))[inside]
+    if nodata is not None and 0 <= nodata < len(lut):
+        lut[nodata] = missing + 1
+    return lut, not full
+
+
+def _positions(lut, checked: bool, tile, nodata: Optional[int], excluded: int):
+    """Return the label positions of a tile of class values, with ``excluded`` for nodata."""
+    np = Utils._require('numpy', 'numpy')
+
+    if checked:
+        outside = len(lut) - 1
+        positions = lut[np.where((tile >= 0) & (tile < outside), tile, outside)]
+    else:
+        positions = lut[tile]
+    if nodata is not None and nodata < 0:
+        positions[tile == nodata] = excluded
+    return positions
+
+
+def _open(array, start: int, stop: int):
+    """Return a picklable reference to the rows ``start:stop`` of an array.
+
+    A ``numpy.memmap`` is referenced by its file, to be mapped again by the
+    worker; other arrays are sliced, so each task only carries its own rows.
+    """
+    np = Utils._require('numpy', 'numpy')
+
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap):
+        order = 'F' if array.flags.f_contiguous and not array.flags.c_contiguous else 'C'
+        return dict(filename=array.filename, dtype=array.dtype.str, shape=array.shape,
+                    offset=array.offset, order=order, start=start, stop=stop)
+    return np.ascontiguousarray(array[start:stop])
+
+
+def _count(luts, references, tile_rows: int, nodata, length: int):
+    """Return the counts of the label pairs of two arrays with the same rows, tile by tile."""
+    np = Utils._require('numpy', 'numpy')
+
+    arrays = [
+        np.memmap(r['filename'], mode='r', dtype=r['dtype'], shape=r['shape'], offset=r['offset'],
+                  order=r['order'])[r['start']:r['stop']]
+        if isinstance(r, dict) else r
+        for r in references
+    ]
+    counts = np.zeros(length * length, dtype=np.int64)
+    for row in range(0, arrays[0].shape[0], tile_rows):
+        end = row + tile_rows
+        source, target = (
+            _positions(lut, checked, np.asarray(array[row:end]), value, length - 1)
+            for (lut, checked), array, value in zip(luts, arrays, nodata)
+        )
+        counts += np.bincount((source * length + target).ravel(), minlength=length * length)
+    return counts
+
+
+class Agreement(dict):
+    """Confusion matrix and agreement of two classified maps harmonized to the same classes.
+
+    ``matrix[i, j]`` is the number of pixels of label ``labels[i]`` in the
+    source map (through the mapping) and ``labels[j]`` in the target map. The
+    last row and column count the pixels without label: source values without
+    mapping and target values that are not labels. Pixels that are nodata in
+    either map are left out.
+    """
+
+    @property
+    def labels(self) -> List[int]:
+        """Return the target class values of the rows and columns of the matrix."""
+        return self['labels']
+
+    @property
+    def matrix(self):
+        """Return the confusion matrix, with a last row and column for pixels without label."""
+        return self['matrix']
+
+    @property
+    def total(self) -> int:
+        """Return the number of compared pixels."""
+        return int(self.matrix.sum())
+
+    @property
+    def overall(self) -> float:
+        """Return the fraction of the pixels with the same label in both maps."""
+        return float(self.matrix.trace() - self.matrix[-1, -1]) / self.total if self.total else 0.0
+
+    @property
+    def kappa(self) -> float:
+        """Return the Cohen's kappa coefficient of the matrix."""
+        total = self.total
+        if not total:
+            return 0.0
+        expected = float((self.matrix.sum(axis=1)[:-1] * self.matrix.sum(axis=0)[:-1]).sum()) / (total * total)
+        return (self.overall - expected) / (1.0 - expected) if expected < 1.0 else 1.0
+
+    def per_class(self) -> List[dict]:
+        """Return, for each label, the pixels in each map, the agreeing pixels, their areas and accuracies.
+
+        ``producers`` is the fraction of the source pixels of the label that
+        agree (recall) and ``users`` the fraction of the target pixels (precision).
+        """
+        np = Utils._require('numpy', 'numpy')
+
+        matrix, area = self.matrix, self['pixel_area']
+        source, target, agree = matrix.sum(axis=1)[:-1], matrix.sum(axis=0)[:-1], np.diagonal(matrix)[:-1]
+        result = []
+        for label, s, t, a in zip(self.labels, source.tolist(), target.tolist(), agree.tolist()):
+            producers = a / s if s else None
+            users = a / t if t else None
+            f1 = 2 * a / (s + t) if s + t else None
+            result.append(dict(label=label, source=s, target=t, agree=a, source_area=s * area,
+                               target_area=t * area, producers=producers, users=users, f1=f1))
+        return result
+
+    def __add__(self, other: 'Agreement') -> 'Agreement':
+        """Return the agreement of the union of the pixels of two agreements with the same labels."""
+        if self.labels != other.labels:
+            raise ValueError("Only agreements with the same labels can be added")
+        return Agreement(self, matrix=self.matrix + other.matrix)
+
+    def report(self) -> str:
+        """Return a human-readable summary of the agreement."""
+        lines = [f"{self.total} pixel(s), overall agreement {self.overall:.4f}, kappa {self.kappa:.4f}"]
+        for i in self.per_class():
+            if i['source'] or i['target']:
+                lines.append(f"{i['label']}: {i['agree']} agree, source {i['source']} / target {i['target']}, "
+                             f"f1 {i['f1']:.4f}")
+        unlabeled = int(self.matrix[-1].sum() + self.matrix[:-1, -1].sum())
+        if unlabeled:
+            lines.append(f"without label: {unlabeled}")
+        return '\n'.join(lines)
+
+    @classmethod
+    def compute(cls, source, target, table: Dict[int, int], labels: Optional[List[int]] = None,
+                nodata=None, pixel_area: float = 1.0, tile_rows: int = 1024,
+                processes: Optional[int] = None) -> 'Agreement':
+        """Compare two aligned arrays of class values with a single counting pass (requires ``numpy``).
+
+        Each tile of ``tile_rows`` rows is converted to label positions with
+        lookup tables and counted with one ``bincount``, so ``source`` and
+        ``target`` can be large ``numpy.memmap`` files that are read tile by tile.
+        With ``processes``, row blocks are counted in worker processes: the
+        memory-mapped files are opened again by the workers, and each block of
+        an in-memory array is sent with its task, so the data is copied once.
+
+        :param source: An integer array of source class values.
+        :param target: An integer array of target class values, with the same shape.
+        :param table: The target class value of each source class value.
+        :param labels: The target class values of the matrix. Default is the sorted values of ``table``.
+        :param nodata: The nodata value of both arrays, or a ``(source, target)`` tuple. Default is None.
+        :param pixel_area: The area of one pixel, to compute the class areas.
+        :param tile_rows: The number of rows of the first axis counted at once.
+        :param processes: The number of worker processes. Default is None, counting in this process.
+        :returns: The agreement.
+        :raises ValueError: If the arrays have different shapes or are not integer arrays.
+        """
+        np = Utils._require('numpy', 'numpy')
+
+        source, target = np.asanyarray(source), np.asanyarray(target)
+        if source.shape != target.shape:
+            raise ValueError(f"The arrays must have the same shape, got {source.shape} and {target.shape}")
+        for array in (source, target):
+            if not np.issubdtype(array.dtype, np.integer):
+                raise ValueError(f"Class values must be integers, got {array.dtype}")
+        if source.ndim == 0:
+            source, target = source.reshape(1), target.reshape(1)
+
+        labels = sorted(set(table.values())) if labels is None else list(labels)
+        positions = {label: i for i, label in enumerate(labels)}
+        missing = len(labels)
+        nodata = nodata if isinstance(nodata, tuple) else (nodata, nodata)
+
+        luts = (
+            _dense_lut({k: positions.get(v, missing) for k, v in table.items()}, source.dtype, missing, nodata[0]),
+            _dense_lut(positions, target.dtype, missing, nodata[1]),
+        )
+        # Two more positions: without label and nodata.
+        length = missing + 2
+        rows, tile_rows = source.shape[0], max(tile_rows, 1)
+
+        if processes and processes > 1 and rows > tile_rows:
+            step = max(tile_rows, -(-rows // (processes * 4)) // tile_rows * tile_rows)
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [
+                    executor.submit(_count, luts, (_open(source, start, stop), _open(target, start, stop)),
+                                    tile_rows, nodata, length)
+                    for start, stop in ((start, min(start + step, rows)) for start in range(0, rows, step))
+                ]
+                counts = sum(f.result() for f in futures)
+        else:
+            counts = _count(luts, (source, target), tile_rows, nodata, length)
+
+        matrix = counts.reshape(length, length)[:-1, :-1]
+        return cls(labels=labels, matrix=matrix, pixel_area=pixel_area)
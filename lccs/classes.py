@@ -16,12 +16,30 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Python Client Library for the LCCS Web Service."""
-from typing import List, Optional
-from .utils import Utils
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .utils import MemoizedDict, Utils
 
+_INDEX_KEYS = ('id', 'name', 'code')
 
-class ClassesGroup(dict):
-    """Group of classification system classes."""
+# Arrow type of each column of the columnar exports.
+_COLUMN_TYPES = {
+    'id': 'int64', 'name': 'string', 'code': 'string', 'title': 'string', 'description': 'string',
+    'color': 'string', 'class_parent_id': 'int64', 'class_parent_name': 'string',
+}
+
+_HTML_COLUMNS = ('id', 'name', 'title', 'code', 'color', 'description', 'class_parent_id', 'class_parent_name')
+
+
+class ClassesGroup(MemoizedDict):
+    """Group of classification system classes.
+
+    The class objects and the lookup indexes are built once and dropped when
+    the group is changed; call ``invalidate()`` after changing the class items
+    in place.
+    """
+
+    # The classes endpoint answers with the classes or with links to them.
+    _schema = 'classes.json'
 
     def __init__(self, data: dict, validate: bool = False) -> None:
         """
@@ -32,22 +50,209 @@ class ClassesGroup(dict):
         """
         super().__init__(data or {})
         self._validate = validate
-        self._classes: List[ClassificationSystemClass] = [
-            ClassificationSystemClass(i, self._validate) for i in self.get('classes', [])
-        ]
+        if validate:
+            Utils.validate_many(self.get('classes', []), self._schema)
 
     @property
     def classes(self) -> List['ClassificationSystemClass']:
         """Return the list of classification system classes."""
-        return self._classes
+        return self._memoized('classes', lambda: [
+            ClassificationSystemClass(i, group=self) for i in self.get('classes', [])
+        ])
+
+    def _index(self, by: str) -> Dict:
+        """Return the hash index of the classes by ``id``, ``name`` or ``code``, built on first use."""
+        if by not in _INDEX_KEYS:
+            raise ValueError(f"Classes can only be looked up by: {', '.join(_INDEX_KEYS)}")
+
+        def build():
+            indexes = {key: {} for key in _INDEX_KEYS}
+            for cls in self.classes:
+                for key in _INDEX_KEYS:
+                    value = cls.get(key)
+                    if value is not None:
+                        indexes[key].setdefault(value, cls)
+            return indexes
+
+        return self._memoized('indexes', build)[by]
+
+    def _lookup(self, key: Union[int, str], by: Optional[str] = None) -> Optional['ClassificationSystemClass']:
+        """Return the class of a key, or None if there is no such class."""
+        if by is not None:
+            return self._index(by).get(int(key) if by == 'id' and isinstance(key, str) and key.isdigit() else key)
+        if isinstance(key, int):
+            return self._index('id').get(key)
+        # Strings are names or codes, even when made of digits: codes such as "3" are not ids.
+        return self._index('name').get(key) or self._index('code').get(key)
+
+    def get_class(self, key: Union[int, str], by: Optional[str] = None) -> 'ClassificationSystemClass':
+        """
+        Return a class by id, name or code, without any request to the service.
+
+        :param key: The class id, name or code.
+        :param by: Look up only by ``id``, ``name`` or ``code``. Default is None: ids for integers, otherwise names and then codes.
+        :return: The classification system class.
+        :raises KeyError: If there is no class for the key.
+        """
+        cls = self._lookup(key, by)
+        if cls is None:
+            raise KeyError(f"Class not found: {key}")
+        return cls
+
+    def get_classes(self, keys: Iterable[Union[int, str]], by: Optional[str] = None,
+                    default=None) -> List[Optional['ClassificationSystemClass']]:
+        """
+        Return the classes of many ids, names or codes.
+
+        :param keys: The class ids, names or codes.
+        :param by: Look up only by ``id``, ``name`` or ``code``. Default is None: ids for integers, otherwise names and then codes.
+        :param default: Value returned for keys without class. Default is None.
+        :return: The classes, in the order of the keys.
+        """
+        result = []
+        for key in keys:
+            cls = self._lookup(key, by)
+            result.append(default if cls is None else cls)
+        return result
+
+    def has_class(self, key: Union[int, str], by: Optional[str] = None) -> bool:
+        """Return whether the group has a class with the given id, name or code."""
+        return self._lookup(key, by) is not None
+
+    def _html_table(self, page: int = 0, page_size: int = 50) -> dict:
+        """Return the context to render one page of the classes as a table."""
+        by_id = self._index('id')
+
+        def row(cls):
+            parent = by_id.get(cls.get('class_parent_id'))
+            return [cls.get(c) for c in _HTML_COLUMNS[:-1]] + [parent.get('name') if parent else None]
+
+        return Utils.html_table(_HTML_COLUMNS, self.get('classes', []), row, page, page_size)
+
+    def html_page(self, page: int = 0, page_size: int = 50) -> str:
+        """
+        Render one page of the classes as HTML, without any request to the service.
+
+        In a notebook, show it with ``IPython.display.HTML(group.html_page(2))``.
+
+        :param page: The page number, starting at 0.
+        :param page_size: The maximum number of rows of the page.
+        """
+        return Utils.render_html('classes.html', **self._html_table(page, page_size))
 
     def _repr_html_(self) -> str:
         """Render HTML representation."""
-        return Utils.render_html('mapping.html', mappings=self)
+        return self.html_page()
+
+    def palette(self, by: str = 'id', fallback: Tuple[int, int, int, int] = (0, 0, 0, 0),
+                size: Optional[int] = None):
+        """
+        Return a dense RGBA lookup table of the class colors (requires ``numpy``).
+
+        Row ``v`` of the table is the color of the class whose ``by`` value is
+        ``v``; values without class, or classes without color, get ``fallback``.
+
+        :param by: The integer class field of the pixel values, ``id`` or ``code``. Default is ``id``.
+        :param fallback: The RGBA color of values without class. Default is transparent.
+        :param size: The number of rows. Default is the greatest class value plus one.
+        :return: A ``uint8`` array of shape ``(size, 4)``.
+        :raises ValueError: If a class value is not a non-negative integer or a color is malformed.
+        """
+        from .style_exporters import hex_to_rgba
+
+        np = Utils._require('numpy', 'numpy')
+
+        colors = {}
+        for cls in self.classes:
+            value, color = cls.get(by), cls.get('color')
+            if value is None or not color:
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Class {cls.get('name')} has a non-integer {by}: {value}")
+            if value < 0:
+                raise ValueError(f"Class {cls.get('name')} has a negative {by}: {value}")
+            colors[value] = hex_to_rgba(color)
+
+        size = size if size is not None else max(colors, default=-1) + 1
+        lut = np.empty((size, 4), dtype=np.uint8)
+        lut[:] = fallback
+        if colors:
+            values = np.fromiter(colors, dtype=np.int64, count=len(colors))
+            rgba = np.array(list(colors.values()), dtype=np.uint8)
+            inside = values < size
+            lut[values[inside]] = rgba[inside]
+        return lut
+
+    def apply_palette(self, array, palette=None, out=None, tile_rows: int = 1024, by: str = 'id',
+                      fallback: Tuple[int, int, int, int] = (0, 0, 0, 0)):
+        """
+        Colorize an array of class values with a lookup table (requires ``numpy``).
+
+        Each tile of ``tile_rows`` rows is colorized with a single indexing
+        operation, so ``array`` and ``out`` can be large ``numpy.memmap`` files
+        that are read and written tile by tile. Values outside the table get ``fallback``.
+
+        :param array: An integer array of class values, e.g. a raster band.
+        :param palette: A lookup table from :meth:`palette`. Default is ``self.palette(by, fallback)``.
+        :param out: An array of shape ``array.shape + (4,)`` and dtype ``uint8`` to write into. Default is a new array.
+        :param tile_rows: The number of rows of the first axis colorized at once.
+        :param by: The class field of the values, used when ``palette`` is None.
+        :param fallback: The RGBA color of values without class.
+        :return: The RGBA array.
+        """
+        np = Utils._require('numpy', 'numpy')
+
+        array = np.asanyarray(array)
+        if not np.issubdtype(array.dtype, np.integer):
+            raise ValueError(f"Class values must be integers, got {array.dtype}")
+        lut = self.palette(by, fallback) if palette is None else np.asarray(palette, dtype=np.uint8)
+
+        # Small unsigned types index a table covering all their values directly.
+        if array.dtype.kind == 'u' and array.dtype.itemsize <= 2:
+            full = np.empty((1 << (8 * array.dtype.itemsize), 4), dtype=np.uint8)
+            full[:] = fallback
+            full[:min(len(lut), len(full))] = lut[:len(full)]
+            lut, checked = full, False
+        else:
+            lut, checked = np.concatenate([lut, np.asarray([fallback], dtype=np.uint8)]), True
+        outside = len(lut) - 1
+
+        if out is None:
+            out = np.empty(array.shape + (4,), dtype=np.uint8)
+        rows, result = (array.reshape(1), out.reshape(1, 4)) if array.ndim == 0 else (array, out)
+
+        for start in range(0, rows.shape[0], max(tile_rows, 1)):
+            tile = np.asarray(rows[start:start + tile_rows])
+            if checked:
+                tile = np.where((tile >= 0) & (tile < outside), tile, outside)
+            np.take(lut, tile, axis=0, out=result[start:start + tile_rows])
+        return out
+
+    def columns(self) -> Dict[str, list]:
+        """
+        Return the values of each class field as lists, read from the raw JSON items.
+
+        The ``class_parent_name`` column is resolved from the parent ids of the group.
+        """
+        items = self.get('classes', [])
+        columns = {name: [i.get(name) for i in items] for name in _COLUMN_TYPES if name != 'class_parent_name'}
+        names = dict(zip(columns['id'], columns['name']))
+        columns['class_parent_name'] = [names.get(i) for i in columns['class_parent_id']]
+        return columns
+
+    def to_arrow(self):
+        """Return the classes as a ``pyarrow.Table`` (requires ``pyarrow``)."""
+        return Utils.arrow_table(self.columns(), _COLUMN_TYPES)
+
+    def to_pandas(self):
+        """Return the classes as a ``pandas.DataFrame`` (requires ``pandas``)."""
+        return Utils.data_frame(self.columns(), _COLUMN_TYPES)
 
     def __repr__(self) -> str:
         """Return the string representation of the group."""
-        return "\n".join([str(cls) for cls in self._classes])
+        return "\n".join([str(cls) for cls in self.classes])
 
     def __str__(self) -> str:
         """Return the string representation of the group (readable)."""
@@ -57,15 +262,21 @@ class ClassesGroup(dict):
 class ClassificationSystemClass(dict):
     """Class representing a classification system."""
 
-    def __init__(self, data: dict, validate: bool = False) -> None:
+    _schema = 'class.json'
+
+    def __init__(self, data: dict, validate: bool = False, group: Optional[ClassesGroup] = None) -> None:
         """
         Initialize instance with dictionary data.
 
         :param data: Dictionary containing class metadata.
         :param validate: Whether to validate the data using jsonschema. Default is False.
+        :param group: The group of the class, used to resolve its parent without requests. Default is None.
         """
         super().__init__(data or {})
         self._validate = validate
+        self._group = group
+        if validate:
+            Utils.validate(self)
 
     @property
     def id(self) -> str:
@@ -87,6 +298,16 @@ class ClassificationSystemClass(dict):
         """Return the class description."""
         return self.get('description')
 
+    @property
+    def titles(self) -> Dict[str, str]:
+        """Return the class title by language, for classes fetched in many languages."""
+        return self.get('titles', {})
+
+    @property
+    def descriptions(self) -> Dict[str, Optional[str]]:
+        """Return the class description by language, for classes fetched in many languages."""
+        return self.get('descriptions', {})
+
     @property
     def color(self) -> Optional[str]:
         """Return the class color."""
@@ -114,6 +335,10 @@ class ClassificationSystemClass(dict):
 
     def _get_parent_name(self) -> Optional[str]:
         """Resolve and return the parent class name, if available."""
+        if self.class_parent_id and self._group is not None:
+            parent = self._group._index('id').get(self.class_parent_id)
+            if parent is not None:
+                return parent.name
         if self.class_parent_id:
             parent_link = next((link for link in self.links if link.get('rel') == 'parent'), None)
             if parent_link:
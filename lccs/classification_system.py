@@ -20,21 +20,28 @@ from typing import Any, List, Optional, Union
 
 from .classes import ClassesGroup, ClassificationSystemClass
 from .link import Link
-from .utils import Utils
+from .utils import MemoizedDict, Utils
 
 
-class ClassificationSystem(dict):
+class ClassificationSystem(MemoizedDict):
     """Representation of a Classification System."""
 
-    def __init__(self, data: dict, validate: bool = False) -> None:
+    _schema = 'classification_system.json'
+
+    def __init__(self, data: dict, validate: bool = False, language: Optional[str] = None) -> None:
         """
         Initialize a classification system with metadata.
 
         :param data: Dictionary containing classification system metadata.
         :param validate: Whether to validate the data using jsonschema. Default is False.
+        :param language: Default language of the classes. Default is the service default.
         """
         super().__init__(data or {})
         self._validate = validate
+        if validate:
+            Utils.validate(self)
+        self._language = language
+        self._classes_groups = {}
 
     @property
     def id(self) -> int:
@@ -58,8 +65,8 @@ class ClassificationSystem(dict):
 
     @property
     def links(self) -> List[Link]:
-        """Return a list of links associated with the classification system."""
-        return [Link(link) for link in self.get('links', [])]
+        """Return a list of links associated with the classification system, built once."""
+        return self._memoized('links', lambda: [Link(link) for link in self.get('links', [])])
 
     @property
     def description(self) -> Optional[str]:
@@ -76,45 +83,95 @@ class ClassificationSystem(dict):
         """Return the authority name of the classification system."""
         return self.get('authority_name')
 
+    def _classes_url(self) -> str:
+        """Return the URL of the classes of the classification system."""
+        try:
+            return next(
+                link['href'] for link in self.get('links', []) if link.get('rel') == 'classes'
+            )
+        except StopIteration:
+            raise ValueError("No 'classes' link found in the classification system.")
+
+    def classes_group(
+        self,
+        style_format_name_or_id: Optional[str] = None,
+        refresh: bool = False,
+        language: Optional[str] = None
+    ) -> ClassesGroup:
+        """
+        Return all classes of the classification system as a group.
+
+        The group is fetched once per style format and language and kept in the classification system.
+
+        :param style_format_name_or_id: Style format ID for filtering classes. Default is None.
+        :param refresh: Fetch the classes again. Default is False.
+        :param language: Language of the titles and descriptions. Default is the classification system language.
+        :return: A group with the classification system classes.
+        """
+        language = language or self._language
+        key = (style_format_name_or_id, language)
+        if key in self._classes_groups and not refresh:
+            return self._classes_groups[key]
+
+        classes_url = self._classes_url()
+
+        params = {}
+        if style_format_name_or_id:
+            params["style_format_id"] = style_format_name_or_id
+        if language:
+            params["language"] = language
+
+        try:
+            classes_data = Utils._get(classes_url, params=params)
+        except Exception as e:
+            raise RuntimeError(f"An error occurred while retrieving classes: {e}")
+
+        group = ClassesGroup({"classes": classes_data}, self._validate)
+        self._classes_groups[key] = group
+        return group
+
     def classes(
         self,
         class_name_or_id: Optional[str] = None,
         style_format_name_or_id: Optional[str] = None
-    ) -> Union[ClassesGroup, ClassificationSystemClass]:
+    ) -> Union[List[ClassificationSystemClass], ClassificationSystemClass]:
         """
         Return the classes of the classification system.
 
+        A single class is taken from the classes already loaded, when possible,
+        instead of being requested to the service.
+
         :param class_name_or_id: Name or ID of a specific class. Default is None.
         :param style_format_name_or_id: Style format ID for filtering classes. Default is None.
-        :return: A group of classes or a specific classification system class.
+        :return: The list of classes or a specific classification system class.
         """
-        try:
-            classes_url = next(
-                link['href'] for link in self.get('links', []) if link.get('rel') == 'classes'
-            )
+        if not class_name_or_id:
+            return self.classes_group(style_format_name_or_id).classes
 
-            params = {}
-            if style_format_name_or_id:
-                params["style_format_id"] = style_format_name_or_id
-
-            classes_data = Utils._get(classes_url, params=params)
+        group = self._classes_groups.get((style_format_name_or_id, self._language))
+        if group is not None and group.has_class(class_name_or_id):
+            return group.get_class(class_name_or_id)
 
-            if class_name_or_id:
-                specific_class_url = f"{classes_url}/{class_name_or_id}"
-                specific_class_data = Utils._get(specific_class_url, params=params)
-                return ClassificationSystemClass(specific_class_data, self._validate)
+        classes_url = self._classes_url()
 
-            all_classes = ClassesGroup({"classes": classes_data})
-            return all_classes.classes
+        params = {}
+        if style_format_name_or_id:
+            params["style_format_id"] = style_format_name_or_id
+        if self._language:
+            params["language"] = self._language
 
-        except StopIteration:
-            raise ValueError("No 'classes' link found in the classification system.")
+        try:
+            specific_class_data = Utils._get(f"{classes_url}/{class_name_or_id}", params=params)
         except Exception as e:
             raise RuntimeError(f"An error occurred while retrieving classes: {e}")
 
+        return ClassificationSystemClass(specific_class_data, self._validate)
+
     def _repr_html_(self) -> str:
         """Render an HTML representation of the classification system."""
-        return Utils.render_html('classification_system.html', classification_system=self)
+        group = self._classes_groups.get((None, self._language))
+        table = group._html_table() if group is not None else dict(rows=None)
+        return Utils.render_html('classification_system.html', classification_system=self, **table)
 
     def __repr__(self) -> str:
         """Return the string representation of the classification system."""
@@ -16,12 +16,15 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Command line interface for the LCCS-WS client."""
+import json
+
 import click
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
 from .lccs import LCCS
+from .local_server import DEFAULT_SOCKET, LocalServer
 
 
 class Config:
@@ -30,17 +33,40 @@ class Config:
     def __init__(self):
         """Initialize of Config decorator."""
         self.url = None
-        self.service = None
         self.access_token = None
         self.language = None
+        self.serving = False
+        self._services = {}
+
+    @property
+    def service(self):
+        """Return the LCCS client of the current options, created on first use."""
+        return self.client(self.url, access_token=self.access_token, language=self.language)
+
+    def client(self, url, access_token=None, language=None):
+        """Return a LCCS client, reusing the one created for the same options."""
+        key = (url, access_token, language)
+        if key not in self._services:
+            self._services[key] = LCCS(url=url, access_token=access_token, language=language)
+        return self._services[key]
 
 
 pass_config = click.make_pass_decorator(Config, ensure=True)
 
+
+class _Group(click.Group):
+    """A click group that keeps its own command line, to forward it to a local server."""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        """Parse the arguments, keeping a copy of them in the context metadata."""
+        ctx = super().make_context(info_name, list(args), parent=parent, **extra)
+        ctx.meta["lccs.args"] = list(args)
+        return ctx
+
 console = Console()
 
 
-@click.group()
+@click.group(cls=_Group)
 @click.option(
     "--url", default="http://127.0.0.1:5000/", help="The LCCS server address (an URL)."
 )
@@ -48,12 +74,35 @@ console = Console()
     "--access-token", default=None, help="Personal Access Token of the BDC Auth"
 )
 @click.option("--language", default="pt-br", help="The language of the response.")
+@click.option(
+    "--local",
+    is_flag=True,
+    default=False,
+    help="Forward the command to a running 'serve-local' process, if any.",
+)
+@click.option(
+    "--local-socket",
+    default=DEFAULT_SOCKET,
+    envvar="LCCS_LOCAL_SOCKET",
+    show_default=True,
+    help="Unix domain socket of the local server.",
+)
 @click.version_option()
-@pass_config
-def cli(config, url, access_token=None, language=None):
+@click.pass_context
+def cli(ctx, url, access_token=None, language=None, local=False, local_socket=None):
     """LCCS-WS Client on command line."""
+    config = ctx.ensure_object(Config)
+
+    if local and not config.serving and ctx.invoked_subcommand != "serve-local":
+        reply = LocalServer.forward(ctx.meta["lccs.args"], local_socket)
+        if reply is not None:
+            click.echo(reply["stdout"], nl=False)
+            click.echo(reply["stderr"], nl=False, err=True)
+            ctx.exit(reply["exit_code"])
+
     config.url = url
-    config.service = LCCS(url=url, access_token=access_token, language=language)
+    config.access_token = access_token
+    config.language = language
 
 
 @cli.command()
@@ -248,6 +297,53 @@ def mappings(config: Config, system_source, system_target, verbose):
         click.secho(f"\t- {retval}", bold=True, fg="green")
 
 
+@cli.command()
+@click.option(
+    "--system-source",
+    type=click.STRING,
+    required=True,
+    help="The classification system source (Identifier by name-version or the ID).",
+)
+@click.option(
+    "--system-target",
+    type=click.STRING,
+    required=True,
+    help="The classification system target (Identifier by name-version or the ID).",
+)
+@click.option(
+    "--snapshot",
+    type=click.Path(exists=True),
+    default=None,
+    help="Read the mapping and the classes from a snapshot file instead of the server. "
+    "Snapshots are pickle files: only use files from a trusted source.",
+)
+@click.option("--json", "as_json", is_flag=True, default=False, help="Print the full coverage as JSON.")
+@click.option("--strict", is_flag=True, default=False,
+              help="Exit with status 1 when there are unmapped source classes, duplicates or dangling ids.")
+@click.option("-v", "--verbose", is_flag=True, default=False)
+@pass_config
+def mapping_coverage(config: Config, system_source, system_target, snapshot, as_json, strict, verbose):
+    """Check the coverage and consistency of a mapping."""
+    service = LCCS.load_snapshot(snapshot, access_token=config.access_token) if snapshot else config.service
+
+    if verbose:
+        click.secho(f"Server: {snapshot or config.url}", bold=True, fg="black")
+        click.secho("\tAnalyzing the mapping ... ", bold=False, fg="black")
+
+    coverage = service.mapping_coverage(system_source, system_target)
+
+    if as_json:
+        click.echo(json.dumps(coverage, indent=2))
+    else:
+        click.secho(coverage.report(), bold=False, fg="black" if coverage.ok else "red")
+
+    if verbose:
+        click.secho("\tFinished!", bold=False, fg="black")
+
+    if strict and not coverage.ok:
+        raise click.exceptions.Exit(1)
+
+
 @cli.command()
 @click.option("-v", "--verbose", is_flag=True, default=False)
 @pass_config
@@ -333,13 +429,8 @@ def style_file(config: Config, system, style_format, output, verbose):
             fg="black",
         )
 
-    if output:
-        config.service.get_style(system=system, style_format=style_format, path=output)
-        click.secho(f"Style file save in {output}", bold=True, fg="green")
-
-    else:
-        config.service.get_style(system=system, style_format=style_format)
-        click.secho(f"Style file save", bold=True, fg="green")
+    file_path = config.service.get_style(system=system, style_format=style_format, path=output)
+    click.secho(f"Style file save in {file_path}", bold=True, fg="green")
 
 
 @cli.command()
@@ -469,6 +560,36 @@ def add_classification_system(config: Config, system_path, verbose):
         click.secho(f"New classification system created", bold=True, fg="green")
 
 
+@cli.command()
+@click.option(
+    "--system_path",
+    type=click.Path(exists=True),
+    required=True,
+    help="Json file with the classification system definition.",
+)
+@click.option(
+    "--system",
+    type=click.STRING,
+    default=None,
+    help="The classification system (Identifier by name-version or ID). Default is name-version of the file.",
+)
+@click.option("--dry-run", is_flag=True, default=False, help="Only show the changes.")
+@click.option("-v", "--verbose", is_flag=True, default=False)
+@pass_config
+def sync_classification_system(config: Config, system_path, system, dry_run, verbose):
+    """Send only the changes of a local classification system definition."""
+    if verbose:
+        click.secho(f"Server: {config.url}", bold=True, fg="black")
+        click.secho("\tComparing the classification system ... ", bold=False, fg="black")
+
+    plan = config.service.sync_classification_system(system_path, system=system, dry_run=dry_run)
+
+    click.secho(plan.report(), bold=False, fg="black")
+
+    if verbose:
+        click.secho("\tFinished!", bold=False, fg="black")
+
+
 @cli.command()
 @click.option(
     "--system",
@@ -614,3 +735,30 @@ def delete_mapping(config: Config, system_source, system_target, verbose):
         config.service.delete_mapping(
             system_source=system_source, system_target=system_target
         )
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    default=DEFAULT_SOCKET,
+    envvar="LCCS_LOCAL_SOCKET",
+    show_default=True,
+    help="Unix domain socket to listen on.",
+)
+@click.option("-v", "--verbose", is_flag=True, default=False)
+@pass_config
+def serve_local(config: Config, socket_path, verbose):
+    """Keep a warm client running and serve the commands sent with --local."""
+    server = LocalServer(socket_path, cli, config)
+
+    if verbose:
+        click.secho(f"Server: {config.url}", bold=True, fg="black")
+    click.secho(f"Listening on {socket_path}", bold=True, fg="green")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
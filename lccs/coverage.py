@@ -0,0 +1,154 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python Client Library for the LCCS Web Service."""
+from typing import List, Optional
+
+from .utils import Utils
+
+
+class MappingCoverage(dict):
+    """Coverage and consistency of the mapping between two classification systems.
+
+    The ``source`` and ``target`` entries have the number of classes and of
+    mapped classes, the ids of the ``unmapped`` classes and the ``dangling``
+    ids (mapped ids without class), and the fan-out (targets per source class)
+    or fan-in (sources per target class), where ``many`` counts the classes
+    mapped more than once. ``duplicates`` lists the pairs mapped more than
+    once as ``[source_id, target_id, count]``, ``many_to_many`` counts the
+    pairs whose source and target are both mapped more than once and
+    ``similarity`` describes the degrees of similarity.
+    """
+
+    @property
+    def source(self) -> dict:
+        """Return the coverage of the source classes."""
+        return self['source']
+
+    @property
+    def target(self) -> dict:
+        """Return the coverage of the target classes."""
+        return self['target']
+
+    @property
+    def duplicates(self) -> List[list]:
+        """Return the pairs mapped more than once, with their count."""
+        return self['duplicates']
+
+    @property
+    def ok(self) -> bool:
+        """Return whether every source class is mapped, without duplicate pairs nor dangling ids."""
+        return not (self.duplicates or self.source['unmapped'] or self.source['dangling']
+                    or self.target['dangling'])
+
+    def report(self) -> str:
+        """Return a human-readable summary of the coverage."""
+        lines = [f"{self['mappings']} mapping(s), {self['pairs']} distinct pair(s)"]
+        for side, fan in (('source', 'fan_out'), ('target', 'fan_in')):
+            info = self[side]
+            classes = '?' if info['classes'] is None else info['classes']
+            lines.append(f"{side}: {info['mapped']} of {classes} class(es) mapped, "
+                         f"{fan} min {info[fan]['min']} / mean {info[fan]['mean']:.2f} / max {info[fan]['max']}")
+            for name in ('unmapped', 'dangling'):
+                if info[name]:
+                    lines.append(f"{side} {name} ({len(info[name])}): {', '.join(map(str, info[name]))}")
+        if self.duplicates:
+            pairs = ', '.join(f'{s}->{t} x{c}' for s, t, c in self.duplicates)
+            lines.append(f"duplicates ({len(self.duplicates)}): {pairs}")
+        lines.append(f"many-to-many pairs: {self['many_to_many']}")
+        similarity = self['similarity']
+        if similarity['count']:
+            lines.append(f"similarity: min {similarity['min']} / mean {similarity['mean']:.2f} / "
+                         f"max {similarity['max']}, {similarity['missing']} missing")
+        return '\n'.join(lines)
+
+    @classmethod
+    def compute(cls, mappings: List[dict], source_classes: Optional[List[dict]] = None,
+                target_classes: Optional[List[dict]] = None, bins: int = 10) -> 'MappingCoverage':
+        """Analyze the raw mapping items and classes with array operations (requires ``numpy``).
+
+        :param mappings: The mapping items, with ``source_class_id``, ``target_class_id``
+            and optionally ``degree_of_similarity``.
+        :param source_classes: The classes of the source system. Without them the
+            unmapped and dangling source ids are not computed (None).
+        :param target_classes: The classes of the target system, likewise.
+        :param bins: The number of bins of the histogram of the degrees of similarity, between 0 and 1.
+        :returns: The coverage.
+        """
+        np = Utils._require('numpy', 'numpy')
+
+        count = len(mappings)
+        sources = np.fromiter((i['source_class_id'] for i in mappings), dtype=np.int64, count=count)
+        targets = np.fromiter((i['target_class_id'] for i in mappings), dtype=np.int64, count=count)
+        degrees = np.fromiter(
+            (np.nan if i.get('degree_of_similarity') is None else i['degree_of_similarity'] for i in mappings),
+            dtype=np.float64, count=count,
+        )
+
+        pairs, pair_counts = np.unique(np.stack([sources, targets], axis=1), axis=0, return_counts=True)
+        pair_sources, pair_targets = pairs[:, 0], pairs[:, 1]
+        mapped_sources, fan_out = np.unique(pair_sources, return_counts=True)
+        mapped_targets, fan_in = np.unique(pair_targets, return_counts=True)
+
+        # A pair is many-to-many when its source has other targets and its target other sources.
+        many_sources = mapped_sources[fan_out > 1]
+        many_targets = mapped_targets[fan_in > 1]
+        many_to_many = np.isin(pair_sources, many_sources) & np.isin(pair_targets, many_targets)
+
+        def side(mapped, fan, classes):
+            info = dict(classes=None, mapped=len(mapped), unmapped=None, dangling=None, coverage=None)
+            if classes is not None:
+                ids = np.fromiter((i['id'] for i in classes), dtype=np.int64, count=len(classes))
+                covered = np.isin(ids, mapped)
+                info.update(
+                    classes=len(ids),
+                    mapped=int(covered.sum()),
+                    unmapped=ids[~covered].tolist(),
+                    dangling=np.setdiff1d(mapped, ids).tolist(),
+                    coverage=float(covered.mean()) if len(ids) else 1.0,
+                )
+            if not len(fan):
+                return info, dict(min=0, max=0, mean=0.0, median=0.0, many=0)
+            return info, dict(min=int(fan.min()), max=int(fan.max()), mean=float(fan.mean()),
+                              median=float(np.median(fan)), many=int((fan > 1).sum()))
+
+        source, source_stats = side(mapped_sources, fan_out, source_classes)
+        target, target_stats = side(mapped_targets, fan_in, target_classes)
+        source['fan_out'], target['fan_in'] = source_stats, target_stats
+
+        present = degrees[~np.isnan(degrees)]
+        histogram, edges = np.histogram(present.clip(0.0, 1.0), bins=bins, range=(0.0, 1.0))
+        similarity = dict(
+            count=len(present),
+            missing=int(count - len(present)),
+            min=float(present.min()) if len(present) else None,
+            max=float(present.max()) if len(present) else None,
+            mean=float(present.mean()) if len(present) else None,
+            histogram=histogram.tolist(),
+            edges=edges.tolist(),
+        )
+
+        duplicated = pair_counts > 1
+        return cls(
+            mappings=count,
+            pairs=len(pairs),
+            source=source,
+            target=target,
+            duplicates=np.column_stack([pairs[duplicated], pair_counts[duplicated]]).tolist(),
+            many_to_many=int(many_to_many.sum()),
+            similarity=similarity,
+        )
@@ -0,0 +1,493 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""In-process LCCS-WS emulator for offline tests and benchmarks."""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from .utils import Utils
+
+_STYLE_FORMATS = ('SLD-Feature-Polygon', 'QML', 'SLD-Raster', 'Mapbox-GL')
+
+
+class LCCSEmulator(httpx.BaseTransport):
+    """HTTP transport answering the LCCS-WS routes from generated data, without network.
+
+    The catalog has ``systems`` classification systems with ``classes`` classes
+    each (about a tenth of them are parents of the others), ``styles`` styles per
+    system and mappings from each system to the ``mappings`` next ones. Writes
+    (``POST``, ``PUT`` and ``DELETE``) change the catalog in memory.
+
+    Latency, errors and throttling can be injected to reproduce a remote
+    service, and ``stats`` counts the requests and bytes served::
+
+        with LCCSEmulator(systems=20, classes=500, latency=0.02) as emulator:
+            service = LCCS(emulator.url)
+            service.classification_system('system-1-1.0').classes()
+
+    :param url: The base URL of the emulated service.
+    :param systems: The number of classification systems.
+    :param classes: The number of classes of each system.
+    :param mappings: The number of target systems mapped from each system.
+    :param styles: The number of styles of each system.
+    :param languages: The supported languages; the first one is the default.
+    :param latency: Seconds added to every response.
+    :param jitter: Maximum random seconds added to the latency.
+    :param error_rate: Probability of answering ``503 Service Unavailable``.
+    :param rate_limit: Maximum requests per second, answered with ``429 Too Many Requests`` above it.
+    :param seed: Seed of the generated data and of the injected errors.
+    """
+
+    def __init__(self, url: str = 'http://lccs.emulator', systems: int = 5, classes: int = 50,
+                 mappings: int = 2, styles: int = 2, languages: Sequence[str] = ('pt-br', 'en'),
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[float] = None, seed: int = 0) -> None:
+        """Generate the catalog of the emulated service."""
+        self.url = url.rstrip('/')
+        self.languages = list(languages)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.stats = Counter()
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._window = (0.0, 0)
+        self._base_path = httpx.URL(self.url).path.rstrip('/')
+        self._routes = self._build_routes()
+
+        self._systems: Dict[int, dict] = {}
+        self._classes: Dict[int, Dict[int, dict]] = {}
+        self._style_formats: Dict[int, str] = dict(enumerate(_STYLE_FORMATS, start=1))
+        self._styles: Dict[Tuple[int, int], Tuple[str, bytes]] = {}
+        self._mappings: Dict[Tuple[int, int], List[dict]] = {}
+        self._next_class_id = 1
+
+        for number in range(1, systems + 1):
+            system = self._create_system(dict(name=f'system-{number}', version='1.0',
+                                              title=f'System {number}', authority_name='LCCS Emulator'))
+            self._create_classes(system['id'], [
+                dict(name=f'class-{number}-{i}', code=f'C{i}', title=f'Class {i}', description=f'Class {i} of system {number}',
+                     color=f'#{self._random.randrange(0x1000000):06x}',
+                     class_parent_name=f'class-{number}-{i % max(classes // 10, 1)}' if i >= max(classes // 10, 1) else None)
+                for i in range(classes)
+            ])
+            for format_id in list(self._style_formats)[:styles]:
+                self._styles[(system['id'], format_id)] = (f'system-{number}.sld', self._style_content(system, format_id))
+
+        for source in self._systems:
+            for offset in range(1, min(mappings, systems - 1) + 1):
+                target = (source - 1 + offset) % systems + 1
+                target_ids = list(self._classes[target])
+                self._mappings[(source, target)] = [
+                    dict(source_class_id=class_id, target_class_id=self._random.choice(target_ids),
+                         degree_of_similarity=round(self._random.random(), 2), description=None)
+                    for class_id in self._classes[source]
+                ]
+
+    def __enter__(self) -> 'LCCSEmulator':
+        """Send the requests of the shared HTTP client to the emulator."""
+        Utils.configure_client(transport=self)
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Restore the default HTTP client."""
+        Utils.configure_client()
+
+    def reset_stats(self) -> None:
+        """Clear the request and byte counters."""
+        with self._lock:
+            self.stats.clear()
+
+    # Catalog
+
+    def _create_system(self, info: dict) -> dict:
+        """Add a classification system to the catalog."""
+        system_id = max(self._systems, default=0) + 1
+        system = dict(id=system_id, name=info['name'], version=str(info.get('version', '1.0')),
+                      identifier=f"{info['name']}-{info.get('version', '1.0')}", title=info.get('title', info['name']),
+                      description=info.get('description', ''), authority_name=info.get('authority_name', ''))
+        self._systems[system_id] = system
+        self._classes[system_id] = {}
+        return system
+
+    def _create_classes(self, system_id: int, items: List[dict]) -> List[dict]:
+        """Add classes to a classification system, resolving ``class_parent_name``."""
+        classes = self._classes[system_id]
+        created = []
+        for item in items:
+            cls = dict(id=self._next_class_id, name=item['name'], code=item.get('code'), title=item.get('title'),
+                       description=item.get('description'), color=item.get('color'), class_parent_id=None)
+            self._next_class_id += 1
+            classes[cls['id']] = cls
+            created.append((cls, item))
+        for cls, item in created:
+            self._update_class(system_id, cls, item)
+        return [cls for cls, _ in created]
+
+    def _update_class(self, system_id: int, cls: dict, item: dict) -> None:
+        """Change the fields of a class."""
+        for key in ('name', 'code', 'title', 'description', 'color', 'class_parent_id'):
+            if key in item:
+                cls[key] = item[key]
+        if item.get('class_parent_name') is not None:
+            parent = self._find_class(system_id, item['class_parent_name'])
+            cls['class_parent_id'] = parent['id'] if parent else None
+
+    def _style_content(self, system: dict, format_id: int) -> bytes:
+        """Return a generated style document."""
+        rules = ''.join(f'<Rule><Name>{c["name"]}</Name><Fill>{c["color"]}</Fill></Rule>'
+                        for c in self._classes[system['id']].values())
+        return f'<Style format="{self._style_formats[format_id]}">{rules}</Style>'.encode('utf-8')
+
+    def _find_system(self, key: str) -> Optional[dict]:
+        """Return a classification system by id or identifier."""
+        if str(key).isdigit():
+            return self._systems.get(int(key))
+        return next((i for i in self._systems.values() if i['identifier'] == key), None)
+
+    def _find_class(self, system_id: int, key: str) -> Optional[dict]:
+        """Return a class by id or name."""
+        classes = self._classes[system_id]
+        if str(key).isdigit() and int(key) in classes:
+            return classes[int(key)]
+        return next((i for i in classes.values() if i['name'] == key), None)
+
+    def _find_style_format(self, key: str) -> Optional[int]:
+        """Return the id of a style format given by id or name."""
+        if str(key).isdigit() and int(key) in self._style_formats:
+            return int(key)
+        return next((k for k, v in self._style_formats.items() if v == key), None)
+
+    # Documents
+
+    def _link(self, path: str, rel: str, title: str, media_type: str = 'application/json') -> dict:
+        return dict(href=f'{self.url}{path}', rel=rel, title=title, type=media_type)
+
+    def _translate(self, text: Optional[str], language: str) -> Optional[str]:
+        """Return a text in a language; the non-default languages are suffixed with the language."""
+        if text is None or language == self.languages[0]:
+            return text
+        return f'{text} ({language})'
+
+    def _system_document(self, system: dict, language: str, full: bool = True) -> dict:
+        document = dict(system, title=self._translate(system['title'], language),
+                        description=self._translate(system['description'], language))
+        links = [self._link(f"/classification_systems/{system['id']}", 'self', 'Link to this document')]
+        if full:
+            links += [
+                self._link(f"/classification_systems/{system['id']}/classes", 'classes', 'Link to classification system classes'),
+                self._link(f"/classification_systems/{system['id']}/style_formats", 'style_formats', 'Link to style formats'),
+                self._link('/classification_systems', 'parent', 'Link to classification systems'),
+                self._link('/', 'root', 'API landing page'),
+            ]
+        else:
+            del document['authority_name']
+        document['links'] = links
+        return document
+
+    def _class_document(self, system_id: int, cls: dict, language: str) -> dict:
+        document = dict(cls, title=self._translate(cls['title'], language),
+                        description=self._translate(cls['description'], language))
+        document['links'] = [
+            self._link(f"/classification_systems/{system_id}/classes/{cls['id']}", 'self', 'Link to this document'),
+            self._link(f'/classification_systems/{system_id}/classes', 'parent', 'Link to this document'),
+        ]
+        return document
+
+    def _style_format_document(self, format_id: int) -> dict:
+        return dict(id=format_id, name=self._style_formats[format_id],
+                    links=[self._link(f'/style_formats/{format_id}', 'self', 'Link to this document')])
+
+    def _mapping_document(self, source: int, target: int, item: dict) -> dict:
+        return dict(item, links=[
+            self._link(f"/classification_systems/{source}/classes/{item['source_class_id']}", 'item', 'Link to source class'),
+            self._link(f"/classification_systems/{target}/classes/{item['target_class_id']}", 'item', 'Link to target class'),
+            self._link(f'/mappings/{source}/{target}', 'self', 'Link to this document'),
+        ])
+
+    # Routes
+
+    def _build_routes(self) -> List[Tuple[str, re.Pattern, Callable]]:
+        routes = [
+            ('GET', r'/', self._root),
+            ('GET', r'/classification_systems', self._list_systems),
+            ('POST', r'/classification_systems', self._post_system),
+            ('GET', r'/classification_systems/(?P<system>[^/]+)', self._get_system),
+            ('DELETE', r'/classification_systems/(?P<system>[^/]+)', self._delete_system),
+            ('GET', r'/classification_systems/(?P<system>[^/]+)/classes', self._list_classes),
+            ('POST', r'/classification_systems/(?P<system>[^/]+)/classes', self._post_classes),
+            ('GET', r'/classification_systems/(?P<system>[^/]+)/classes/(?P<cls>[^/]+)', self._get_class),
+            ('PUT', r'/classification_systems/(?P<system>[^/]+)/classes/(?P<cls>[^/]+)', self._put_class),
+            ('DELETE', r'/classification_systems/(?P<system>[^/]+)/classes/(?P<cls>[^/]+)', self._delete_class),
+            ('GET', r'/classification_systems/(?P<system>[^/]+)/style_formats', self._system_style_formats),
+            ('POST', r'/classification_systems/(?P<system>[^/]+)/styles', self._post_style),
+            ('GET', r'/classification_systems/(?P<system>[^/]+)/styles/(?P<style_format>[^/]+)', self._get_style),
+            ('DELETE', r'/classification_systems/(?P<system>[^/]+)/styles/(?P<style_format>[^/]+)', self._delete_style),
+            ('GET', r'/style_formats', self._list_style_formats),
+            ('POST', r'/style_formats', self._post_style_format),
+            ('GET', r'/style_formats/search/(?P<name>[^/]+)', self._search_style_format),
+            ('GET', r'/style_formats/(?P<style_format>[^/]+)', self._get_style_format),
+            ('DELETE', r'/style_formats/(?P<style_format>[^/]+)', self._delete_style_format),
+            ('GET', r'/mappings/(?P<system>[^/]+)', self._list_mappings),
+            ('GET', r'/mappings/(?P<source>[^/]+)/(?P<target>[^/]+)', self._get_mappings),
+            ('POST', r'/mappings/(?P<source>[^/]+)/(?P<target>[^/]+)', self._post_mappings),
+            ('DELETE', r'/mappings/(?P<source>[^/]+)/(?P<target>[^/]+)', self._delete_mappings),
+        ]
+        return [(method, re.compile(pattern + '/?$'), handler) for method, pattern, handler in routes]
+
+    @staticmethod
+    def _json(data, status_code: int = 200) -> httpx.Response:
+        return httpx.Response(status_code, content=json.dumps(data).encode('utf-8'),
+                              headers={'content-type': 'application/json'})
+
+    @classmethod
+    def _error(cls, status_code: int, description: str) -> httpx.Response:
+        return cls._json(dict(code=status_code, description=description), status_code)
+
+    def _system_or_404(self, key: str) -> dict:
+        system = self._find_system(key)
+        if system is None:
+            raise LookupError(f'Classification system not found: {key}')
+        return system
+
+    def _root(self, request, language):
+        return self._json(dict(
+            application_name='Land Cover Classification System Service', lccs_version='1.0.0',
+            links=[self._link('/', 'self', 'Link to this document'),
+                   self._link('/classification_systems', 'classification_systems', 'Information about Classification Systems'),
+                   self._link('/style_formats', 'style_formats', 'Information about Style Formats')],
+            supported_language=[dict(language=i, description=i) for i in self.languages],
+        ))
+
+    def _list_systems(self, request, language):
+        return self._json([self._system_document(i, language, full=False) for i in self._systems.values()])
+
+    def _post_system(self, request, language):
+        payload = json.loads(request.content)
+        system = self._create_system(payload.get('classification_system', payload))
+        self._create_classes(system['id'], payload.get('classes', []))
+        return self._json(self._system_document(system, language), 201)
+
+    def _get_system(self, request, language, system):
+        return self._json(self._system_document(self._system_or_404(system), language))
+
+    def _delete_system(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        del self._systems[system_id], self._classes[system_id]
+        self._styles = {k: v for k, v in self._styles.items() if k[0] != system_id}
+        self._mappings = {k: v for k, v in self._mappings.items() if system_id not in k}
+        return httpx.Response(204)
+
+    def _list_classes(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        return self._json([self._class_document(system_id, i, language) for i in self._classes[system_id].values()])
+
+    def _post_classes(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        payload = json.loads(request.content)
+        created = self._create_classes(system_id, payload if isinstance(payload, list) else [payload])
+        return self._json([self._class_document(system_id, i, language) for i in created], 201)
+
+    def _class_or_404(self, system: str, key: str) -> Tuple[int, dict]:
+        system_id = self._system_or_404(system)['id']
+        cls = self._find_class(system_id, key)
+        if cls is None:
+            raise LookupError(f'Class not found: {key}')
+        return system_id, cls
+
+    def _get_class(self, request, language, system, cls):
+        system_id, found = self._class_or_404(system, cls)
+        return self._json(self._class_document(system_id, found, language))
+
+    def _put_class(self, request, language, system, cls):
+        system_id, found = self._class_or_404(system, cls)
+        self._update_class(system_id, found, json.loads(request.content))
+        return self._json(self._class_document(system_id, found, language))
+
+    def _delete_class(self, request, language, system, cls):
+        system_id, found = self._class_or_404(system, cls)
+        if any(i.get('class_parent_id') == found['id'] for i in self._classes[system_id].values()):
+            return self._error(409, f"Class {found['name']} is the parent of other classes.")
+        del self._classes[system_id][found['id']]
+        return httpx.Response(204)
+
+    def _system_style_formats(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        links = [self._link(f'/style_formats/{format_id}', 'style', 'Link to style format')
+                 for (style_system, format_id) in self._styles if style_system == system_id]
+        return self._json(links + [self._link(f'/classification_systems/{system_id}', 'parent', 'Link to classification system')])
+
+    def _post_style(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        body = b'content-type: ' + request.headers['content-type'].encode('latin-1') + b'\r\n\r\n' + request.read()
+        fields, files = {}, {}
+        for part in BytesParser(policy=HTTP).parsebytes(body).iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if part.get_filename():
+                files[name] = (part.get_filename(), part.get_payload(decode=True))
+            else:
+                fields[name] = part.get_content().strip()
+        format_id = self._find_style_format(fields.get('style_format', ''))
+        if format_id is None or 'style' not in files:
+            return self._error(400, 'A style file and a valid style format are required.')
+        self._styles[(system_id, format_id)] = files['style']
+        return self._json(dict(message='Style added!'), 201)
+
+    def _get_style(self, request, language, system, style_format):
+        system_id = self._system_or_404(system)['id']
+        key = (system_id, self._find_style_format(style_format))
+        if key not in self._styles:
+            raise LookupError(f'Style not found: {style_format}')
+        file_name, content = self._styles[key]
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        if request.headers.get('if-none-match') == etag:
+            return httpx.Response(304, headers={'etag': etag})
+        return httpx.Response(200, content=content, headers={
+            'content-type': 'application/octet-stream', 'etag': etag,
+            'content-disposition': f'attachment; filename="{file_name}"',
+        })
+
+    def _delete_style(self, request, language, system, style_format):
+        system_id = self._system_or_404(system)['id']
+        if self._styles.pop((system_id, self._find_style_format(style_format)), None) is None:
+            raise LookupError(f'Style not found: {style_format}')
+        return httpx.Response(204)
+
+    def _list_style_formats(self, request, language):
+        return self._json([
+            dict(self._style_format_document(i), links=[self._link(f'/style_formats/{i}', 'items', 'Link to style format')])
+            for i in self._style_formats
+        ])
+
+    def _post_style_format(self, request, language):
+        format_id = max(self._style_formats, default=0) + 1
+        self._style_formats[format_id] = json.loads(request.content)['name']
+        return self._json(self._style_format_document(format_id), 201)
+
+    def _search_style_format(self, request, language, name):
+        format_id = self._find_style_format(name)
+        if format_id is None:
+            raise LookupError(f'Style format not found: {name}')
+        return self._json(self._style_format_document(format_id))
+
+    def _get_style_format(self, request, language, style_format):
+        format_id = self._find_style_format(style_format)
+        if format_id is None:
+            raise LookupError(f'Style format not found: {style_format}')
+        return self._json(self._style_format_document(format_id))
+
+    def _delete_style_format(self, request, language, style_format):
+        format_id = self._find_style_format(style_format)
+        if format_id is None:
+            raise LookupError(f'Style format not found: {style_format}')
+        del self._style_formats[format_id]
+        self._styles = {k: v for k, v in self._styles.items() if k[1] != format_id}
+        return httpx.Response(204)
+
+    def _list_mappings(self, request, language, system):
+        system_id = self._system_or_404(system)['id']
+        links = [self._link(f'/mappings/{source}/{target}', 'child', 'Mapping')
+                 for source, target in self._mappings if source == system_id]
+        return self._json(links + [self._link('/', 'root', 'API landing page')])
+
+    def _get_mappings(self, request, language, source, target):
+        key = (self._system_or_404(source)['id'], self._system_or_404(target)['id'])
+        if key not in self._mappings:
+            raise LookupError(f'Mapping not found: {source} -> {target}')
+        return self._json([self._mapping_document(*key, i) for i in self._mappings[key]])
+
+    def _post_mappings(self, request, language, source, target):
+        key = (self._system_or_404(source)['id'], self._system_or_404(target)['id'])
+        items = [dict(source_class_id=i['source_class_id'], target_class_id=i['target_class_id'],
+                      degree_of_similarity=i.get('degree_of_similarity'), description=i.get('description'))
+                 for i in json.loads(request.content)]
+        self._mappings[key] = items
+        return self._json([self._mapping_document(*key, i) for i in items], 201)
+
+    def _delete_mappings(self, request, language, source, target):
+        key = (self._system_or_404(source)['id'], self._system_or_404(target)['id'])
+        if self._mappings.pop(key, None) is None:
+            raise LookupError(f'Mapping not found: {source} -> {target}')
+        return httpx.Response(204)
+
+    # Transport
+
+    def _throttled(self) -> bool:
+        """Count a request in the current one-second window and return whether it is over the rate limit."""
+        now = time.monotonic()
+        start, count = self._window
+        if now - start >= 1.0:
+            start, count = now, 0
+        self._window = (start, count + 1)
+        return count + 1 > self.rate_limit
+
+    def _dispatch(self, request: httpx.Request) -> httpx.Response:
+        """Return the response of the route of a request."""
+        path = request.url.path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path):]
+        language = request.url.params.get('language') or self.languages[0]
+
+        allowed = False
+        for method, pattern, handler in self._routes:
+            match = pattern.match(path or '/')
+            if match is None:
+                continue
+            allowed = True
+            if method == request.method:
+                try:
+                    return handler(request, language, **match.groupdict())
+                except LookupError as e:
+                    return self._error(404, str(e))
+                except (KeyError, TypeError, ValueError) as e:
+                    return self._error(400, f'Invalid request: {e}')
+        if allowed:
+            return self._error(405, f'Method not allowed: {request.method}')
+        return self._error(404, f'Not found: {path}')
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Answer a request of the httpx client."""
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats[request.method] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.rate_limit is not None and self._throttled():
+                self.stats['throttled'] += 1
+                response = httpx.Response(429, headers={'retry-after': '1'}, json=dict(code=429, description='Too many requests'))
+            elif self.error_rate and self._random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                response = self._error(503, 'Service unavailable')
+            else:
+                response = self._dispatch(request)
+            body = response.read()
+            self.stats['bytes'] += len(body)
+
+        if delay:
+            time.sleep(delay)
+        return response
@@ -16,18 +16,47 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Python API client wrapper for LCCS-WS."""
-import enum
 import json
-from typing import List
-
-from cachetools import LRUCache, cached
-
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+from cachetools import LRUCache, cachedmethod
+from cachetools.keys import hashkey
+from jsonschema import ValidationError
+
+from .classes import _COLUMN_TYPES as _CLASS_COLUMNS
+from .classes import ClassesGroup
 from .classification_system import ClassificationSystem
+from .coverage import MappingCoverage
+from .mapping_graph import MappingGraph
+from .mappings import _COLUMN_TYPES as _MAPPING_COLUMNS
 from .mappings import MappingGroup
+from .search import ClassSearchIndex
+from .style_exporters import StyleExporter
 from .style_formats import StyleFormats
 from .style_utils import SldGenerator
+from .sync import SyncPlan
 from .utils import Utils
 
+# Fields of the service responses that change with the language.
+_TRANSLATED_FIELDS = ("title", "description")
+
+# Methods whose responses are kept in the method caches of each client, by arguments.
+_CACHED_METHODS = ("classification_system", "available_mappings", "mappings", "compose_mappings", "style_formats")
+
+# Initial number of responses kept by each method cache; prefetch grows them to the catalog.
+_CACHE_SIZE = 128
+
+
+def _method_cache(name):
+    """Cache the responses of a client method in the LRU cache of that client and method."""
+    return cachedmethod(lambda self: self._caches[name], lock=lambda self: self._cache_lock)
+
 
 class LCCS:
     """This class implements a Python API client wrapper for LCCS-WS.
@@ -44,46 +73,63 @@ class LCCS:
         self._url = url.rstrip("/")
         self._validate = validate
         self._classification_systems = {}
+        self._mapping_graph = None
+        self._systems = None
         self._access_token = access_token if access_token else ""
-        self._support_l = self._support_language()
+        self._init_caches()
+        self._languages = self._support_language()
         self._language = (
             self._validate_language(language) if language else None
         )  # Apenas o código, ex: 'en'
 
+    def _init_caches(self):
+        """Create the empty method caches of the client."""
+        self._cache_lock = threading.RLock()
+        self._caches = {name: LRUCache(maxsize=_CACHE_SIZE) for name in _CACHED_METHODS}
+
+    def _grow_caches(self, **sizes):
+        """Make the method caches hold at least the given number of responses, keeping their entries."""
+        with self._cache_lock:
+            for name, size in sizes.items():
+                cache = self._caches[name]
+                if size > cache.maxsize:
+                    grown = LRUCache(maxsize=size)
+                    grown.update(cache.items())
+                    self._caches[name] = grown
+
     def _support_language(self):
         """Get the support language from service."""
-        import enum
-
         data = Utils._get(f"{self._url}/", access_token=self._access_token)
-        return enum.Enum(
-            "Language",
-            {i["language"]: i["language"] for i in data["supported_language"]},
-            type=str,
-        )
+        return tuple(i["language"] for i in data["supported_language"])
 
     def _validate_language(self, language):
         """Validate and return language code."""
-        if language in [e.value for e in self._support_l]:
+        if language in self._languages:
             return language
         else:
             s = ", ".join(self.allowed_language)
             raise KeyError(f"Language not supported! Use: {s}")
 
+    def _params(self):
+        """Return the query parameters of the client language, if one was set."""
+        return {"language": self._language} if self._language else None
+
     def _get_format_identifier(self, name):
         url = f"{self._url}/style_formats/search/{name}"
-        data = Utils._get(url)
+        data = Utils._get(url, access_token=self._access_token, params=self._params())
         return data
 
     def _get_classification_systems(self):
         """Return the Classification Systems available in service."""
         url = f"{self._url}/classification_systems"
-        params = {"language": self._language} if self._language else None
+        params = self._params()
         data = Utils._get(url, access_token=self._access_token, params=params)
         result = []
         for i in data:
             result.append(
                 dict(identifier=i["identifier"], title=i["title"], version=i["version"])
             )
+        self._systems = result
         return result
 
     def _id(self, system_name: str):
@@ -99,7 +145,7 @@ class LCCS:
     @property
     def allowed_language(self):
         """Retrieve a list of languages allowed by the service."""
-        return [e.value for e in self._support_l]
+        return list(self._languages)
 
     @property
     def classification_systems(self):
@@ -110,7 +156,83 @@ class LCCS:
         """
         return self._get_classification_systems()
 
-    @cached(cache=LRUCache(maxsize=128))
+    @staticmethod
+    def _merge_languages(responses: Dict[str, List[dict]], key: str = "id") -> List[dict]:
+        """Merge the items of the same response in many languages.
+
+        Each item keeps the fields of the first language, plus ``titles`` and
+        ``descriptions`` with the translated fields by language.
+        """
+        languages = list(responses)
+        translations = {
+            language: {i[key]: i for i in responses[language]} for language in languages
+        }
+
+        result = []
+        for item in responses[languages[0]]:
+            merged = dict(item)
+            for field in _TRANSLATED_FIELDS:
+                merged[f"{field}s"] = {
+                    language: translations[language].get(item[key], {}).get(field)
+                    for language in languages
+                }
+            result.append(merged)
+        return result
+
+    def classification_systems_languages(
+        self, languages: Optional[Iterable[str]] = None
+    ) -> List[dict]:
+        """Retrieve the classification systems in many languages at once.
+
+        The lists in each language are fetched concurrently and merged by system.
+
+        :param languages: Languages to fetch. Default is all languages allowed by the service.
+        :type languages: list
+
+        :returns: The classification systems, with ``titles`` and ``descriptions`` by language.
+        :rtype: list
+        """
+        languages = list(languages or self.allowed_language)
+        url = f"{self._url}/classification_systems"
+
+        def fetch(language):
+            return Utils._get(url, access_token=self._access_token, params={"language": language})
+
+        with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+            responses = dict(zip(languages, executor.map(fetch, languages)))
+
+        return self._merge_languages(responses)
+
+    def classes_languages(
+        self, system: str, languages: Optional[Iterable[str]] = None
+    ) -> ClassesGroup:
+        """Retrieve the classes of a classification system in many languages at once.
+
+        The classes in each language are fetched concurrently and merged by id.
+
+        :param system: The id or identifier of a classification system.
+        :type system: str
+        :param languages: Languages to fetch. Default is all languages allowed by the service.
+        :type languages: list
+
+        :returns: The classes, with ``titles`` and ``descriptions`` by language.
+        :rtype: ClassesGroup
+        """
+        languages = list(languages or self.allowed_language)
+        classification_system = self.classification_system(system)
+
+        def fetch(language):
+            return classification_system.classes_group(language=language)
+
+        with ThreadPoolExecutor(max_workers=len(languages)) as executor:
+            responses = dict(zip(languages, executor.map(fetch, languages)))
+
+        merged = self._merge_languages(
+            {language: group.classes for language, group in responses.items()}
+        )
+        return ClassesGroup({"classes": merged}, self._validate)
+
+    @_method_cache("classification_system")
     def classification_system(self, system: str) -> ClassificationSystem:
         """Return information about the given classification system.
 
@@ -121,16 +243,18 @@ class LCCS:
         :rtype: dict
         """
         url = f"{self._url}/classification_systems/{system}"
-        params = {"language": self._language} if self._language else None
+        params = self._params()
         try:
             data = Utils._get(url, access_token=self._access_token, params=params)
-            return ClassificationSystem(data, self._validate)
+            return ClassificationSystem(data, self._validate, self._language)
+        except ValidationError:
+            raise
         except Exception:
             raise KeyError(
                 f"Could not retrieve information for classification_system: {system}"
             )
 
-    @cached(cache=LRUCache(maxsize=128))
+    @_method_cache("available_mappings")
     def available_mappings(self, system_source: str) -> list:
         """Return the available mappings of classification system.
 
@@ -141,9 +265,11 @@ class LCCS:
         :rtype: list
         """
         url = f"{self._url}/mappings/{system_source}"
-        params = {"language": self._language} if self._language else None
+        params = self._params()
         try:
             data = Utils._get(url, access_token=self._access_token, params=params)
+        except ValidationError:
+            raise
         except Exception:
             raise KeyError(
                 f"Could not retrieve any available mapping for {system_source}"
@@ -158,7 +284,7 @@ class LCCS:
                 result.append(system_target)
         return result
 
-    @cached(cache=LRUCache(maxsize=128))
+    @_method_cache("mappings")
     def mappings(self, system_source: str, system_target: str) -> MappingGroup:
         """Return the given classification_system.
 
@@ -172,7 +298,9 @@ class LCCS:
         """
         url = f"{self._url}/mappings/{system_source}/{system_target}"
         try:
-            data = Utils._get(url, access_token=self._access_token)
+            data = Utils._get(url, access_token=self._access_token, params=self._params())
+        except ValidationError:
+            raise
         except Exception:
             raise KeyError(
                 f"Could not retrieve mappings for {system_source} and {system_target}"
@@ -181,6 +309,136 @@ class LCCS:
         data_result = {"mappings": data}
         return MappingGroup(data_result, self._validate)
 
+    def mapping_coverage(self, system_source: str, system_target: str, bins: int = 10) -> MappingCoverage:
+        """Return the coverage and consistency of the mapping between two classification systems.
+
+        The mapping and the classes of both systems come from the client caches
+        when available, e.g. in a client restored with :meth:`load_snapshot`.
+
+        :param system_source: The name or identifier of the source classification system.
+        :type system_source: str
+        :param system_target: The name or identifier of the target classification system.
+        :type system_target: str
+        :param bins: The number of bins of the histogram of the degrees of similarity.
+        :type bins: int
+
+        :returns: The coverage of the mapping.
+        :rtype: MappingCoverage
+        """
+        return self.mappings(system_source, system_target).coverage(
+            self.classification_system(system_source).classes_group(),
+            self.classification_system(system_target).classes_group(),
+            bins,
+        )
+
+    def mapping_graph(self, refresh: bool = False, max_workers: int = 8) -> MappingGraph:
+        """Return the graph of the mappings available between all classification systems.
+
+        The available mappings of every system are fetched concurrently the first
+        time and the graph is kept for the next calls. A system whose mappings are
+        not found has no edges; any other error is raised.
+
+        :param refresh: Fetch the available mappings again. Default is False.
+        :type refresh: bool
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The mapping graph.
+        :rtype: MappingGraph
+        """
+        if self._mapping_graph is not None and not refresh:
+            return self._mapping_graph
+
+        params = self._params()
+        systems = Utils._get(
+            f"{self._url}/classification_systems", access_token=self._access_token, params=params
+        )
+        aliases = {i["identifier"]: str(i["id"]) for i in systems}
+
+        def targets(system):
+            try:
+                data = Utils._get(
+                    f"{self._url}/mappings/{system['id']}", access_token=self._access_token, params=params
+                )
+            except httpx.HTTPStatusError as e:
+                if Utils._not_found(e):
+                    return []
+                raise
+            return [
+                i["href"].split("/")[-1].split("?")[0] for i in data if i["rel"] == "child"
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            edges = dict(zip([str(i["id"]) for i in systems], executor.map(targets, systems)))
+
+        self._mapping_graph = MappingGraph(edges, aliases)
+        return self._mapping_graph
+
+    @_method_cache("compose_mappings")
+    def compose_mappings(self, system_source: str, system_target: str) -> MappingGroup:
+        """Return a mapping between two systems, composing the mappings of intermediate systems.
+
+        The shortest chain of available mappings is used and the degree of
+        similarity of the composed mappings is the product along the chain.
+
+        :param system_source: The id or identifier of the source classification system.
+        :type system_source: str
+        :param system_target: The id or identifier of the target classification system.
+        :type system_target: str
+
+        :returns: The derived mapping, with the chain of system ids in ``path``.
+        :rtype: MappingGroup
+        """
+        path = self.mapping_graph().path(system_source, system_target)
+        hops = list(zip(path[:-1], path[1:]))
+
+        with ThreadPoolExecutor(max_workers=max(len(hops), 1)) as executor:
+            groups = list(executor.map(lambda hop: self.mappings(*hop), hops))
+
+        result = MappingGraph.compose(groups) if groups else MappingGroup({"mappings": []}, self._validate)
+        result["path"] = path
+        return result
+
+    def search_index(
+        self,
+        systems: Optional[Iterable[str]] = None,
+        languages: Optional[Iterable[str]] = None,
+        index: Optional[ClassSearchIndex] = None,
+        max_workers: int = 8,
+    ) -> ClassSearchIndex:
+        """Build a local full-text index of the classes of classification systems.
+
+        The classes of every system and language are fetched concurrently. Pass
+        an existing ``index`` to update only the given systems.
+
+        :param systems: Identifiers of the classification systems. Default is all systems.
+        :type systems: list
+        :param languages: Languages to index. Default is all languages supported by the service.
+        :type languages: list
+        :param index: An index to update. Default is a new index.
+        :type index: ClassSearchIndex
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The search index.
+        :rtype: ClassSearchIndex
+        """
+        if systems is None:
+            systems = [i["identifier"] for i in self.classification_systems]
+        languages = list(languages) if languages is not None else self.allowed_language
+        index = index if index is not None else ClassSearchIndex()
+
+        def add(job):
+            system, language = job
+            classes = self.classification_system(system).classes_group(language=language)
+            index.add_system(system, classes, language=language)
+
+        jobs = [(system, language) for system in systems for language in languages]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(add, jobs))
+
+        return index
+
     def available_style_formats(self) -> list:
         """Fetch the available style formats.
 
@@ -190,8 +448,10 @@ class LCCS:
         result = []
         try:
             data = Utils._get(
-                f"{self._url}/style_formats", access_token=self._access_token
+                f"{self._url}/style_formats", access_token=self._access_token, params=self._params()
             )
+        except ValidationError:
+            raise
         except Exception:
             raise KeyError("Could not retrieve any style format")
 
@@ -199,13 +459,13 @@ class LCCS:
             for links in i["links"]:
                 if links["rel"] == "items":
                     data = Utils._get(
-                        f"{links['href']}", access_token=self._access_token
+                        f"{links['href']}", access_token=self._access_token, params=self._params()
                     )
-                    result.append(StyleFormats(data))
+                    result.append(StyleFormats(data, self._validate))
 
         return result
 
-    @cached(cache=LRUCache(maxsize=128))
+    @_method_cache("style_formats")
     def style_formats(self, system) -> List[StyleFormats]:
         """Fetch styles of the a giving classification system.
 
@@ -220,7 +480,10 @@ class LCCS:
             data = Utils._get(
                 f"{self._url}/classification_systems/{system}/style_formats",
                 access_token=self._access_token,
+                params=self._params(),
             )
+        except ValidationError:
+            raise
         except Exception:
             raise KeyError(f"Could not retrieve any style format for {system}")
 
@@ -230,39 +493,69 @@ class LCCS:
                 style_data = Utils._get(
                     f"{self._url}/style_formats/{style_id}",
                     access_token=self._access_token,
+                    params=self._params(),
                 )
-                result.append(StyleFormats(style_data))
+                result.append(StyleFormats(style_data, self._validate))
 
         return result
 
-    # TODO
-    def get_style(self, system, style_format, path=None):
+    def get_style(self, system, style_format, path=None, checksum=None) -> str:
         """Fetch styles of a giving classification system.
 
+        The file is streamed to disk and replaced atomically. When the file was
+        already downloaded to the same directory and did not change on the
+        server, it is not transferred again. The download states are kept in
+        the user cache directory (see ``LCCS_CACHE_DIR``), not next to the file.
+
         :param system: The id or identifier of a classification system.
         :type system: str
 
         :param style_format: The id or name of style format.
         :type style_format: str
 
-        :param path: Directory path to save the file
+        :param path: Directory path to save the file. Default is the current directory.
         :type path: str
 
-        :returns: Style
-        :rtype: File
+        :param checksum: Expected digest of the file as ``algorithm:hexdigest``.
+        :type checksum: str
+
+        :returns: The path of the saved style file.
+        :rtype: str
+
+        :raises FileNotFoundError: If the directory does not exist.
         """
         try:
-            file_name, data = Utils._get(
+            return Utils._download(
                 f"{self._url}/classification_systems/{system}/styles/{style_format}",
+                path=path or os.getcwd(),
                 access_token=self._access_token,
+                checksum=checksum,
             )
+        except (ValidationError, ValueError, OSError):
+            raise
         except Exception:
             raise KeyError(f"Could not retrieve any style for {system}")
 
-        if path is not None:
-            full_path = path + file_name
-            return open(full_path, "wb").write(data)
-        return open(file_name, "wb").write(data)
+    def get_styles(self, styles: Iterable[tuple], path=None, max_workers: int = 8) -> Dict[tuple, str]:
+        """Fetch many styles concurrently.
+
+        :param styles: Pairs of ``(system, style_format)``.
+        :type styles: list
+
+        :param path: Directory path to save the files. Default is the current directory.
+        :type path: str
+
+        :param max_workers: Maximum number of concurrent downloads.
+        :type max_workers: int
+
+        :returns: The path of the saved file of each ``(system, style_format)`` pair.
+        :rtype: dict
+        """
+        styles = [tuple(i) for i in styles]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            paths = executor.map(lambda i: self.get_style(i[0], i[1], path=path), styles)
+            return dict(zip(styles, paths))
 
     def add_classification_system(self, system_path: str | dict) -> List[dict]:
         """Add new classification system."""
@@ -290,6 +583,17 @@ class LCCS:
 
         return retval
 
+    def add_classes(self, system: str, classes: List[dict]) -> List[dict]:
+        """Add new classes to a classification system."""
+        url = f"{self._url}/classification_systems/{system}/classes"
+
+        try:
+            retval = Utils._post(url, access_token=self._access_token, json=classes)
+        except RuntimeError:
+            raise ValueError("Could not insert classes!")
+
+        return retval
+
     def add_style(
         self,
         system: str,
@@ -430,6 +734,468 @@ class LCCS:
 
         return
 
+    def create_raster_style(self, system: str, style_format: str, options: dict = None):
+        """Create a raster style sld with a ColorMap built from the classes colors."""
+        classes = self.classification_system(system).classes_group()
+        sld = SldGenerator.create_raster_sld(classes, options=options, layer_name=system)
+
+        self.add_style(
+            system=system,
+            style_format=style_format,
+            style_tex=sld.decode("utf-8"),
+            style_name="lccs-style",
+            style_extension="sld",
+        )
+
+        return
+
+    def export_styles(
+        self,
+        path: str,
+        systems: Optional[Iterable[str]] = None,
+        formats: Optional[Iterable[str]] = None,
+        max_workers: int = 8,
+    ) -> Dict[str, Dict[str, str]]:
+        """Export the class colors of classification systems to local style files.
+
+        The classes of all systems are fetched concurrently and written with
+        :class:`lccs.style_exporters.StyleExporter`, one file per system and format.
+
+        :param path: Directory where the files are written.
+        :type path: str
+        :param systems: Identifiers of the classification systems. Default is all systems.
+        :type systems: list
+        :param formats: Any of ``qml``, ``mapbox``, ``clr``, ``vrt`` and ``rat``. Default is all.
+        :type formats: list
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The written file path of each format, by system.
+        :rtype: dict
+        """
+        if systems is None:
+            systems = [i["identifier"] for i in self.classification_systems]
+        systems = list(systems)
+        formats = list(formats) if formats is not None else None
+
+        def export(system):
+            classes = self.classification_system(system).classes_group()
+            return StyleExporter.export(classes, path=path, name=system, formats=formats)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(systems, executor.map(export, systems)))
+
+    def prefetch(
+        self,
+        systems: Optional[Iterable[str]] = None,
+        include: Iterable[str] = ("classes", "mappings", "styles"),
+        max_workers: int = 8,
+    ) -> dict:
+        """Fetch the catalog up front, so later calls are answered from the client caches.
+
+        The classification systems (and the mapping graph) are fetched first, then
+        all classes, mappings and style formats at once, concurrently. The class
+        lookup indexes are built as the classes arrive. A failed request does not
+        stop the others; it is listed in the report.
+
+        :param systems: Identifiers of the classification systems. Default is all systems.
+        :type systems: list
+        :param include: Any of ``classes``, ``mappings`` and ``styles``. Default is all.
+        :type include: list
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The report, with the total ``seconds``, the ``count`` and ``seconds``
+            (since the start) of each kind of data and the ``errors`` by item.
+        :rtype: dict
+        """
+        include = set(include)
+        unknown = include - {"classes", "mappings", "styles"}
+        if unknown:
+            raise ValueError(f"Unknown prefetch items: {', '.join(sorted(unknown))}")
+
+        start = time.perf_counter()
+        report = dict(seconds=0.0, stages={}, errors={})
+
+        def stage(name, count):
+            report["stages"][name] = dict(count=count, seconds=time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if systems is None:
+                systems = [i["identifier"] for i in self.classification_systems]
+            systems = list(systems)
+            stage("systems", len(systems))
+            # Size the method caches from the catalog, so warming them does not evict their own entries.
+            self._grow_caches(classification_system=len(systems), style_formats=len(systems))
+            graph = executor.submit(self.mapping_graph, True, max_workers) if "mappings" in include else None
+
+            pairs = []
+            if graph is not None:
+                graph = graph.result()
+                identifiers = {graph.node(i): i for i in systems}
+                identifiers.update({graph.node(i["identifier"]): i["identifier"] for i in self._systems or []})
+                for system in systems:
+                    for target in graph.edges.get(graph.node(system), []):
+                        pairs.append((system, identifiers.get(target, target)))
+                stage("mapping_graph", len(pairs))
+                self._grow_caches(mappings=len(pairs))
+
+            def classes(system):
+                group = self.classification_system(system).classes_group()
+                group._index("id")
+                return group
+
+            jobs = {}
+            if "classes" in include:
+                jobs.update({("classes", system): executor.submit(classes, system) for system in systems})
+            if "styles" in include:
+                jobs.update({("styles", system): executor.submit(self.style_formats, system) for system in systems})
+            jobs.update({("mappings", pair): executor.submit(self.mappings, *pair) for pair in pairs})
+
+            finished = {}
+            for key, job in jobs.items():
+                job.add_done_callback(lambda _, key=key: finished.setdefault(key, time.perf_counter() - start))
+
+            counts = {}
+            for (kind, item), job in jobs.items():
+                try:
+                    job.result()
+                    counts[kind] = counts.get(kind, 0) + 1
+                except Exception as e:
+                    report["errors"][f"{kind}:{item}"] = str(e)
+
+        for kind in ("classes", "mappings", "styles"):
+            if kind in include:
+                times = [v for k, v in finished.items() if k[0] == kind]
+                report["stages"][kind] = dict(count=counts.get(kind, 0), seconds=max(times, default=0.0))
+
+        report["seconds"] = time.perf_counter() - start
+        return report
+
+    def export_parquet(
+        self,
+        path: str,
+        systems: Optional[Iterable[str]] = None,
+        mappings: bool = True,
+        max_workers: int = 8,
+    ) -> Dict[str, str]:
+        """Export the classes and mappings of the catalog to Parquet files (requires ``pyarrow``).
+
+        The classes of all systems, and the mappings between them, are fetched
+        concurrently and written as ``classes.parquet`` (with a ``system`` column)
+        and ``mappings.parquet`` (with ``source_system`` and ``target_system``
+        columns), built from the raw JSON columns of each group: no class or
+        mapping object is created.
+
+        :param path: Directory where the files are written.
+        :type path: str
+        :param systems: Identifiers of the classification systems. Default is all systems.
+        :type systems: list
+        :param mappings: Also export the mappings from these systems. Default is True.
+        :type mappings: bool
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The path of the written ``classes`` and ``mappings`` files.
+        :rtype: dict
+        """
+        parquet = Utils._require("pyarrow.parquet", "arrow")
+
+        catalog = Utils._get(f"{self._url}/classification_systems", access_token=self._access_token,
+                             params=self._params())
+        identifiers = {str(i["id"]): i["identifier"] for i in catalog}
+        systems = list(systems) if systems is not None else list(identifiers.values())
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            groups = list(executor.map(lambda i: self.classification_system(i).classes_group(), systems))
+
+            pairs = []
+            if mappings:
+                edges = self.mapping_graph(max_workers=max_workers).edges
+                ids = {v: k for k, v in identifiers.items()}
+                for system in systems:
+                    for target in edges.get(ids.get(system, system), []):
+                        pairs.append((system, identifiers.get(target, target)))
+            mapping_groups = list(executor.map(lambda pair: self.mappings(*pair), pairs))
+
+        def concat(named_groups, types, keys):
+            columns = {key: [] for key in keys}
+            columns.update({name: [] for name in types})
+            for names, group in named_groups:
+                group_columns = group.columns()
+                size = len(next(iter(group_columns.values()), []))
+                for key, name in zip(keys, names):
+                    columns[key].extend([name] * size)
+                for name in types:
+                    columns[name].extend(group_columns[name])
+            return Utils.arrow_table(columns, dict(types, **{key: "string" for key in keys}))
+
+        os.makedirs(path, exist_ok=True)
+        result = {"classes": os.path.join(path, "classes.parquet")}
+        parquet.write_table(
+            concat((((i,), g) for i, g in zip(systems, groups)), _CLASS_COLUMNS, ("system",)), result["classes"]
+        )
+        if mappings:
+            result["mappings"] = os.path.join(path, "mappings.parquet")
+            parquet.write_table(
+                concat(zip(pairs, mapping_groups), _MAPPING_COLUMNS, ("source_system", "target_system")),
+                result["mappings"],
+            )
+        return result
+
+    def _sync_state(self, system: str, local: dict, max_workers: int):
+        """Fetch the classes, styles and mappings of a classification system, once each."""
+        def get(url):
+            return Utils._get(url, access_token=self._access_token, params=self._params())
+
+        try:
+            data = get(f"{self._url}/classification_systems/{system}")
+        except httpx.HTTPStatusError as e:
+            if Utils._not_found(e):
+                return None, [], [], {}
+            raise
+        classes_url = ClassificationSystem(data)._classes_url()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            classes = executor.submit(get, classes_url)
+            if "styles" in local:
+                styles = executor.submit(get, f"{self._url}/classification_systems/{system}/style_formats")
+                formats = executor.submit(get, f"{self._url}/style_formats")
+            if "mappings" in local:
+                systems = executor.submit(get, f"{self._url}/classification_systems")
+                targets = executor.submit(get, f"{self._url}/mappings/{system}")
+
+            server_styles = []
+            if "styles" in local:
+                names = {str(i["id"]): i["name"] for i in formats.result()}
+                for i in styles.result():
+                    if i["rel"] == "style":
+                        style_id = i["href"].split("/")[-1]
+                        server_styles.append(names.get(style_id, style_id))
+
+            server_mappings = {}
+            if "mappings" in local:
+                identifiers = {str(i["id"]): i["identifier"] for i in systems.result()}
+                try:
+                    hrefs = [i["href"] for i in targets.result() if i["rel"] == "child"]
+                except httpx.HTTPStatusError as e:
+                    if not Utils._not_found(e):
+                        raise
+                    hrefs = []
+                wanted = {}
+                for href in hrefs:
+                    target = href.split("/")[-1].split("?")[0]
+                    identifier = identifiers.get(target, target)
+                    if identifier in local["mappings"]:
+                        wanted[identifier] = executor.submit(get, f"{self._url}/mappings/{system}/{target}")
+                    else:
+                        server_mappings[identifier] = []
+                server_mappings.update({k: v.result() for k, v in wanted.items()})
+
+                local["mappings"] = {
+                    identifiers.get(str(k), str(k)): v for k, v in local["mappings"].items()
+                }
+
+            return data, classes.result(), server_styles, server_mappings
+
+    def sync_classification_system(
+        self,
+        local_json,
+        system: Optional[str] = None,
+        dry_run: bool = False,
+        max_workers: int = 8,
+    ) -> SyncPlan:
+        """Make a classification system in the service match a local definition.
+
+        The state of the system in the service is fetched once and compared with
+        the local definition, and only the differences are sent, concurrently:
+        classes are matched by ``name`` and added, updated or removed, the styles
+        of missing style formats are uploaded and the mappings of a target system
+        are replaced when they differ. Sections missing in the local definition
+        (``styles`` or ``mappings``) are not changed.
+
+        The local definition has the format::
+
+            {
+                "classification_system": {"name": ..., "version": ..., ...},
+                "classes": [{"name": ..., "title": ..., "class_parent_name": ..., ...}],
+                "styles": {"<style format name>": "<style file path>"},
+                "mappings": {"<target system>": [{"source_class_id": ..., ...}] or "<mappings file path>"}
+            }
+
+        :param local_json: The local definition or the path of a JSON file with it.
+        :type local_json: str or dict
+        :param system: The identifier of the classification system. Default is
+            ``name-version`` of the local definition.
+        :type system: str
+        :param dry_run: Only compute the changes, without sending them. Default is False.
+        :type dry_run: bool
+        :param max_workers: Maximum number of concurrent requests.
+        :type max_workers: int
+
+        :returns: The changes, applied unless ``dry_run`` is set. Use ``report()`` for a summary.
+        :rtype: SyncPlan
+        """
+        if isinstance(local_json, str):
+            with open(local_json) as file:
+                local_json = json.load(file)
+        local = dict(local_json)
+        if isinstance(local.get("mappings"), dict):
+            local["mappings"] = dict(local["mappings"])
+            for target, items in local["mappings"].items():
+                if isinstance(items, str):
+                    with open(items) as file:
+                        local["mappings"][target] = json.load(file)
+
+        if system is None:
+            info = local.get("classification_system", {})
+            system = info.get("identifier") or f"{info['name']}-{info['version']}"
+
+        data, server_classes, server_styles, server_mappings = self._sync_state(system, local, max_workers)
+        plan = SyncPlan.compute(local, server_classes, server_styles, server_mappings)
+        if data is None:
+            plan["system"] = "added"
+
+        if dry_run or (plan.empty and data is not None):
+            return plan
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if data is None:
+                self.add_classification_system(
+                    {k: v for k, v in local.items() if k in ("classification_system", "classes")}
+                )
+            else:
+                for wave in SyncPlan.waves(plan.classes["added"]):
+                    self.add_classes(system, wave)
+
+            jobs = [executor.submit(self.update_class, system, i["id"], {k: v for k, v in i.items() if k != "id"})
+                    for i in plan.classes["changed"]]
+            jobs += [executor.submit(self.add_style, system, i, style_path=local["styles"][i])
+                     for i in plan.styles["added"]]
+            jobs += [executor.submit(self.delete_style, system, i) for i in plan.styles["removed"]]
+            jobs += [executor.submit(self.add_mapping, system, i, local["mappings"][i])
+                     for i in plan.mappings["added"]]
+            jobs += [executor.submit(self.delete_mapping, system, i) for i in plan.mappings["removed"]]
+
+            def replace_mapping(target):
+                self.delete_mapping(system, target)
+                return self.add_mapping(system, target, local["mappings"][target])
+
+            jobs += [executor.submit(replace_mapping, i) for i in plan.mappings["changed"]]
+            for job in jobs:
+                job.result()
+
+            for wave in SyncPlan.removal_waves(plan.classes["removed"]):
+                for job in [executor.submit(self.delete_class, system, i["id"]) for i in wave]:
+                    job.result()
+
+        with self._cache_lock:
+            for name in ("classification_system", "style_formats", "mappings"):
+                self._caches[name].clear()
+        self._mapping_graph = None
+
+        plan["applied"] = True
+        return plan
+
+    def __getstate__(self):
+        """Return the configuration of the client, without its caches nor its access token, for pickling."""
+        return dict(
+            url=self._url,
+            validate=self._validate,
+            language=self._language,
+            languages=self._languages,
+            systems=self._systems,
+            mapping_graph=self._mapping_graph,
+        )
+
+    def __setstate__(self, state):
+        """Restore a pickled client, without access token, without any request to the service."""
+        self._url = state["url"]
+        self._validate = state["validate"]
+        self._access_token = ""
+        self._language = state["language"]
+        self._languages = state["languages"]
+        self._systems = state["systems"]
+        self._mapping_graph = state["mapping_graph"]
+        self._classification_systems = {}
+        self._init_caches()
+
+    def snapshot(self) -> dict:
+        """Return the configuration and the cached responses of the client.
+
+        The snapshot is made of plain data and models, so it can be pickled and
+        given to worker processes, which restore a warm client with
+        :meth:`from_snapshot` without fetching the catalog again. The access
+        token is not part of the snapshot.
+
+        :returns: The snapshot.
+        :rtype: dict
+        """
+        with self._cache_lock:
+            caches = {name: [(tuple(key), value) for key, value in self._caches[name].items()]
+                      for name in _CACHED_METHODS}
+        return dict(state=self.__getstate__(), caches=caches)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict, access_token: Optional[str] = None) -> "LCCS":
+        """Create a client with the configuration and cached responses of a snapshot.
+
+        :param snapshot: A snapshot made by :meth:`snapshot`.
+        :type snapshot: dict
+        :param access_token: The access token of the client, if the service requires one.
+        :type access_token: str
+
+        :returns: The client.
+        :rtype: LCCS
+        """
+        service = cls.__new__(cls)
+        service.__setstate__(snapshot["state"])
+        service._access_token = access_token if access_token else ""
+        caches = snapshot["caches"]
+        service._grow_caches(**{name: len(entries) for name, entries in caches.items()})
+        with service._cache_lock:
+            for name, entries in caches.items():
+                for args, value in entries:
+                    service._caches[name][hashkey(*args)] = value
+        return service
+
+    def save_snapshot(self, path: str) -> str:
+        """Write the snapshot of the client to a pickle file, for worker processes.
+
+        The access token is not written; give it again to :meth:`load_snapshot`.
+
+        :param path: The path of the file.
+        :type path: str
+
+        :returns: The path of the file.
+        :rtype: str
+        """
+        with open(path, "wb") as file:
+            pickle.dump(self.snapshot(), file, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    @classmethod
+    def load_snapshot(cls, path: str, access_token: Optional[str] = None) -> "LCCS":
+        """Create a warm client from a snapshot file written by :meth:`save_snapshot`.
+
+        Each process loading the file unpickles its own copy of the snapshot.
+
+        .. warning::
+
+            The snapshot is a pickle file, and unpickling runs code chosen by
+            whoever wrote it. Never load a snapshot from an untrusted source.
+
+        :param path: The path of the file.
+        :type path: str
+        :param access_token: The access token of the client, if the service requires one.
+        :type access_token: str
+
+        :returns: The client.
+        :rtype: LCCS
+        """
+        with open(path, "rb") as file:
+            return cls.from_snapshot(pickle.load(file), access_token=access_token)
+
     @property
     def url(self):
         """Return the LCSS server instance URL."""
@@ -445,8 +1211,9 @@ class LCCS:
         return f"<LCCS [{self.url}]>"
 
     def _repr_html_(self):
-        """HTML repr."""
+        """HTML repr, from the classification systems already retrieved."""
         return Utils.render_html(
             "classification_systems.html",
-            classification_systems=self.classification_systems,
+            url=self.url,
+            classification_systems=self._systems,
         )
@@ -0,0 +1,147 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Local warm-cache server for the LCCS-WS command line interface."""
+import io
+import json
+import os
+import socket
+import socketserver
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional
+
+import click
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"lccs-{os.getuid()}.sock")
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Run one forwarded command line and send back its output."""
+
+    def handle(self):
+        """Read the arguments, run the command and reply with its output."""
+        request = json.loads(self.rfile.readline())
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exit_code = self.server.run(request["args"], request.get("cwd"))
+
+        reply = dict(stdout=stdout.getvalue(), stderr=stderr.getvalue(), exit_code=exit_code)
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class LocalServer(socketserver.UnixStreamServer):
+    """Long-lived process that runs CLI commands against a warm LCCS client.
+
+    The server keeps the same CLI configuration object between requests, so the
+    ``LCCS`` instances, their caches and the HTTP connection pool survive from
+    one command to the next. Commands are executed one at a time.
+
+    :param socket_path: Path of the Unix domain socket to listen on.
+    :type socket_path: str
+    :param command: The click group used to run the forwarded commands.
+    :type command: click.Group
+    :param config: The CLI configuration object shared between commands.
+    """
+
+    def __init__(self, socket_path: str, command: click.Group, config) -> None:
+        """Bind the server to the given socket path."""
+        if os.path.exists(socket_path):
+            if LocalServer.is_running(socket_path):
+                raise RuntimeError(f"A local server is already listening on {socket_path}")
+            os.remove(socket_path)
+
+        self.socket_path = socket_path
+        self.command = command
+        self.config = config
+        self.config.serving = True
+
+        # Create the socket without access for other users, instead of fixing its mode after bind.
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, _CommandHandler)
+        finally:
+            os.umask(umask)
+
+    def run(self, args: List[str], cwd: Optional[str] = None) -> int:
+        """Run a command line in this process and return its exit code.
+
+        :param args: The command line arguments, without the program name.
+        :param cwd: The working directory of the caller, where relative paths are resolved.
+        """
+        previous = os.getcwd()
+        try:
+            if cwd is not None:
+                os.chdir(cwd)
+            # Without standalone mode, click returns the code of ``ctx.exit`` instead of raising it.
+            rv = self.command.main(args=args, obj=self.config, prog_name="lccs", standalone_mode=False)
+        except click.exceptions.Exit as e:
+            return e.exit_code
+        except SystemExit as e:
+            # A command calling sys.exit must not stop the server thread.
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            return 1
+        except Exception as e:
+            click.echo(f"Error: {e}", err=True)
+            return 1
+        finally:
+            os.chdir(previous)
+        return rv if isinstance(rv, int) else 0
+
+    def server_close(self):
+        """Close the server and remove its socket file."""
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    @staticmethod
+    def is_running(socket_path: str) -> bool:
+        """Return whether a server is accepting connections on the socket path."""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def forward(args: List[str], socket_path: str, timeout: float = 100.0) -> Optional[dict]:
+        """Send a command line to a running server, to be run in the current working directory.
+
+        :param args: The command line arguments, without the program name.
+        :param socket_path: Path of the server Unix domain socket.
+        :param timeout: Seconds to wait for the command to finish.
+        :returns: A dict with ``stdout``, ``stderr`` and ``exit_code``, or None
+            if no server is listening on ``socket_path``.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+
+        with sock, sock.makefile("rwb") as stream:
+            stream.write(json.dumps(dict(args=args, cwd=os.getcwd())).encode("utf-8") + b"\n")
+            stream.flush()
+            return json.loads(stream.readline())
@@ -0,0 +1,136 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python Client Library for the LCCS Web Service."""
+import operator
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .mappings import MappingGroup
+
+
+class MappingGraph:
+    """Directed graph of the mappings available between classification systems.
+
+    Each node is a classification system id (as str) and each edge a mapping
+    published by the service from a source to a target system.
+
+    :param edges: The target systems of each source system.
+    :type edges: dict
+    :param aliases: Other names of the systems (e.g. identifiers), by node.
+    :type aliases: dict
+    """
+
+    def __init__(self, edges: Dict[str, Iterable[str]], aliases: Optional[Dict[str, str]] = None) -> None:
+        """Create the graph from the targets of each source system."""
+        self._edges = {str(k): sorted({str(i) for i in v}) for k, v in edges.items()}
+        self._aliases = {str(k): str(v) for k, v in (aliases or {}).items()}
+
+    @property
+    def edges(self) -> Dict[str, List[str]]:
+        """Return the target systems of each source system."""
+        return self._edges
+
+    def node(self, system: str) -> str:
+        """Return the node of a system given by id or identifier."""
+        system = str(system)
+        return self._aliases.get(system, system)
+
+    def path(self, system_source: str, system_target: str) -> List[str]:
+        """Return the shortest chain of systems from the source to the target system.
+
+        :param system_source: The id or identifier of the source system.
+        :param system_target: The id or identifier of the target system.
+        :returns: The nodes of the path, including source and target.
+        :raises KeyError: If there is no path between the systems.
+        """
+        source, target = self.node(system_source), self.node(system_target)
+
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = previous[current]
+                return path[::-1]
+            for i in self._edges.get(current, []):
+                if i not in previous:
+                    previous[i] = current
+                    queue.append(i)
+
+        raise KeyError(f"No mapping path between {system_source} and {system_target}")
+
+    @staticmethod
+    def compose(groups: List[MappingGroup],
+                combine: Callable[[float, float], float] = operator.mul) -> MappingGroup:
+        """Compose consecutive mapping groups into a single mapping group.
+
+        Two mappings are chained when the target class of the first one is the
+        source class of the second one. The degree of similarity of a chain is
+        reduced with ``combine`` (the product by default) and, when several
+        chains link the same pair of classes, the highest one is kept.
+
+        :param groups: Mapping groups of consecutive systems, e.g. ``A->B`` and ``B->C``.
+        :param combine: Function combining two degrees of similarity.
+        :returns: The mapping group from the first source to the last target system.
+        """
+        def links(mapping, title):
+            return [i for i in mapping.get('links', []) if i.get('title') == title]
+
+        chains = {}
+        for mapping in groups[0].get('mappings', []):
+            chains.setdefault(mapping['source_class_id'], []).append(
+                (mapping['target_class_id'], mapping.get('degree_of_similarity'), mapping, mapping)
+            )
+
+        for group in groups[1:]:
+            by_source = {}
+            for mapping in group.get('mappings', []):
+                by_source.setdefault(mapping['source_class_id'], []).append(mapping)
+
+            next_chains = {}
+            for source_id, items in chains.items():
+                for target_id, similarity, first, _ in items:
+                    for mapping in by_source.get(target_id, []):
+                        degree = mapping.get('degree_of_similarity')
+                        degree = None if similarity is None or degree is None else combine(similarity, degree)
+                        next_chains.setdefault(source_id, []).append(
+                            (mapping['target_class_id'], degree, first, mapping)
+                        )
+            chains = next_chains
+
+        best = {}
+        for source_id, items in chains.items():
+            for target_id, similarity, first, last in items:
+                key = (source_id, target_id)
+                if key not in best or (similarity or 0) > (best[key][0] or 0):
+                    best[key] = (similarity, first, last)
+
+        mappings = []
+        for (source_id, target_id), (similarity, first, last) in best.items():
+            mappings.append(dict(
+                source_class_id=source_id,
+                target_class_id=target_id,
+                degree_of_similarity=similarity,
+                description=None,
+                links=links(first, 'Link to source class') + links(last, 'Link to target class'),
+            ))
+
+        return MappingGroup({'mappings': mappings}, groups[0]._validate)
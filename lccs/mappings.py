@@ -16,14 +16,111 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Python Client Library for the LCCS Web Service."""
-from typing import List, Optional
-from .utils import Utils
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from .utils import MemoizedDict, Utils
+from .agreement import Agreement
 from .classes import ClassificationSystemClass
+from .coverage import MappingCoverage
 
 
-class MappingGroup(dict):
+class SimilarityMatrix(NamedTuple):
+    """Sparse source x target matrix of degrees of similarity, in CSR layout.
+
+    Row ``i`` is the source class ``source_ids[i]`` and column ``j`` the target
+    class ``target_ids[j]``. The values of row ``i`` are
+    ``data[indptr[i]:indptr[i + 1]]`` at the columns ``indices[indptr[i]:indptr[i + 1]]``.
+    """
+
+    indptr: Any
+    indices: Any
+    data: Any
+    source_ids: Any
+    target_ids: Any
+
+    @property
+    def shape(self):
+        """Return the number of source and target classes."""
+        return len(self.source_ids), len(self.target_ids)
+
+    def to_scipy(self):
+        """Return the matrix as a ``scipy.sparse.csr_matrix``."""
+        sparse = Utils._require('scipy.sparse', 'scipy')
+        return sparse.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+    def toarray(self):
+        """Return the matrix as a dense NumPy array, with zero where there is no mapping."""
+        np = Utils._require('numpy', 'numpy')
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        rows = np.repeat(np.arange(len(self.source_ids)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+
+# Arrow type of each column of the columnar exports.
+_COLUMN_TYPES = {
+    'source_class_id': 'int64', 'target_class_id': 'int64', 'degree_of_similarity': 'double', 'description': 'string',
+}
+
+_HTML_COLUMNS = ('source_class_id', 'source_class', 'target_class_id', 'target_class', 'description',
+                 'degree_of_similarity')
+
+
+def _factorize(values):
+    """Return the kind of column, the codes of its values and its distinct values.
+
+    Missing values are coded as -1 and left out of the distinct values.
+    """
+    module = type(values).__module__.split('.')[0]
+    if module == 'pandas':
+        pd = Utils._require('pandas', 'pandas')
+        if not isinstance(values, pd.Series):
+            values = pd.Series(values)
+        codes, uniques = pd.factorize(values)
+        return 'pandas', codes, list(uniques)
+    if module == 'pyarrow':
+        pa = Utils._require('pyarrow', 'arrow')
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        encoded = values.dictionary_encode()
+        codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return 'arrow', codes, encoded.dictionary.to_pylist()
+
+    np = Utils._require('numpy', 'numpy')
+    array = np.asarray(values)
+    if array.dtype.kind != 'O':
+        if array.dtype.kind == 'f':
+            present = ~np.isnan(array)
+            uniques, inverse = np.unique(array[present], return_inverse=True)
+            codes = np.full(array.shape, -1, dtype=np.int64)
+            codes[present] = inverse.reshape(-1)
+            return 'numpy', codes, uniques.tolist()
+        if array.dtype.kind in 'iu' and array.size:
+            # Class ids span a small range: count them instead of sorting.
+            low, high = int(array.min()), int(array.max())
+            if high - low < max(1 << 16, array.size):
+                # Subtract in intp, as small signed types would wrap around.
+                offsets = np.subtract(array, low, dtype=np.intp)
+                present = np.flatnonzero(np.bincount(offsets.ravel(), minlength=high - low + 1))
+                positions = np.full(high - low + 1, -1, dtype=np.int64)
+                positions[present] = np.arange(len(present))
+                return 'numpy', positions[offsets], (present + low).tolist()
+        uniques, codes = np.unique(array, return_inverse=True)
+        return 'numpy', codes.reshape(array.shape), uniques.tolist()
+
+    # Object arrays may mix None with other values, which cannot be sorted.
+    positions = {}
+    codes = np.fromiter(
+        (-1 if v is None else positions.setdefault(v, len(positions)) for v in array.ravel()),
+        dtype=np.int64, count=array.size,
+    )
+    return 'numpy', codes.reshape(array.shape), list(positions)
+
+
+class MappingGroup(MemoizedDict):
     """Group of class mappings."""
 
+    _schema = 'mapping.json'
+
     def __init__(self, data: dict, validate: bool = False) -> None:
         """
         Initialize a MappingGroup with mapping data.
@@ -33,15 +130,249 @@ class MappingGroup(dict):
         """
         super().__init__(data or {})
         self._validate = validate
+        if validate:
+            Utils.validate_many(self.get('mappings', []), self._schema)
 
     @property
     def mappings(self) -> List["Mapping"]:
-        """Return a list of mappings."""
-        return [Mapping(mapping, self._validate) for mapping in self.get('mappings', [])]
+        """Return a list of mappings, built (and their classes fetched) once."""
+        return self._memoized('mappings', lambda: [Mapping(mapping) for mapping in self.get('mappings', [])])
+
+    def similarity_matrix(
+        self,
+        source_ids: Optional[Sequence[int]] = None,
+        target_ids: Optional[Sequence[int]] = None,
+    ) -> SimilarityMatrix:
+        """
+        Return the degrees of similarity as a sparse source x target matrix.
+
+        The matrix is built from the raw mapping items, without creating any
+        Mapping or class object. Mappings whose class is not in ``source_ids``
+        or ``target_ids`` are left out and a missing degree of similarity is 0.
+
+        :param source_ids: Class ids of the source system, in row order. Default is the sorted source ids of the mappings.
+        :param target_ids: Class ids of the target system, in column order. Default is the sorted target ids of the mappings.
+        :return: The matrix in CSR layout; use ``to_scipy()`` for a ``scipy.sparse`` matrix.
+        """
+        np = Utils._require('numpy', 'numpy')
+
+        items = self.get('mappings', [])
+        count = len(items)
+        sources = np.fromiter((i['source_class_id'] for i in items), dtype=np.int64, count=count)
+        targets = np.fromiter((i['target_class_id'] for i in items), dtype=np.int64, count=count)
+        data = np.fromiter((i.get('degree_of_similarity') or 0.0 for i in items), dtype=np.float64, count=count)
+
+        def positions(values, ids):
+            if ids is None:
+                ids, index = np.unique(values, return_inverse=True)
+                return ids, index, np.ones(len(values), dtype=bool)
+            ids = np.asarray(ids, dtype=np.int64)
+            if not len(ids):
+                return ids, np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+            order = np.argsort(ids, kind='stable')
+            sorted_ids = ids[order]
+            found = np.searchsorted(sorted_ids, values).clip(0, len(ids) - 1)
+            valid = sorted_ids[found] == values
+            return ids, order[found], valid
+
+        source_ids, rows, valid_rows = positions(sources, source_ids)
+        target_ids, cols, valid_cols = positions(targets, target_ids)
+
+        valid = valid_rows & valid_cols
+        rows, cols, data = rows[valid], cols[valid], data[valid]
+
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(len(source_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(source_ids)), out=indptr[1:])
+
+        return SimilarityMatrix(indptr, cols[order], data[order], source_ids, target_ids)
+
+    def lookup_table(self, by: str = 'id', to: str = 'id', source_classes=None, target_classes=None) -> dict:
+        """
+        Return the mapping as a dictionary from source class values to target class values.
+
+        When a source class is mapped to many target classes, the target with
+        the greatest degree of similarity is chosen (the first one on ties).
+
+        :param by: The source class field of the keys: ``id``, ``name`` or ``code``.
+        :param to: The target class field of the values: ``id``, ``name`` or ``code``.
+        :param source_classes: The ClassesGroup of the source system, required unless ``by`` is ``id``.
+        :param target_classes: The ClassesGroup of the target system, required unless ``to`` is ``id``.
+        :raises ValueError: If a required ClassesGroup is missing.
+        """
+        def field(name, classes, side):
+            if name == 'id':
+                return lambda class_id: class_id
+            if classes is None:
+                raise ValueError(f"The {side} ClassesGroup is required to map by class {name}")
+            if name not in ('name', 'code'):
+                raise ValueError("Classes can only be mapped by: id, name, code")
+            index = classes._index('id')
+            return lambda class_id: (index.get(class_id) or {}).get(name)
+
+        key, value = field(by, source_classes, 'source'), field(to, target_classes, 'target')
+        items = sorted(self.get('mappings', []), key=lambda i: -(i.get('degree_of_similarity') or 0.0))
+
+        table = {}
+        for item in items:
+            source, target = key(item.get('source_class_id')), value(item.get('target_class_id'))
+            if source is not None and target is not None:
+                table.setdefault(source, target)
+        return table
+
+    def reclassify(self, values, by: str = 'id', to: str = 'id', source_classes=None, target_classes=None,
+                   unmapped: str = 'fill', fill_value=None):
+        """
+        Convert a column of source class ids, names or codes to the target system.
+
+        The values are factorized once, only the distinct values are looked up
+        in :meth:`lookup_table` and the result is broadcast back with a single
+        indexing operation, so millions of rows are converted without a Python
+        loop over the rows. Missing values (None, NaN or null) become ``fill_value``.
+
+        :param values: A NumPy array, pandas ``Series``, ``Index`` or ``Categorical``, ``pyarrow`` array
+            or a sequence of values.
+        :param by: The source class field of the values: ``id``, ``name`` or ``code``.
+        :param to: The target class field of the result: ``id``, ``name`` or ``code``.
+        :param source_classes: The ClassesGroup of the source system, required unless ``by`` is ``id``.
+        :param target_classes: The ClassesGroup of the target system, required unless ``to`` is ``id``.
+        :param unmapped: What to do with values without mapping: ``fill`` with ``fill_value``,
+            ``keep`` the source value or ``raise``.
+        :param fill_value: The value of unmapped and missing values. Default is None.
+        :return: The converted values, as the same kind of column as ``values``
+            (a NumPy array for sequences, a ``pandas.Series`` for any pandas input).
+        :raises KeyError: If ``unmapped`` is ``raise`` and some values have no mapping.
+        """
+        if unmapped not in ('fill', 'keep', 'raise'):
+            raise ValueError(f"Invalid unmapped option: {unmapped}. Use fill, keep or raise")
+        np = Utils._require('numpy', 'numpy')
+
+        kind, codes, uniques = _factorize(values)
+        table = self.lookup_table(by, to, source_classes, target_classes)
+
+        missing = [u for u in uniques if u not in table]
+        if missing and unmapped == 'raise':
+            raise KeyError(f"Values without mapping: {', '.join(map(str, missing[:10]))}")
+        if unmapped == 'keep':
+            lut = [table.get(u, u) for u in uniques]
+        else:
+            lut = [table.get(u, fill_value) for u in uniques]
+        lut.append(fill_value)  # Missing values are coded as -1, the last entry.
+
+        if kind == 'pandas':
+            pd = Utils._require('pandas', 'pandas')
+            series = values if isinstance(values, pd.Series) else pd.Series(values)
+            return pd.Series(pd.array(lut).take(codes), index=series.index, name=series.name)
+        codes = np.where(codes < 0, len(lut) - 1, codes)
+        if kind == 'arrow':
+            pa = Utils._require('pyarrow', 'arrow')
+            return pa.array(lut).take(pa.array(codes))
+        lut = np.array(lut, dtype=object) if any(i is None for i in lut) else np.asarray(lut)
+        return lut.take(codes)
+
+    def coverage(self, source_classes=None, target_classes=None, bins: int = 10) -> MappingCoverage:
+        """
+        Return the coverage and consistency of the mapping (requires ``numpy``).
+
+        :param source_classes: The ClassesGroup of the source system, to find unmapped and dangling source ids.
+        :param target_classes: The ClassesGroup of the target system, likewise.
+        :param bins: The number of bins of the histogram of the degrees of similarity.
+        :return: The unmapped classes, dangling ids, duplicate pairs, fan-out and similarity statistics.
+        """
+        return MappingCoverage.compute(
+            self.get('mappings', []),
+            None if source_classes is None else source_classes.get('classes', []),
+            None if target_classes is None else target_classes.get('classes', []),
+            bins,
+        )
+
+    def agreement(self, source, target, by: str = 'id', to: str = 'id', source_classes=None, target_classes=None,
+                  nodata=None, pixel_area: float = 1.0, tile_rows: int = 1024,
+                  processes: Optional[int] = None) -> Agreement:
+        """
+        Compare a map of the source system with a map of the target system (requires ``numpy``).
+
+        The source map is harmonized with :meth:`lookup_table` and the confusion
+        matrix is counted tile by tile, see :meth:`Agreement.compute`.
+
+        :param source: An integer array of source class values, e.g. a ``numpy.memmap`` of a raster band.
+        :param target: An integer array of target class values, aligned with ``source``.
+        :param by: The source class field of the source values: ``id`` or ``code``.
+        :param to: The target class field of the target values: ``id`` or ``code``.
+        :param source_classes: The ClassesGroup of the source system, required unless ``by`` is ``id``.
+        :param target_classes: The ClassesGroup of the target system, required unless ``to`` is ``id``.
+            When given, every target class is a label of the matrix.
+        :param nodata: The nodata value of both arrays, or a ``(source, target)`` tuple.
+        :param pixel_area: The area of one pixel, to compute the class areas.
+        :param tile_rows: The number of rows of the first axis counted at once.
+        :param processes: The number of worker processes. Default is None, counting in this process.
+        :return: The confusion matrix and agreement statistics.
+        :raises ValueError: If a class value is not an integer.
+        """
+        def integer(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Class values must be integers, got {value!r}")
+
+        table = {
+            integer(k): integer(v)
+            for k, v in self.lookup_table(by, to, source_classes, target_classes).items()
+        }
+        labels = None
+        if target_classes is not None:
+            values = (cls.get(to) for cls in target_classes.get('classes', []))
+            labels = sorted({integer(v) for v in values if v is not None} | set(table.values()))
+        return Agreement.compute(source, target, table, labels=labels, nodata=nodata, pixel_area=pixel_area,
+                                 tile_rows=tile_rows, processes=processes)
+
+    def columns(self) -> Dict[str, list]:
+        """Return the values of each mapping field as lists, read from the raw JSON items."""
+        items = self.get('mappings', [])
+        return {name: [i.get(name) for i in items] for name in _COLUMN_TYPES}
+
+    def to_arrow(self):
+        """Return the mappings as a ``pyarrow.Table`` (requires ``pyarrow``)."""
+        return Utils.arrow_table(self.columns(), _COLUMN_TYPES)
+
+    def to_pandas(self):
+        """Return the mappings as a ``pandas.DataFrame`` (requires ``pandas``)."""
+        return Utils.data_frame(self.columns(), _COLUMN_TYPES)
+
+    def html_page(self, page: int = 0, page_size: int = 50, source_classes=None, target_classes=None) -> str:
+        """
+        Render one page of the mappings as HTML, without any request to the service.
+
+        Class names are shown only for the sides whose ClassesGroup is given.
+        In a notebook, show it with ``IPython.display.HTML(group.html_page(2))``.
+
+        :param page: The page number, starting at 0.
+        :param page_size: The maximum number of rows of the page.
+        :param source_classes: The ClassesGroup of the source system, to show the source class names.
+        :param target_classes: The ClassesGroup of the target system, to show the target class names.
+        """
+        def names(classes):
+            index = classes._index('id') if classes is not None else {}
+            return lambda class_id: (index.get(class_id) or {}).get('name')
+
+        source_name, target_name = names(source_classes), names(target_classes)
+
+        def row(item):
+            return [
+                item.get('source_class_id'),
+                source_name(item.get('source_class_id')),
+                item.get('target_class_id'),
+                target_name(item.get('target_class_id')),
+                item.get('description'),
+                item.get('degree_of_similarity'),
+            ]
+
+        table = Utils.html_table(_HTML_COLUMNS, self.get('mappings', []), row, page, page_size)
+        return Utils.render_html('mapping.html', **table)
 
     def _repr_html_(self) -> str:
         """Render an HTML representation of the mapping group."""
-        return Utils.render_html('mapping.html', mappings=self)
+        return self.html_page()
 
     def __repr__(self) -> str:
         """Return a string representation of the mapping group."""
@@ -55,6 +386,8 @@ class MappingGroup(dict):
 class Mapping(dict):
     """Representation of a single mapping."""
 
+    _schema = 'mapping.json'
+
     def __init__(self, data: dict, validate: bool = False) -> None:
         """
         Initialize a Mapping with metadata.
@@ -64,6 +397,8 @@ class Mapping(dict):
         """
         super().__init__(data or {})
         self._validate = validate
+        if validate:
+            Utils.validate(self)
         self._initialize_classes()
 
     @property
@@ -0,0 +1,189 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python Client Library for the LCCS Web Service."""
+import bisect
+import difflib
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .classes import ClassesGroup, ClassificationSystemClass
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# Weight of a match in each field of a class.
+_FIELD_WEIGHTS = {'title': 3.0, 'name': 2.0, 'code': 2.0, 'description': 1.0}
+
+# Weight of each kind of match between a query token and an indexed token.
+_EXACT, _PREFIX, _FUZZY = 1.0, 0.6, 0.4
+
+
+class SearchResult(NamedTuple):
+    """A class found by :meth:`ClassSearchIndex.search`."""
+
+    score: float
+    system: str
+    language: Optional[str]
+    class_: ClassificationSystemClass
+
+
+class ClassSearchIndex:
+    """Local inverted index over the classes of many classification systems.
+
+    Titles, names, codes and descriptions are tokenized in lower case with the
+    accents removed, so ``savana`` finds ``Savana``, ``SAVANA`` and ``Savâna``.
+    A system (in one language) can be indexed again at any time and only its
+    entries are replaced.
+
+    The index is safe to query from many threads while it is updated.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty index."""
+        self._documents: Dict[Tuple, ClassificationSystemClass] = {}
+        self._postings: Dict[str, Dict[Tuple, float]] = {}
+        self._vocabulary: List[str] = []
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def tokenize(text: Optional[str]) -> List[str]:
+        """Split a text in lower case tokens without accents."""
+        if not text:
+            return []
+        folded = unicodedata.normalize('NFKD', str(text).lower())
+        folded = ''.join(c for c in folded if not unicodedata.combining(c))
+        return _TOKEN.findall(folded)
+
+    def __len__(self) -> int:
+        """Return the number of indexed classes."""
+        return len(self._documents)
+
+    def add_system(self, system: str, classes, language: Optional[str] = None) -> None:
+        """Index the classes of a classification system, replacing the ones indexed before.
+
+        :param system: The identifier of the classification system.
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param language: The language of the classes. Default is None.
+        """
+        if isinstance(classes, ClassesGroup):
+            classes = classes.classes
+
+        with self._lock:
+            self.remove_system(system, language)
+            for cls in classes:
+                key = (system, language, cls.get('id'))
+                self._documents[key] = cls
+                for field, weight in _FIELD_WEIGHTS.items():
+                    for token in self.tokenize(cls.get(field)):
+                        postings = self._postings.setdefault(token, {})
+                        postings[key] = postings.get(key, 0.0) + weight
+            self._dirty = True
+
+    def remove_system(self, system: str, language: Optional[str] = None) -> None:
+        """Remove the classes of a classification system in one language from the index."""
+        with self._lock:
+            keys = {key for key in self._documents if key[0] == system and key[1] == language}
+            if not keys:
+                return
+            for key in keys:
+                del self._documents[key]
+            for token in list(self._postings):
+                postings = self._postings[token]
+                for key in keys.intersection(postings):
+                    del postings[key]
+                if not postings:
+                    del self._postings[token]
+            self._dirty = True
+
+    def _sorted_vocabulary(self) -> List[str]:
+        """Return the indexed tokens in order, for prefix queries."""
+        if self._dirty:
+            self._vocabulary = sorted(self._postings)
+            self._dirty = False
+        return self._vocabulary
+
+    def _matches(self, token: str, vocabulary: List[str], fuzzy: bool) -> Iterable[Tuple[str, float]]:
+        """Return the indexed tokens matching a query token, with the weight of the match."""
+        matches = {}
+        if token in self._postings:
+            matches[token] = _EXACT
+
+        start = bisect.bisect_left(vocabulary, token)
+        for candidate in vocabulary[start:]:
+            if not candidate.startswith(token):
+                break
+            matches.setdefault(candidate, _PREFIX)
+
+        if fuzzy and not matches:
+            for candidate in difflib.get_close_matches(token, vocabulary, n=5, cutoff=0.75):
+                matches.setdefault(candidate, _FUZZY)
+
+        return matches.items()
+
+    def search(self, query: str, limit: int = 10, systems: Optional[Iterable[str]] = None,
+               language: Optional[str] = None, fuzzy: bool = True) -> List[SearchResult]:
+        """Return the classes matching a query, best first.
+
+        Every query token must match the class, exactly, as a prefix of an
+        indexed token or, when ``fuzzy`` is set and nothing else matches, by
+        approximate spelling. Rare tokens and matches in titles score higher.
+
+        :param query: The text to search.
+        :param limit: The maximum number of results. Default is 10.
+        :param systems: Search only in these classification systems. Default is all.
+        :param language: Search only in this language. Default is all.
+        :param fuzzy: Accept misspelled tokens. Default is True.
+        """
+        tokens = self.tokenize(query)
+        if not tokens:
+            return []
+        systems = set(systems) if systems is not None else None
+
+        with self._lock:
+            vocabulary = self._sorted_vocabulary()
+            total = len(self._documents) or 1
+            scores = None
+
+            for token in tokens:
+                token_scores = {}
+                for candidate, match in self._matches(token, vocabulary, fuzzy):
+                    postings = self._postings[candidate]
+                    idf = math.log(1 + total / len(postings))
+                    for key, weight in postings.items():
+                        score = weight * match * idf
+                        if score > token_scores.get(key, 0.0):
+                            token_scores[key] = score
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {key: scores[key] + value for key, value in token_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+            results = [
+                SearchResult(score, key[0], key[1], self._documents[key])
+                for key, score in scores.items()
+                if (systems is None or key[0] in systems) and (language is None or key[1] == language)
+            ]
+
+        results.sort(key=lambda result: (-result.score, result.system, str(result.class_.get('title'))))
+        return results[:limit]
@@ -0,0 +1,277 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python API client wrapper for LCCS-WS."""
+import json
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from lxml import etree
+
+from .classes import ClassesGroup, ClassificationSystemClass
+
+# GDAL raster attribute table field types and usages.
+_RAT_INTEGER, _RAT_STRING = 0, 2
+_RAT_GENERIC, _RAT_NAME, _RAT_MIN_MAX = 0, 2, 5
+_RAT_RED, _RAT_GREEN, _RAT_BLUE, _RAT_ALPHA = 6, 7, 8, 9
+
+logger = logging.getLogger(__name__)
+
+# GDAL color tables of UInt16 rasters have at most 65536 entries.
+_MAX_PALETTE_ENTRIES = 65536
+
+_EXTENSIONS = {
+    'qml': '.qml',
+    'mapbox': '.json',
+    'clr': '.clr',
+    'vrt': '.vrt.xml',
+    'rat': '.aux.xml',
+}
+
+
+def hex_to_rgba(color: str) -> Tuple[int, int, int, int]:
+    """Convert a ``#rgb``, ``#rrggbb`` or ``#rrggbbaa`` color to a RGBA tuple."""
+    value = color.lstrip('#')
+    if len(value) == 3:
+        value = ''.join(c * 2 for c in value)
+    if len(value) == 6:
+        value += 'ff'
+    try:
+        if len(value) != 8:
+            raise ValueError
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4, 6))
+    except ValueError:
+        raise ValueError(f'Invalid color: {color}')
+
+
+def color_entries(classes: Union[ClassesGroup, Iterable[ClassificationSystemClass]],
+                   quantity: str = 'id', label: str = 'title') -> List[Tuple[int, str, str]]:
+    """Return the ``(value, color, label)`` of each colored class, sorted by value.
+
+    Classes whose ``quantity`` is not an integer, such as non-numeric codes,
+    cannot be pixel values and are skipped with a warning, as are classes
+    with a malformed color.
+
+    :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+    :param quantity: The class field of the values, ``id`` or ``code``.
+    :param label: The class field of the labels, ``title`` or ``name``.
+    """
+    if isinstance(classes, ClassesGroup):
+        classes = classes.classes
+
+    entries = []
+    for i in classes:
+        if not i.get('color') or i.get(quantity) is None:
+            continue
+        try:
+            value = int(i[quantity])
+        except (TypeError, ValueError):
+            logger.warning("Skipping class %s: its %s %r is not an integer value", i.get('name'), quantity,
+                           i[quantity])
+            continue
+        try:
+            hex_to_rgba(i['color'])
+        except (AttributeError, ValueError):
+            logger.warning("Skipping class %s: invalid color %r", i.get('name'), i['color'])
+            continue
+        entries.append((value, i['color'], str(i.get(label) or '')))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+class StyleExporter:
+    """Export the class colors of a classification system to local style formats.
+
+    Every exporter receives a ClassesGroup (or a list of classes) and uses the
+    class ``id`` as the pixel value, the ``title`` as label and the ``color``.
+    Classes without color are skipped.
+    """
+
+    @staticmethod
+    def to_qml(classes, opacity: float = 1.0, band: int = 1) -> str:
+        """Return a QGIS QML paletted raster renderer.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param opacity: The layer opacity, from 0 to 1.
+        :param band: The raster band the renderer applies to.
+        """
+        root = etree.Element('qgis', styleCategories='AllStyleCategories')
+        pipe = etree.SubElement(root, 'pipe')
+        renderer = etree.SubElement(pipe, 'rasterrenderer', band=str(band), alphaBand='-1',
+                                    opacity=str(opacity), type='paletted')
+        etree.SubElement(renderer, 'rasterTransparency')
+        palette = etree.SubElement(renderer, 'colorPalette')
+        for value, color, label in color_entries(classes):
+            red, green, blue, alpha = hex_to_rgba(color)
+            # QGIS reads 8-digit colors as #aarrggbb, so the alpha goes in its own attribute.
+            etree.SubElement(palette, 'paletteEntry', label=label, color=f'#{red:02x}{green:02x}{blue:02x}',
+                             value=str(value), alpha=str(alpha))
+        etree.SubElement(root, 'blendMode').text = '0'
+
+        return etree.tostring(root, doctype="<!DOCTYPE qgis PUBLIC 'http://mrcc.com/qgis.dtd' 'SYSTEM'>",
+                              pretty_print=True, encoding='unicode')
+
+    @staticmethod
+    def mapbox_expression(classes, property_name: str = 'class_id', fallback: str = 'rgba(0, 0, 0, 0)') -> list:
+        """Return a Mapbox/MapLibre GL ``match`` expression from class values to colors.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param property_name: The feature property holding the class value.
+        :param fallback: The color of values without class.
+        """
+        expression = ['match', ['get', property_name]]
+        for value, color, _ in color_entries(classes):
+            expression.extend((value, color))
+        expression.append(fallback)
+        return expression
+
+    @classmethod
+    def to_mapbox(cls, classes, layer_id: str = 'lccs', source: str = 'lccs', source_layer: Optional[str] = None,
+                  property_name: str = 'class_id', opacity: float = 1.0) -> str:
+        """Return a Mapbox/MapLibre GL fill layer colored by class, as JSON.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param layer_id: The id of the style layer.
+        :param source: The name of the source of the layer.
+        :param source_layer: The layer of a vector tile source. Default is None.
+        :param property_name: The feature property holding the class value.
+        :param opacity: The fill opacity, from 0 to 1.
+        """
+        layer = {'id': layer_id, 'type': 'fill', 'source': source}
+        if source_layer:
+            layer['source-layer'] = source_layer
+        layer['paint'] = {
+            'fill-color': cls.mapbox_expression(classes, property_name=property_name),
+            'fill-opacity': opacity,
+        }
+        return json.dumps(layer, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def to_gdal_clr(classes) -> str:
+        """Return a GDAL color file with ``value R G B A`` lines, as used by gdaldem."""
+        lines = []
+        for value, color, _ in color_entries(classes):
+            lines.append(f'{value} ' + ' '.join(str(c) for c in hex_to_rgba(color)))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def to_vrt_color_table(classes) -> str:
+        """Return the ``ColorInterp`` and ``ColorTable`` elements of a paletted VRT band.
+
+        A GDAL color table has one entry per pixel value from 0 to the greatest
+        class value, so values without class are transparent. Use
+        :meth:`to_raster_attribute_table`, which only has the classes, when the
+        class values are large, e.g. database ids.
+
+        :raises ValueError: If a class value is greater than 65535, the largest paletted value.
+        """
+        colors = {value: hex_to_rgba(color) for value, color, _ in color_entries(classes)}
+        size = max(colors, default=-1) + 1
+        if size > _MAX_PALETTE_ENTRIES:
+            raise ValueError(f"Class value {size - 1} is too large for a color table; "
+                             f"use the raster attribute table instead")
+
+        band = etree.Element('VRTRasterBand')
+        etree.SubElement(band, 'ColorInterp').text = 'Palette'
+        table = etree.SubElement(band, 'ColorTable')
+        for value in range(size):
+            c1, c2, c3, c4 = colors.get(value, (0, 0, 0, 0))
+            etree.SubElement(table, 'Entry', c1=str(c1), c2=str(c2), c3=str(c3), c4=str(c4))
+        return ''.join(etree.tostring(child, pretty_print=True, encoding='unicode') for child in band)
+
+    @classmethod
+    def to_raster_attribute_table(cls, classes, band: int = 1) -> str:
+        """Return a GDAL PAM (``.aux.xml``) document with the raster attribute table of the classes.
+
+        Saved next to a raster as ``<raster>.aux.xml`` it gives GDAL, QGIS and
+        ArcGIS the class names and colors of each pixel value. Only the classes
+        are written, one row each, with their color in the RGBA columns.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param band: The raster band the table applies to.
+        """
+        classes = list(classes.classes if isinstance(classes, ClassesGroup) else classes)
+        entries = color_entries(classes)
+        codes = {}
+        for i in classes:
+            if i.get('id') is not None:
+                codes[int(i['id'])] = (i.get('code') or '', i.get('name') or '')
+
+        root = etree.Element('PAMDataset')
+        pam_band = etree.SubElement(root, 'PAMRasterBand', band=str(band))
+
+        rat = etree.SubElement(pam_band, 'GDALRasterAttributeTable')
+        fields = [('Value', _RAT_INTEGER, _RAT_MIN_MAX), ('Class', _RAT_STRING, _RAT_NAME),
+                  ('Code', _RAT_STRING, _RAT_GENERIC), ('Name', _RAT_STRING, _RAT_GENERIC),
+                  ('Red', _RAT_INTEGER, _RAT_RED), ('Green', _RAT_INTEGER, _RAT_GREEN),
+                  ('Blue', _RAT_INTEGER, _RAT_BLUE), ('Alpha', _RAT_INTEGER, _RAT_ALPHA)]
+        for index, (name, field_type, usage) in enumerate(fields):
+            field = etree.SubElement(rat, 'FieldDefn', index=str(index))
+            etree.SubElement(field, 'Name').text = name
+            etree.SubElement(field, 'Type').text = str(field_type)
+            etree.SubElement(field, 'Usage').text = str(usage)
+
+        for index, (value, color, label) in enumerate(entries):
+            code, name = codes.get(value, ('', ''))
+            row = etree.SubElement(rat, 'Row', index=str(index))
+            for field_value in (value, label, code, name, *hex_to_rgba(color)):
+                etree.SubElement(row, 'F').text = str(field_value)
+
+        return etree.tostring(root, pretty_print=True, encoding='unicode')
+
+    @classmethod
+    def export(cls, classes, path: str, name: str, formats: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Write the styles of a group of classes to files.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param path: Directory where the files are written.
+        :param name: Base name of the files, usually the classification system identifier.
+        :param formats: Any of ``qml``, ``mapbox``, ``clr``, ``vrt`` and ``rat``. Default is all, leaving
+            out (with a warning) ``vrt`` when the class values are too large for a color table.
+        :returns: The path of the written file of each format.
+        """
+        exporters = {
+            'qml': cls.to_qml,
+            'mapbox': cls.to_mapbox,
+            'clr': cls.to_gdal_clr,
+            'vrt': cls.to_vrt_color_table,
+            'rat': cls.to_raster_attribute_table,
+        }
+        explicit = formats is not None
+        formats = list(formats or exporters)
+        unknown = set(formats) - set(exporters)
+        if unknown:
+            raise ValueError(f"Unknown style formats: {', '.join(sorted(unknown))}")
+
+        classes = list(classes.classes if isinstance(classes, ClassesGroup) else classes)
+
+        os.makedirs(path, exist_ok=True)
+        result = {}
+        for style_format in formats:
+            try:
+                content = exporters[style_format](classes)
+            except ValueError as e:
+                if explicit:
+                    raise
+                logger.warning("Skipping the %s style of %s: %s", style_format, name, e)
+                continue
+            file_path = os.path.join(path, f'{name}{_EXTENSIONS[style_format]}')
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            result[style_format] = file_path
+        return result
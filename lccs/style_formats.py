@@ -17,11 +17,14 @@
 #
 """Python Client Library for the LCCS Web Service."""
 from .link import Link
+from .utils import MemoizedDict, Utils
 
 
-class StyleFormats(dict):
+class StyleFormats(MemoizedDict):
     """Class."""
 
+    _schema = 'style_format.json'
+
     def __init__(self, data, validate=False):
         """Initialize instance with dictionary data.
 
@@ -31,6 +34,8 @@ class StyleFormats(dict):
         """
         self._validate = validate
         super(StyleFormats, self).__init__(data or {})
+        if validate:
+            Utils.validate(self)
 
     @property
     def id(self) -> int:
@@ -44,8 +49,8 @@ class StyleFormats(dict):
     
     @property
     def links(self) -> list[Link]:
-        """:return: a list of link in the classification system."""
-        return [Link(link) for link in self['links']]
+        """:return: a list of link in the classification system, built once."""
+        return self._memoized('links', lambda: [Link(link) for link in self['links']])
     
     def __repr__(self) -> str:
         """Return the string representation of a style format object."""
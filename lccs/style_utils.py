@@ -16,46 +16,217 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Python API client wrapper for LCCS-WS."""
-from lxml.etree import tostring
-import sld
 import os
+import threading
+from typing import Iterable, Optional, Union
+
+from lxml import etree
+
+from .classes import ClassesGroup, ClassificationSystemClass
+from .style_exporters import color_entries
+
+SLD_SCHEMA_URL = 'http://schemas.opengis.net/sld/1.0.0/StyledLayerDescriptor.xsd'
+
+# Bundled subset of the SLD 1.0.0 schema with the elements written by SldGenerator, parsed once.
+SLD_SCHEMA = etree.XMLSchema(etree.parse(
+    os.path.join(os.path.dirname(__file__), 'xmlschemas', 'StyledLayerDescriptor.xsd')
+))
+
+_NSMAP = {
+    'sld': 'http://www.opengis.net/sld',
+    'ogc': 'http://www.opengis.net/ogc',
+    'xlink': 'http://www.w3.org/1999/xlink',
+    'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+}
+
+_SLD = '{%s}' % _NSMAP['sld']
+_OGC = '{%s}' % _NSMAP['ogc']
+
+_COMPARATORS = {
+    '==': 'PropertyIsEqualTo',
+    '<=': 'PropertyIsLessThanOrEqualTo',
+    '<': 'PropertyIsLessThan',
+    '>=': 'PropertyIsGreaterThanOrEqualTo',
+    '>': 'PropertyIsGreaterThan',
+    '!=': 'PropertyIsNotEqualTo',
+    '%': 'PropertyIsLike',
+}
+
+_DEFAULT_OPTIONS = {
+    'stroke': '#232323',
+    'stroke-width': '0.5',
+    'point_size': '8',
+    'point_type': 'circle',
+    'property_name': 'class_id',
+    'comparator': '==',
+    'wild_card': '*',
+    'single_char': '.',
+    'escape': '!',
+}
+
+_DEFAULT_RASTER_OPTIONS = {
+    'opacity': '1.0',
+    'quantity': 'id',
+    'label': 'title',
+}
+
+# GeoServer only accepts more than 255 ColorMap entries in extended mode.
+_MAX_COLORMAP_ENTRIES = 255
+
+_schemas = {}
+_schemas_lock = threading.Lock()
 
 
 class SldGenerator:
     """Class to create and manipulated styles."""
 
+    @staticmethod
+    def _text_element(parent, tag, text, **attrib):
+        """Append an element with text to the parent node."""
+        element = etree.SubElement(parent, tag, attrib)
+        element.text = text
+        return element
+
     @classmethod
-    def create_sld(cls, options: dict, rules: list, layer_name='', userstyletitle=None, featuretypestylename=None):
-        """Create the rules for style."""
-        # set the default values
-        options.setdefault('stroke', '#232323')
-        options.setdefault('stroke-width', '0.5')
-        options.setdefault('point_size', '8')
-        options.setdefault('point_type', 'circle')
-        options.setdefault('property_name', 'class_id')
-        options.setdefault('comparator', '==')
-
-        mysld = sld.StyledLayerDescriptor()
-        nl = mysld.create_namedlayer(layer_name)
-        us_style = nl.create_userstyle()
+    def _create_document(cls, layer_name, userstyletitle=None, userstylename=None):
+        """Create the SLD root node and return it with its FeatureTypeStyle node."""
+        root = etree.Element(f'{_SLD}StyledLayerDescriptor', version='1.0.0', nsmap=_NSMAP)
+        named_layer = etree.SubElement(root, f'{_SLD}NamedLayer')
+        cls._text_element(named_layer, f'{_SLD}Name', layer_name)
+        user_style = etree.SubElement(named_layer, f'{_SLD}UserStyle')
+        if userstylename is not None:
+            cls._text_element(user_style, f'{_SLD}Name', str(userstylename))
         if userstyletitle is not None:
-            us_style.Title = str(userstyletitle)
-        fts = us_style.create_featuretypestyle()
-        if featuretypestylename is not None:
-            us_style.Name = str(featuretypestylename)
+            cls._text_element(user_style, f'{_SLD}Title', str(userstyletitle))
+        return root, user_style
+
+    @classmethod
+    def create_sld(cls, options: dict, rules: list, layer_name='', userstyletitle=None, featuretypestylename=None,
+                   validate=False, schema: Optional[str] = None) -> bytes:
+        """Create the rules for style.
+
+        The document is built directly with lxml, so no schema file is written
+        to disk and concurrent calls are safe.
+
+        :param options: Symbolizer and filter options. Missing keys get the default values. The
+            ``comparator`` is one of ``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=`` and ``%`` (like), whose
+            patterns use ``wild_card``, ``single_char`` and ``escape``.
+        :param rules: List of dict with ``rule_label``, ``fill_color`` and ``property_literal``.
+        :param layer_name: The name of the layer.
+        :param userstyletitle: The title of the user style.
+        :param featuretypestylename: The name of the user style, written as its ``Name``.
+        :param validate: Validate the document against the SLD schema. Default is False.
+        :param schema: Path or URL of the SLD schema used when ``validate`` is True. Default is the bundled schema.
+        :returns: The SLD document encoded as UTF-8.
+        :raises ValueError: If the comparator is unknown.
+        """
+        options = {**_DEFAULT_OPTIONS, **options}
+        filter_type = _COMPARATORS.get(options['comparator'])
+        if filter_type is None:
+            raise ValueError(f"Unknown comparator: {options['comparator']}. Use: {', '.join(_COMPARATORS)}")
+        filter_attrib = {}
+        if filter_type == 'PropertyIsLike':
+            filter_attrib = dict(wildCard=str(options['wild_card']), singleChar=str(options['single_char']),
+                                 escape=str(options['escape']))
+        point_size = str(options['point_size'])
+        point_type = str(options['point_type'])
+        property_name = str(options['property_name'])
+
+        root, user_style = cls._create_document(layer_name, userstyletitle, featuretypestylename)
+        fts = etree.SubElement(user_style, f'{_SLD}FeatureTypeStyle')
 
         for i in rules:
-            rule = fts.create_rule(title=i['rule_label'], symbolizer=sld.PointSymbolizer)
-            rule.PointSymbolizer.Graphic.Mark.Fill.CssParameters[0].Value = i['fill_color']
-            rule.PointSymbolizer.Graphic.Size = options['point_size']
-            rule.PointSymbolizer.Graphic.Mark.WellKnownName = options['point_type']
+            rule = etree.SubElement(fts, f'{_SLD}Rule')
+            cls._text_element(rule, f'{_SLD}Title', i['rule_label'])
 
-            rule.Filter = rule.create_filter(propname=options['property_name'], comparitor=options['comparator'],
-                                             value=f"{i['property_literal']}")
+            rule_filter = etree.SubElement(rule, f'{_OGC}Filter')
+            criterion = etree.SubElement(rule_filter, f'{_OGC}{filter_type}', filter_attrib)
+            cls._text_element(criterion, f'{_OGC}PropertyName', property_name)
+            cls._text_element(criterion, f'{_OGC}Literal', f"{i['property_literal']}")
+
+            graphic = etree.SubElement(etree.SubElement(rule, f'{_SLD}PointSymbolizer'), f'{_SLD}Graphic')
+            mark = etree.SubElement(graphic, f'{_SLD}Mark')
+            cls._text_element(mark, f'{_SLD}WellKnownName', point_type)
+            fill = etree.SubElement(mark, f'{_SLD}Fill')
+            cls._text_element(fill, f'{_SLD}CssParameter', i['fill_color'], name='fill')
+            cls._text_element(graphic, f'{_SLD}Size', point_size)
+
+        if validate:
+            cls.validate(root, schema=schema)
+
+        return etree.tostring(root, pretty_print=False, encoding="utf-8")
+
+    @classmethod
+    def create_raster_sld(cls, classes: Union[ClassesGroup, Iterable[ClassificationSystemClass]],
+                          options: Optional[dict] = None, layer_name='', userstyletitle=None,
+                          validate=False, schema: Optional[str] = None) -> bytes:
+        """Create a raster style with a single ColorMap built from the class colors.
+
+        Each class with a color becomes one ``ColorMapEntry`` of a ColorMap of
+        type ``values``, sorted by quantity. Classes without color, or whose
+        quantity is not an integer (e.g. a code such as ``"A1"``), are skipped.
+
+        :param classes: A ClassesGroup or a list of ClassificationSystemClass.
+        :param options: ``opacity`` of the symbolizer and entries, ``quantity`` (the
+            class attribute used as pixel value, ``id`` or ``code``) and ``label``
+            (the class attribute used as entry label, ``title`` or ``name``).
+        :param layer_name: The name of the layer.
+        :param userstyletitle: The title of the user style.
+        :param validate: Validate the document against the SLD schema. Default is False.
+        :param schema: Path or URL of the SLD schema used when ``validate`` is True. Default is the bundled schema.
+        :returns: The SLD document encoded as UTF-8.
+        """
+        options = {**_DEFAULT_RASTER_OPTIONS, **(options or {})}
+        opacity = str(options['opacity'])
+
+        entries = color_entries(classes, quantity=options['quantity'], label=options['label'])
+
+        root, user_style = cls._create_document(layer_name, userstyletitle)
+        rule = etree.SubElement(etree.SubElement(user_style, f'{_SLD}FeatureTypeStyle'), f'{_SLD}Rule')
+        symbolizer = etree.SubElement(rule, f'{_SLD}RasterSymbolizer')
+        cls._text_element(symbolizer, f'{_SLD}Opacity', opacity)
+
+        color_map = etree.SubElement(symbolizer, f'{_SLD}ColorMap', type='values')
+        if len(entries) > _MAX_COLORMAP_ENTRIES:
+            color_map.set('extended', 'true')
+
+        entry_tag = f'{_SLD}ColorMapEntry'
+        for quantity, color, label in entries:
+            etree.SubElement(color_map, entry_tag, color=color, quantity=str(quantity), label=str(label),
+                             opacity=opacity)
+
+        if validate:
+            cls.validate(root, schema=schema)
+
+        return etree.tostring(root, pretty_print=False, encoding="utf-8")
+
+    @staticmethod
+    def _schema(location: Optional[str] = None) -> etree.XMLSchema:
+        """Return the bundled SLD schema, or the schema of a location, parsed only once per location."""
+        if location is None:
+            return SLD_SCHEMA
+        with _schemas_lock:
+            if location not in _schemas:
+                _schemas[location] = etree.XMLSchema(etree.parse(location))
+            return _schemas[location]
+
+    @classmethod
+    def validate(cls, document, schema: Optional[str] = None) -> None:
+        """Validate a SLD document against the SLD schema.
 
-        mysld.normalize()
+        By default the bundled subset of the SLD 1.0.0 schema is used, so no
+        network access is needed. Other schemas are parsed on first use and
+        cached for the next calls.
 
-        localschema_backup_path = './StyledLayerDescriptor-backup.xsd'
-        os.remove(localschema_backup_path)
+        :param document: The SLD document as bytes, str or lxml element.
+        :param schema: Path or URL of the schema, e.g. ``SLD_SCHEMA_URL`` for the complete OGC schema.
+        :raises ValueError: If the document is not valid.
+        """
+        if isinstance(document, (bytes, str)):
+            document = etree.fromstring(document.encode('utf-8') if isinstance(document, str) else document)
 
-        return tostring(mysld._node, pretty_print=False, encoding="utf-8")
+        xml_schema = cls._schema(schema)
+        with _schemas_lock:
+            if not xml_schema.validate(document):
+                errors = '; '.join(f'line {e.line}: {e.message}' for e in xml_schema.error_log)
+                raise ValueError(f'Invalid SLD document: {errors}')
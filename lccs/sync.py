@@ -0,0 +1,182 @@
+#
+# This file is part of Python Client Library for the LCCS-WS.
+# Copyright (C) 2022 INPE.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
+#
+"""Python Client Library for the LCCS Web Service."""
+from typing import Dict, Iterable, List, Optional
+
+# Class fields that are set by the service and never compared.
+_SERVER_FIELDS = ('id', 'links', 'class_parent_id')
+
+# Mapping fields compared when they are present in the local definition.
+_MAPPING_FIELDS = ('source_class_id', 'target_class_id', 'degree_of_similarity', 'description')
+
+
+class SyncPlan(dict):
+    """Changes that make a classification system on the service match a local definition.
+
+    The plan has one entry per section (``classes``, ``styles`` and
+    ``mappings``) with the ``added``, ``changed`` and ``removed`` items.
+    Sections missing in the local definition are left untouched. ``system``
+    is ``added`` when the classification system does not exist in the
+    service and is created together with its classes.
+    """
+
+    def __init__(self, data: Optional[dict] = None) -> None:
+        """Initialize a plan with dictionary data."""
+        super().__init__(data or {})
+        for section in ('classes', 'styles', 'mappings'):
+            self.setdefault(section, dict(added=[], changed=[], removed=[]))
+        self.setdefault('applied', False)
+
+    @property
+    def classes(self) -> dict:
+        """Return the class changes: local classes to add and update, server classes to remove."""
+        return self['classes']
+
+    @property
+    def styles(self) -> dict:
+        """Return the style formats to add and remove."""
+        return self['styles']
+
+    @property
+    def mappings(self) -> dict:
+        """Return the target systems whose mappings are added, replaced and removed."""
+        return self['mappings']
+
+    @property
+    def requests(self) -> int:
+        """Return the number of requests needed to apply the plan."""
+        classes, mappings = self.classes, self.mappings
+        if self.get('system') == 'added':
+            # One request creates the system with all its classes.
+            class_requests = 1
+        else:
+            class_requests = len(self.waves(classes['added'])) + len(classes['changed']) + len(classes['removed'])
+        return (class_requests + sum(len(v) for v in self.styles.values())
+                + len(mappings['added']) + 2 * len(mappings['changed']) + len(mappings['removed']))
+
+    @property
+    def empty(self) -> bool:
+        """Return whether the service already matches the local definition."""
+        return self.requests == 0
+
+    def report(self) -> str:
+        """Return a human-readable summary of the plan."""
+        lines = []
+        for section in ('classes', 'styles', 'mappings'):
+            for action in ('added', 'changed', 'removed'):
+                items = self[section][action]
+                if items:
+                    names = ', '.join(str(i.get('name', i)) if isinstance(i, dict) else str(i) for i in items)
+                    lines.append(f'{section} {action} ({len(items)}): {names}')
+        lines.append(f"{self.requests} request(s){' applied' if self['applied'] else ''}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def waves(classes: List[dict]) -> List[List[dict]]:
+        """Split new classes in groups that can be added together, parents before their children."""
+        pending = list(classes)
+        names = {i['name'] for i in pending}
+        result = []
+        while pending:
+            wave = [i for i in pending if i.get('class_parent_name') not in names]
+            if not wave:
+                raise ValueError(f"Cycle in the parents of classes: {', '.join(sorted(names))}")
+            result.append(wave)
+            pending = [i for i in pending if i.get('class_parent_name') in names]
+            names -= {i['name'] for i in wave}
+        return result
+
+    @staticmethod
+    def removal_waves(classes: List[dict]) -> List[List[dict]]:
+        """Split server classes to remove in groups that can be deleted together, children before their parents."""
+        pending = list(classes)
+        result = []
+        while pending:
+            parents = {i.get('class_parent_id') for i in pending}
+            wave = [i for i in pending if i['id'] not in parents]
+            if not wave:
+                raise ValueError(f"Cycle in the parents of classes: {', '.join(sorted(i['name'] for i in pending))}")
+            result.append(wave)
+            pending = [i for i in pending if i['id'] in parents]
+        return result
+
+    @staticmethod
+    def _class_changed(local: dict, server: dict, parent_names: Dict[int, str]) -> bool:
+        """Return whether a local class differs from the class in the service."""
+        for key, value in local.items():
+            if key in _SERVER_FIELDS:
+                continue
+            if key == 'class_parent_name':
+                if value != parent_names.get(server.get('class_parent_id')):
+                    return True
+            elif server.get(key) != value:
+                return True
+        return False
+
+    @staticmethod
+    def _mapping_key(items: Iterable[dict], fields: Iterable[str]) -> frozenset:
+        """Return a comparable representation of a list of mappings."""
+        return frozenset(tuple(i.get(f) for f in fields) for i in items)
+
+    @classmethod
+    def compute(cls, local: dict, server_classes: List[dict], server_styles: Optional[Iterable[str]] = None,
+                server_mappings: Optional[Dict[str, List[dict]]] = None) -> 'SyncPlan':
+        """Compare a local definition with the state of the service.
+
+        :param local: The local definition, with ``classes`` (a list of classes
+            identified by ``name``), and optionally ``styles`` (style file path by
+            style format name) and ``mappings`` (list of mappings by target system).
+        :param server_classes: The classes of the system in the service.
+        :param server_styles: The style format names of the system in the service.
+        :param server_mappings: The mappings of the system in the service, by target system.
+        :returns: The plan.
+        """
+        plan = cls()
+
+        if 'classes' in local:
+            server_by_name = {i['name']: i for i in server_classes}
+            parent_names = {i['id']: i['name'] for i in server_classes}
+            local_names = set()
+
+            for local_class in local['classes']:
+                local_names.add(local_class['name'])
+                server_class = server_by_name.get(local_class['name'])
+                if server_class is None:
+                    plan.classes['added'].append(local_class)
+                elif cls._class_changed(local_class, server_class, parent_names):
+                    plan.classes['changed'].append(dict(local_class, id=server_class['id']))
+
+            plan.classes['removed'] = [i for i in server_classes if i['name'] not in local_names]
+
+        if 'styles' in local:
+            server_styles = set(server_styles or [])
+            plan.styles['added'] = sorted(set(local['styles']) - server_styles)
+            plan.styles['removed'] = sorted(server_styles - set(local['styles']))
+
+        if 'mappings' in local:
+            server_mappings = server_mappings or {}
+            for target, items in local['mappings'].items():
+                if target not in server_mappings:
+                    plan.mappings['added'].append(target)
+                    continue
+                fields = [f for f in _MAPPING_FIELDS if any(f in i for i in items)]
+                if cls._mapping_key(items, fields) != cls._mapping_key(server_mappings[target], fields):
+                    plan.mappings['changed'].append(target)
+            plan.mappings['removed'] = sorted(set(server_mappings) - set(local['mappings']))
+
+        return plan
@@ -16,25 +16,190 @@
 # along with this program. If not, see <https://www.gnu.org/licenses/gpl-3.0.html>.
 #
 """Python Client Library for the LCCS Web Service."""
+import functools
+import hashlib
+import importlib
+import json
+import logging
+import os
+import random
 import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from importlib.resources import as_file, files
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import httpx
 import jinja2
-from jsonschema import Draft7Validator, validate
+from jsonschema import Draft7Validator, ValidationError
+from jsonschema.exceptions import best_match
 
 with as_file(files(__package__) / "jsonschemas") as base_schemas_path:
     base_schemas_path_str = str(base_schemas_path) + "/"
 
 with as_file(files(__package__) / "templates") as templates_path:
     templateLoader = jinja2.FileSystemLoader(searchpath=str(templates_path))
-    templateEnv = jinja2.Environment(loader=templateLoader)
+    templateEnv = jinja2.Environment(loader=templateLoader, auto_reload=False)
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+_validation = dict(sample=None, deferred=False)
+_validation_executor = None
+_validation_futures: List[Future] = []
+_validation_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def _select_json_backend(name: Optional[str] = None):
+    """Return the name, decoder and encoder of the fastest JSON library installed.
+
+    orjson is preferred, then msgspec, then the standard library. The
+    ``LCCS_JSON_BACKEND`` environment variable forces one of them; when it
+    names an unknown or missing library, a warning is logged and the standard
+    library is used.
+
+    :raises ImportError: If the backend given by ``name`` is not available.
+    """
+    if name is None and os.environ.get("LCCS_JSON_BACKEND"):
+        try:
+            return _select_json_backend(os.environ["LCCS_JSON_BACKEND"])
+        except ImportError as e:
+            logger.warning("%s, set by LCCS_JSON_BACKEND; using json", e)
+            return _select_json_backend("json")
+
+    candidates = [name] if name else ["orjson", "msgspec", "json"]
+
+    for candidate in candidates:
+        if candidate == "orjson":
+            try:
+                import orjson
+            except ImportError:
+                continue
+            return "orjson", orjson.loads, lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        if candidate == "msgspec":
+            try:
+                import msgspec
+            except ImportError:
+                continue
+            return "msgspec", msgspec.json.Decoder().decode, msgspec.json.Encoder().encode
+        if candidate == "json":
+            return "json", json.loads, lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    raise ImportError(f"JSON backend not available: {name}")
+
+
+json_backend, _json_loads, _json_dumps = _select_json_backend()
+
+
+class MemoizedDict(dict):
+    """Dictionary whose derived values are computed once and dropped when it is changed.
+
+    Changes through the dict methods clear the memoized values. Changes inside
+    nested values (e.g. appending to a list) are not seen: call ``invalidate()``
+    after them.
+    """
+
+    def _memoized(self, name: str, factory):
+        """Return the value of ``name``, computing it with ``factory`` on first use."""
+        memo = self.__dict__.setdefault("_memo", {})
+        if name not in memo:
+            memo[name] = factory()
+        return memo[name]
+
+    def invalidate(self) -> None:
+        """Drop the memoized values."""
+        self.__dict__.pop("_memo", None)
+
+    def __getstate__(self) -> dict:
+        """Return the attributes to pickle, without the memoized values."""
+        return {k: v for k, v in self.__dict__.items() if k != "_memo"}
+
+    def __setitem__(self, key, value) -> None:
+        """Set an item and drop the memoized values."""
+        super().__setitem__(key, value)
+        self.invalidate()
+
+    def __delitem__(self, key) -> None:
+        """Delete an item and drop the memoized values."""
+        super().__delitem__(key)
+        self.invalidate()
+
+    def __ior__(self, other):
+        """Update the items and drop the memoized values."""
+        result = super().__ior__(other)
+        self.invalidate()
+        return result
+
+    def update(self, *args, **kwargs) -> None:
+        """Update the items and drop the memoized values."""
+        super().update(*args, **kwargs)
+        self.invalidate()
+
+    def setdefault(self, key, default=None):
+        """Insert a missing item and drop the memoized values."""
+        if key not in self:
+            self.invalidate()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        """Remove an item and drop the memoized values."""
+        self.invalidate()
+        return super().pop(*args)
+
+    def popitem(self):
+        """Remove the last item and drop the memoized values."""
+        self.invalidate()
+        return super().popitem()
+
+    def clear(self) -> None:
+        """Remove all items and drop the memoized values."""
+        super().clear()
+        self.invalidate()
 
 
 class Utils:
     """Utilities class for interacting with LCCS-WS."""
 
+    @staticmethod
+    def _client() -> httpx.Client:
+        """Return the HTTP client shared by all requests.
+
+        The client is created on first use and kept open, so its connection pool
+        is reused by every request made in the process.
+        """
+        global _http_client
+
+        if _http_client is None:
+            with _http_client_lock:
+                if _http_client is None:
+                    _http_client = httpx.Client(timeout=100.0)
+        return _http_client
+
+    @staticmethod
+    def configure_client(transport: Optional[httpx.BaseTransport] = None, **kwargs) -> None:
+        """Replace the HTTP client shared by all requests.
+
+        Use it to send the requests through another transport, e.g. the
+        :class:`lccs.emulator.LCCSEmulator`. Without arguments the default
+        client is restored.
+
+        :param transport: The httpx transport of the new client. Default is the network.
+        :param kwargs: Other arguments of ``httpx.Client``.
+        """
+        global _http_client
+
+        with _http_client_lock:
+            if _http_client is not None:
+                _http_client.close()
+            if transport is None and not kwargs:
+                _http_client = None
+            else:
+                kwargs.setdefault("timeout", 100.0)
+                _http_client = httpx.Client(transport=transport, **kwargs)
+
     @staticmethod
     def _get(
         url: str,
@@ -50,33 +215,148 @@ class Utils:
         :return: JSON response as a dictionary or a tuple with file name and binary content.
         :raises ValueError: If the response body does not contain valid JSON or is not of an expected content type.
         """
-        if params is None:
-            params = {}
-
-        params.setdefault("language", "pt-br")
-
         headers = {"x-api-key": access_token} if access_token else {}
 
-        with httpx.Client(timeout=100.0) as client:
-            response = client.get(url, params=params, headers=headers)
-            response.raise_for_status()
+        response = Utils._client().get(url, params=params, headers=headers)
+        response.raise_for_status()
 
         content_type = response.headers.get("content-type", "")
 
         if content_type == "application/octet-stream":
-            content_disposition = response.headers.get("content-disposition", "")
-            try:
-                file_name = re.findall(r'filename="?(.*?)"?$', content_disposition)[0]
-            except IndexError:
-                raise ValueError(
-                    "Error extracting file name from Content-Disposition header."
-                )
-            return file_name, response.content
+            return Utils._file_name(response), response.content
 
         if content_type not in ("application/json", "application/geo+json"):
             raise ValueError(f"HTTP response is not JSON: Content-Type: {content_type}")
 
-        return response.json()
+        return Utils._loads(response.content)
+
+    @staticmethod
+    def _not_found(error: Exception) -> bool:
+        """Return whether an error is an HTTP 404 response."""
+        return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 404
+
+    @staticmethod
+    def _loads(data: Union[bytes, str]) -> Any:
+        """Decode a JSON document with the selected JSON backend."""
+        return _json_loads(data)
+
+    @staticmethod
+    def _dumps(obj: Any) -> bytes:
+        """Encode an object as a UTF-8 JSON document with the selected JSON backend."""
+        return _json_dumps(obj)
+
+    @staticmethod
+    def _file_name(response: httpx.Response) -> str:
+        """Return the file name of the Content-Disposition header of a response."""
+        content_disposition = response.headers.get("content-disposition", "")
+        try:
+            return re.findall(r'filename="?(.*?)"?$', content_disposition)[0]
+        except IndexError:
+            raise ValueError("Error extracting file name from Content-Disposition header.")
+
+    @staticmethod
+    def _download(
+        url: str,
+        path: str,
+        access_token: Optional[str] = None,
+        checksum: Optional[str] = None,
+        chunk_size: int = 65536,
+    ) -> str:
+        """
+        Stream a file response to a directory and return the path of the saved file.
+
+        The body is written in chunks to a temporary file that is renamed to the
+        name given by the Content-Disposition header only when complete. The
+        ETag and Last-Modified of each download are kept in the cache directory
+        of :meth:`_state_dir`, by URL and directory, so a new request for the
+        same file is conditional and an unchanged file is not transferred again.
+
+        :param url: The URL to query; must be a valid LCCS-WS endpoint.
+        :param path: Directory where the file is saved.
+        :param access_token: (Optional) Access token for authentication.
+        :param checksum: (Optional) Expected digest as ``algorithm:hexdigest``, e.g. ``sha256:9f86...``.
+            A digest without algorithm is taken as SHA-256.
+        :param chunk_size: Size in bytes of the chunks written to disk.
+        :return: The path of the saved file.
+        :raises FileNotFoundError: If the directory does not exist.
+        :raises ValueError: If the response is not a file or the checksum does not match.
+        """
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Directory {path} does not exist")
+
+        algorithm, _, expected = (checksum or "").rpartition(":")
+        algorithm = algorithm or "sha256"
+
+        key = f"{url}\0{os.path.abspath(path)}"
+        state_path = os.path.join(Utils._state_dir(), f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json")
+        state = {}
+        if os.path.exists(state_path):
+            with open(state_path, "rb") as file:
+                state = Utils._loads(file.read())
+
+        headers = {"x-api-key": access_token} if access_token else {}
+        if state and os.path.exists(os.path.join(path, state["file_name"])):
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+
+        with Utils._client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return os.path.join(path, state["file_name"])
+            response.raise_for_status()
+
+            content_type = response.headers.get("content-type", "")
+            if content_type != "application/octet-stream":
+                raise ValueError(f"HTTP response is not a file: Content-Type: {content_type}")
+
+            file_name = os.path.basename(Utils._file_name(response))
+            digest = hashlib.new(algorithm)
+
+            fd, tmp_path = tempfile.mkstemp(dir=path, prefix=f".{file_name}.", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    for chunk in response.iter_bytes(chunk_size):
+                        file.write(chunk)
+                        digest.update(chunk)
+
+                if expected and digest.hexdigest() != expected.lower():
+                    raise ValueError(f"Checksum mismatch for {file_name}: expected {expected}, got {digest.hexdigest()}")
+
+                file_path = os.path.join(path, file_name)
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            state = dict(
+                file_name=file_name,
+                etag=response.headers.get("etag"),
+                last_modified=response.headers.get("last-modified"),
+            )
+
+        try:
+            os.makedirs(os.path.dirname(state_path), exist_ok=True)
+            with open(state_path, "wb") as file:
+                file.write(Utils._dumps(state))
+        except OSError as e:
+            logger.warning("Could not save the download state of %s: %s", url, e)
+
+        return file_path
+
+    @staticmethod
+    def _state_dir() -> str:
+        """Return the directory of the download states.
+
+        It is ``$LCCS_CACHE_DIR/downloads`` or else ``$XDG_CACHE_HOME/lccs/downloads``,
+        which defaults to ``~/.cache/lccs/downloads``.
+        """
+        base = os.environ.get("LCCS_CACHE_DIR")
+        if not base:
+            base = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                "lccs")
+        return os.path.join(base, "downloads")
 
     @staticmethod
     def _post(
@@ -98,13 +378,17 @@ class Utils:
         """
         headers = {"x-api-key": access_token} if access_token else {}
 
-        with httpx.Client(timeout=100.0) as client:
-            response = client.post(
-                url, headers=headers, data=data, json=json, files=files
-            )
-            response.raise_for_status()
+        content = None
+        if json is not None:
+            content = Utils._dumps(json)
+            headers["content-type"] = "application/json"
 
-        return response.json()
+        response = Utils._client().post(
+            url, headers=headers, data=data, content=content, files=files
+        )
+        response.raise_for_status()
+
+        return Utils._loads(response.content)
 
     @staticmethod
     def _put(
@@ -126,13 +410,17 @@ class Utils:
         """
         headers = {"x-api-key": access_token} if access_token else {}
 
-        with httpx.Client(timeout=100.0) as client:
-            response = client.put(
-                url, headers=headers, data=data, json=json, files=files
-            )
-            response.raise_for_status()
+        content = None
+        if json is not None:
+            content = Utils._dumps(json)
+            headers["content-type"] = "application/json"
+
+        response = Utils._client().put(
+            url, headers=headers, data=data, content=content, files=files
+        )
+        response.raise_for_status()
 
-        return response.json()
+        return Utils._loads(response.content)
 
     @staticmethod
     def _delete(
@@ -150,25 +438,202 @@ class Utils:
         """
         headers = {"x-api-key": access_token} if access_token else {}
 
-        with httpx.Client(timeout=100.0) as client:
-            response = client.delete(url, params=params, headers=headers)
-            response.raise_for_status()
+        response = Utils._client().delete(url, params=params, headers=headers)
+        response.raise_for_status()
 
         return response
 
     @staticmethod
-    def validate(lccs_object):
-        """Validade function lccs object."""
-        validator = Draft7Validator(schema=lccs_object._schema)
-        validator.validate(lccs_object)
+    @functools.lru_cache(maxsize=None)
+    def _validator(schema_name: str, many: bool = False) -> Draft7Validator:
+        """Return the compiled validator of a schema, or of an array of it when ``many`` is True.
+
+        Schemas are read from the ``jsonschemas`` directory of the package and
+        compiled only once.
+        """
+        with open(base_schemas_path_str + schema_name, encoding="utf-8") as file:
+            schema = json.load(file)
+
+        if many:
+            item = {k: v for k, v in schema.items() if k not in ("$schema", "$id", "definitions")}
+            schema = {
+                "$schema": schema["$schema"],
+                "definitions": schema.get("definitions", {}),
+                "type": "array",
+                "items": item,
+            }
+
+        Draft7Validator.check_schema(schema)
+        return Draft7Validator(schema)
+
+    @staticmethod
+    def configure_validation(sample: Optional[int] = None, deferred: bool = False) -> None:
+        """Configure how the models created with ``validate=True`` check the responses.
+
+        :param sample: Validate only this many randomly chosen items of each
+            response array. Default is None, which validates every item.
+        :param deferred: Validate in a background thread and log the errors
+            instead of raising them; collect them with :meth:`flush_validation`.
+            Default is False.
+        """
+        _validation.update(sample=sample, deferred=deferred)
+
+    @staticmethod
+    def flush_validation(timeout: Optional[float] = None, raise_error: bool = False) -> List[ValidationError]:
+        """Wait for the deferred validations started so far and return their errors.
+
+        :param timeout: Maximum time in seconds to wait for each validation. Default is None, which waits.
+        :param raise_error: Raise the first error instead of returning the errors. Default is False.
+        :raises jsonschema.ValidationError: If ``raise_error`` is set and a response is not valid.
+        :raises concurrent.futures.TimeoutError: If a validation does not finish in time.
+        :return: The validation errors, in the order the validations were started.
+        """
+        with _validation_lock:
+            futures = list(_validation_futures)
+            del _validation_futures[:]
+
+        errors = []
+        for future in futures:
+            error = future.exception(timeout)
+            if error is None:
+                continue
+            if raise_error:
+                raise error
+            errors.append(error)
+        return errors
+
+    @staticmethod
+    def _check(schema_name: str, instance: Any, many: bool) -> None:
+        """Validate an instance and raise the most relevant error."""
+        error = best_match(Utils._validator(schema_name, many).iter_errors(instance))
+        if error is not None:
+            raise error
+
+    @staticmethod
+    def _run_validation(schema_name: str, instance: Any, many: bool) -> Optional[Future]:
+        """Validate now or in background, according to the configured validation mode."""
+        if not _validation["deferred"]:
+            Utils._check(schema_name, instance, many)
+            return None
+
+        def check():
+            try:
+                Utils._check(schema_name, instance, many)
+            except ValidationError as e:
+                logger.warning("Response does not match %s: %s", schema_name, e.message)
+                raise
+
+        global _validation_executor
+        with _validation_lock:
+            if _validation_executor is None:
+                _validation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lccs-validation")
+            # Finished validations without error need not be kept until the next flush.
+            _validation_futures[:] = [f for f in _validation_futures if not f.done() or f.exception() is not None]
+            future = _validation_executor.submit(check)
+            _validation_futures.append(future)
+        return future
+
+    @staticmethod
+    def validate(lccs_object, schema_name: Optional[str] = None) -> Optional[Future]:
+        """Validate a lccs object against its jsonschema.
+
+        :param lccs_object: The object to validate.
+        :param schema_name: The schema file. Default is the ``_schema`` of the object.
+        :raises jsonschema.ValidationError: If the object is not valid.
+        :return: The background validation, when it is deferred.
+        """
+        return Utils._run_validation(schema_name or lccs_object._schema, lccs_object, False)
+
+    @staticmethod
+    def validate_many(items: List[Any], schema_name: str) -> Optional[Future]:
+        """Validate all items of a response array against a jsonschema in one pass.
+
+        When a sample size is configured, only that many random items are validated.
+
+        :param items: The items to validate.
+        :param schema_name: The schema file of each item.
+        :raises jsonschema.ValidationError: If an item is not valid.
+        :return: The background validation, when it is deferred.
+        """
+        sample = _validation["sample"]
+        if sample is not None and sample < len(items):
+            items = random.sample(list(items), sample)
+        return Utils._run_validation(schema_name, list(items), True)
+
+    @staticmethod
+    def _require(module: str, extra: str):
+        """Import an optional dependency, or explain how to install it."""
+        try:
+            return importlib.import_module(module)
+        except ImportError:
+            raise ImportError(
+                f"The package '{module.split('.')[0]}' is required for this operation. "
+                f"Install it with: pip install lccs[{extra}]"
+            )
 
     @staticmethod
     def render_html(template_name, **kwargs):
-        """Render Jinja2 HTML template."""
+        """Render Jinja2 HTML template.
+
+        Templates are compiled on first use and kept by the environment.
+        """
         template = templateEnv.get_template(template_name)
         return template.render(**kwargs)
 
+    @staticmethod
+    def html_table(columns, items, row, page=0, page_size=50):
+        """Return the context of ``table.html`` for one page of items.
+
+        :param columns: The column titles.
+        :param items: The sequence of items to show.
+        :param row: Function returning the values of the columns of an item.
+        :param page: The page number, starting at 0.
+        :param page_size: The maximum number of rows of the page.
+        """
+        start = max(page, 0) * page_size
+        rows = [row(i) for i in items[start:start + page_size]]
+        return dict(columns=columns, rows=rows, total=len(items), start=start)
+
+    @staticmethod
+    def arrow_table(columns: Dict[str, list], types: Dict[str, str]):
+        """Return a ``pyarrow.Table`` from lists of values by column.
+
+        :param columns: The values of each column, in order.
+        :param types: The Arrow type alias of each column (``int64``, ``double`` or ``string``).
+        """
+        pa = Utils._require("pyarrow", "arrow")
+        return pa.table({
+            name: pa.array(values, type=pa.type_for_alias(types[name])) for name, values in columns.items()
+        })
+
+    @staticmethod
+    def data_frame(columns: Dict[str, list], types: Dict[str, str]):
+        """Return a ``pandas.DataFrame`` from lists of values by column, with nullable dtypes.
+
+        :param columns: The values of each column, in order.
+        :param types: The Arrow type alias of each column (``int64``, ``double`` or ``string``).
+        """
+        pd = Utils._require("pandas", "pandas")
+        dtypes = {"int64": "Int64", "double": "float64", "string": "string"}
+        return pd.DataFrame({
+            name: pd.array(values, dtype=dtypes[types[name]]) for name, values in columns.items()
+        })
+
     @staticmethod
     def get_id_by_name(name, classes):
-        """Get id of class."""
-        return list(filter(lambda x: x.name == name, classes))[0]["id"]
+        """Get id of class.
+
+        :param name: The class name.
+        :param classes: A ClassesGroup, or a list of classes or dicts.
+        :raises IndexError: If there is no class with the name.
+        """
+        if hasattr(classes, "get_class"):
+            try:
+                return classes.get_class(name, by="name")["id"]
+            except KeyError:
+                raise IndexError(f"Class not found: {name}")
+
+        for i in classes:
+            if i.get("name") == name:
+                return i["id"]
+        raise IndexError(f"Class not found: {name}")
@@ -10,9 +10,12 @@
 
 import json
 import os
+import pickle
 import re
+import sys
 from pathlib import Path
 
+import httpx
 import pytest
 import respx
 from httpx import Response
@@ -94,3 +97,751 @@ class TestLCCS:
         assert service.url == url
         assert repr(service) == f'lccs("{url}")'
         assert str(service) == f"<LCCS [{url}]>"
+
+    def test_create_sld(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+
+        rules = [
+            dict(rule_label="Floresta", fill_color="#00ff00", property_literal=2),
+            dict(rule_label="Hidrografia", fill_color="#0000ff", property_literal=3),
+        ]
+        sld = lccs.SldGenerator.create_sld(options={}, rules=rules, layer_name="prodes")
+
+        assert sld.startswith(b"<sld:StyledLayerDescriptor")
+        assert sld.count(b"<sld:Rule>") == 2
+        assert b"<ogc:Literal>3</ogc:Literal>" in sld
+        assert b'<sld:CssParameter name="fill">#0000ff</sld:CssParameter>' in sld
+        assert list(tmp_path.iterdir()) == []
+
+        like = lccs.SldGenerator.create_sld(options=dict(comparator="%"), rules=rules, layer_name="prodes",
+                                            validate=True)
+        assert b'<ogc:PropertyIsLike wildCard="*" singleChar="." escape="!">' in like
+
+        named = lccs.SldGenerator.create_sld(options={}, rules=rules, layer_name="prodes", userstyletitle="PRODES",
+                                             featuretypestylename="prodes-style", validate=True)
+        assert b"<sld:UserStyle><sld:Name>prodes-style</sld:Name><sld:Title>PRODES</sld:Title>" in named
+
+        with pytest.raises(ValueError):
+            lccs.SldGenerator.create_sld(options=dict(comparator="~"), rules=rules)
+        with pytest.raises(ValueError):
+            lccs.SldGenerator.validate(sld.replace(b"<sld:Name>prodes</sld:Name>", b""))
+
+    def test_compose_mappings(self):
+        graph = lccs.MappingGraph({"1": ["3"], "3": ["5"]}, {"prodes-1.0": "1"})
+        assert graph.path("prodes-1.0", "5") == ["1", "3", "5"]
+
+        with pytest.raises(KeyError):
+            graph.path("5", "1")
+
+        first = lccs.MappingGroup({"mappings": [
+            dict(source_class_id=1, target_class_id=10, degree_of_similarity=0.5),
+            dict(source_class_id=2, target_class_id=10, degree_of_similarity=1.0),
+        ]})
+        second = lccs.MappingGroup({"mappings": [
+            dict(source_class_id=10, target_class_id=100, degree_of_similarity=0.8),
+        ]})
+        composed = lccs.MappingGraph.compose([first, second])
+
+        result = {(i["source_class_id"], i["target_class_id"]): i["degree_of_similarity"] for i in composed["mappings"]}
+        assert result == {(1, 100): 0.4, (2, 100): 0.8}
+
+        with respx.mock:
+            systems = [dict(id=1, identifier="prodes-1.0"), dict(id=2, identifier="deter-1.0")]
+            respx.get(re.compile(url + r"/(\?|$)")).mock(
+                return_value=Response(200, json=dict(supported_language=[dict(language="pt-br")])))
+            respx.get(re.compile(url + r"/classification_systems(\?|$)")).mock(return_value=Response(200, json=systems))
+            respx.get(re.compile(url + r"/mappings/1(\?|$)")).mock(return_value=Response(200, json=[
+                dict(rel="child", href=url + "/mappings/1/2?language=pt-br")]))
+            not_found = respx.get(re.compile(url + r"/mappings/2(\?|$)")).mock(return_value=Response(404, json={}))
+            service = lccs.LCCS(url, validate=False)
+            assert service.mapping_graph().edges == {"1": ["2"], "2": []}
+
+            not_found.mock(return_value=Response(500, json={}))
+            with pytest.raises(httpx.HTTPStatusError):
+                service.mapping_graph(refresh=True)
+
+    def test_sync_plan(self):
+        server = [
+            dict(id=1, name="floresta", title="Floresta"),
+            dict(id=2, name="desmatamento", title="Desmatamento", class_parent_id=1),
+            dict(id=3, name="nuvem", title="Nuvem"),
+        ]
+        local = dict(
+            classes=[
+                dict(name="floresta", title="Floresta"),
+                dict(name="desmatamento", title="Desmatamento 2020", class_parent_name="floresta"),
+                dict(name="secundaria", title="Vegetação Secundária", class_parent_name="regeneracao"),
+                dict(name="regeneracao", title="Regeneração"),
+            ],
+            styles={"QML": "prodes.qml"},
+        )
+        plan = lccs.SyncPlan.compute(local, server, server_styles=["QML", "SLD"])
+
+        assert [i["name"] for i in plan.classes["changed"]] == ["desmatamento"]
+        assert plan.classes["changed"][0]["id"] == 2
+        assert [i["name"] for i in plan.classes["removed"]] == ["nuvem"]
+        assert plan.styles == dict(added=[], changed=[], removed=["SLD"])
+        assert [[i["name"] for i in wave] for wave in lccs.SyncPlan.waves(plan.classes["added"])] == [
+            ["regeneracao"], ["secundaria"]
+        ]
+        assert plan.requests == 5
+
+        plan = lccs.SyncPlan.compute(local, [])
+        plan["system"] = "added"
+        assert len(plan.classes["added"]) == 4 and plan.requests == 2
+
+        removed = server + [dict(id=4, name="corte", class_parent_id=2)]
+        assert [[i["id"] for i in wave] for wave in lccs.SyncPlan.removal_waves(removed)] == [[3, 4], [2], [1]]
+
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=1, classes=20) as emulator:
+            service = lccs.LCCS(emulator.url)
+            local = dict(classes=[dict(name="class-1-0", title="Class 0")])
+            plan = service.sync_classification_system(local, system="system-1-1.0")
+            assert plan["applied"] and len(plan.classes["removed"]) == 19
+            assert [i["name"] for i in service.classification_system("system-1-1.0").classes()] == ["class-1-0"]
+
+        with respx.mock:
+            respx.get(re.compile(url + r"/(\?|$)")).mock(
+                return_value=Response(200, json=dict(supported_language=[dict(language="pt-br")])))
+            respx.get(re.compile(url + r"/classification_systems/prodes-1.0(\?|$)")).mock(
+                return_value=Response(500, json=dict(code=500, description="Internal error")))
+            created = respx.post(re.compile(url + "/")).mock(return_value=Response(201, json={}))
+            service = lccs.LCCS(url)
+            with pytest.raises(httpx.HTTPStatusError):
+                service.sync_classification_system(dict(classes=[dict(name="floresta")]), system="prodes-1.0")
+            assert not created.called
+
+    def test_similarity_matrix(self):
+        np = pytest.importorskip("numpy")
+
+        group = lccs.MappingGroup({"mappings": [
+            dict(source_class_id=3, target_class_id=20, degree_of_similarity=0.5),
+            dict(source_class_id=1, target_class_id=10, degree_of_similarity=1.0),
+            dict(source_class_id=1, target_class_id=30, degree_of_similarity=None),
+            dict(source_class_id=9, target_class_id=10, degree_of_similarity=0.7),
+        ]})
+
+        matrix = group.similarity_matrix()
+        assert matrix.source_ids.tolist() == [1, 3, 9] and matrix.target_ids.tolist() == [10, 20, 30]
+        assert matrix.indptr.tolist() == [0, 2, 3, 4]
+        assert matrix.toarray().tolist() == [[1.0, 0.0, 0.0], [0.0, 0.5, 0.0], [0.7, 0.0, 0.0]]
+
+        matrix = group.similarity_matrix(source_ids=[3, 1], target_ids=[20, 10])
+        assert matrix.shape == (2, 2)
+        assert matrix.toarray().tolist() == [[0.5, 0.0], [0.0, 1.0]]
+
+        empty = group.similarity_matrix(source_ids=[], target_ids=[])
+        assert empty.shape == (0, 0) and empty.indptr.tolist() == [0]
+        assert np.array_equal(lccs.MappingGroup({"mappings": []}).similarity_matrix().toarray(), np.zeros((0, 0)))
+
+    def test_columns(self):
+        classes = lccs.classes.ClassesGroup({"classes": [
+            dict(id=1, name="floresta", title="Floresta"),
+            dict(id=2, name="desmatamento", title="Desmatamento", class_parent_id=1),
+        ]})
+        columns = classes.columns()
+        assert columns["id"] == [1, 2]
+        assert columns["class_parent_name"] == [None, "floresta"]
+
+        pa = pytest.importorskip("pyarrow")
+        table = classes.to_arrow()
+        assert table.num_rows == 2
+        assert table.schema.field("class_parent_id").type == pa.int64()
+
+    def test_export_parquet(self, tmp_path, monkeypatch):
+        parquet = pytest.importorskip("pyarrow.parquet")
+
+        from lccs.emulator import LCCSEmulator
+
+        def fail(*args, **kwargs):
+            raise AssertionError("A row object was created")
+
+        with LCCSEmulator(systems=3, classes=10) as emulator:
+            service = lccs.LCCS(emulator.url)
+            monkeypatch.setattr(lccs.classes.ClassificationSystemClass, "__init__", fail)
+            monkeypatch.setattr(lccs.mappings.Mapping, "__init__", fail)
+            files = service.export_parquet(str(tmp_path / "catalog"), systems=["system-1-1.0", "system-2-1.0"])
+
+        classes = parquet.read_table(files["classes"])
+        assert classes.num_rows == 20
+        assert set(classes.column("system").to_pylist()) == {"system-1-1.0", "system-2-1.0"}
+        assert classes.column("class_parent_name").to_pylist()[:3] == [None, "class-1-0", "class-1-0"]
+
+        mappings = parquet.read_table(files["mappings"])
+        pairs = set(zip(mappings.column("source_system").to_pylist(), mappings.column("target_system").to_pylist()))
+        assert pairs == {("system-1-1.0", "system-2-1.0"), ("system-1-1.0", "system-3-1.0"),
+                         ("system-2-1.0", "system-3-1.0"), ("system-2-1.0", "system-1-1.0")}
+        assert mappings.num_rows == 40
+
+    def test_emulator(self, tmp_path):
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=3, classes=20) as emulator:
+            service = lccs.LCCS(emulator.url)
+
+            assert [i["identifier"] for i in service.classification_systems] == [
+                "system-1-1.0", "system-2-1.0", "system-3-1.0"
+            ]
+            group = service.classification_system("system-1-1.0").classes_group()
+            assert len(group.classes) == 20
+            assert group.get_class("class-1-5")["class_parent_id"] == group.get_class("class-1-1")["id"]
+            emulator.reset_stats()
+            assert group.get_class("class-1-5").class_parent_name == "class-1-1"
+            assert emulator.stats["requests"] == 0
+            assert len(service.mappings("system-1-1.0", "system-2-1.0")["mappings"]) == 20
+            assert os.path.exists(service.get_style("system-1-1.0", "QML", path=str(tmp_path)))
+
+            local = dict(classes=[dict(name=i["name"], title=i["title"]) for i in group.classes[:10]])
+            local["classes"][0]["title"] = "Floresta"
+            plan = service.sync_classification_system(local, system="system-1-1.0")
+            assert len(plan.classes["changed"]) == 1 and len(plan.classes["removed"]) == 10
+            assert service.sync_classification_system(local, system="system-1-1.0", dry_run=True).empty
+            assert emulator.stats["DELETE"] == 10
+
+            service = lccs.LCCS(emulator.url)
+            report = service.prefetch()
+            assert report["stages"]["mappings"]["count"] == 6 and not report["errors"]
+            emulator.reset_stats()
+            service.classification_system("system-2-1.0").classes_group()
+            service.mappings("system-2-1.0", "system-3-1.0")
+            assert emulator.stats["requests"] == 0
+
+        with LCCSEmulator(systems=1, error_rate=1.0) as emulator:
+            with pytest.raises(Exception):
+                lccs.LCCS(emulator.url)
+
+    def test_method_caches(self):
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=140, classes=2, mappings=1, styles=1) as emulator:
+            service = lccs.LCCS(emulator.url, language="en")
+            report = service.prefetch(include=["classes", "styles"])
+            assert report["stages"]["classes"]["count"] == 140 and not report["errors"]
+            emulator.reset_stats()
+            service.classification_system("system-1-1.0")
+            service.style_formats("system-1-1.0")
+            assert emulator.stats["requests"] == 0
+
+            other = lccs.LCCS(emulator.url, language="en")
+            emulator.reset_stats()
+            other.classification_system("system-1-1.0")
+            assert emulator.stats["requests"] == 1
+            assert len(other._caches["classification_system"]) == 1
+
+    def test_snapshot(self, tmp_path):
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=2, classes=10) as emulator:
+            service = lccs.LCCS(emulator.url, language="en", access_token="secret")
+            group = service.classification_system("system-1-1.0").classes_group()
+            path = service.save_snapshot(str(tmp_path / "lccs.snapshot"))
+            with open(path, "rb") as file:
+                assert b"secret" not in file.read()
+
+            emulator.reset_stats()
+            restored = pickle.loads(pickle.dumps(service))
+            assert restored.url == service.url and restored.allowed_language == ["pt-br", "en"]
+            assert restored._access_token == ""
+
+            warm = lccs.LCCS.load_snapshot(path, access_token="secret")
+            assert warm._access_token == "secret"
+            copy = warm.classification_system("system-1-1.0").classes_group()
+            assert copy == group and copy.get_class("class-1-3") == group.get_class("class-1-3")
+            assert emulator.stats["requests"] == 0
+
+    def test_get_class(self):
+        group = lccs.classes.ClassesGroup({"classes": [
+            dict(id=3, name="floresta", code="1"),
+            dict(id=7, name="agua", code="3"),
+        ]})
+        assert group.get_class(3)["name"] == "floresta"
+        assert group.get_class("3")["name"] == "agua"
+        assert group.get_class("3", by="id")["name"] == "floresta"
+        assert group.get_class("agua")["id"] == 7
+        assert group.get_classes([7, "1", "missing"], default=False) == [group.classes[1], group.classes[0], False]
+        assert not group.has_class("7") and group.has_class("7", by="id")
+        with pytest.raises(KeyError):
+            group.get_class(5)
+        with pytest.raises(ValueError):
+            group.get_class("1", by="title")
+
+        group["classes"] = [dict(id=9, name="nuvem", code="3")]
+        assert [i["name"] for i in group.classes] == ["nuvem"]
+        assert group.get_class("3")["id"] == 9 and not group.has_class(7)
+
+        group["classes"].append(dict(id=11, name="sombra"))
+        group.invalidate()
+        assert group.get_class("sombra")["id"] == 11
+
+        copy = pickle.loads(pickle.dumps(group))
+        assert copy == group and copy.get_class(11)["name"] == "sombra"
+
+    def test_search_index(self):
+        from lccs.emulator import LCCSEmulator
+
+        index = lccs.ClassSearchIndex()
+        index.add_system("prodes-1.0", [
+            lccs.classes.ClassificationSystemClass(dict(id=1, name="savana", title="Savâna", code="S1",
+                                                        description="Vegetação aberta")),
+            lccs.classes.ClassificationSystemClass(dict(id=2, name="floresta", title="Floresta Densa", code="F1",
+                                                        description="Floresta com savana próxima")),
+        ])
+        index.add_system("deter-1.0", [
+            lccs.classes.ClassificationSystemClass(dict(id=1, name="desmatamento", title="Desmatamento", code="D")),
+        ])
+        assert len(index) == 3
+
+        results = index.search("SAVANA")
+        assert [i.class_["id"] for i in results] == [1, 2] and results[0].score > results[1].score
+        assert [i.class_["name"] for i in index.search("flor dens")] == ["floresta"]
+        assert [i.class_["name"] for i in index.search("desmatamneto")] == ["desmatamento"]
+        assert index.search("desmatamneto", fuzzy=False) == []
+        assert index.search("floresta", systems=["deter-1.0"]) == []
+
+        index.add_system("prodes-1.0", [])
+        assert len(index) == 1 and index.search("savana") == []
+
+        with LCCSEmulator(systems=2, classes=5) as emulator:
+            service = lccs.LCCS(emulator.url)
+            index = service.search_index()
+            assert len(index) == 20
+            assert {i.language for i in index.search("class", limit=20)} == {"pt-br", "en"}
+            assert index.search("class 3 en", language="en")[0].class_["title"] == "Class 3 (en)"
+
+    def test_languages(self, monkeypatch):
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=2, classes=3) as emulator:
+            service = lccs.LCCS(emulator.url)
+
+            systems = service.classification_systems_languages()
+            assert [i["identifier"] for i in systems] == ["system-1-1.0", "system-2-1.0"]
+            assert systems[0]["titles"] == {"pt-br": "System 1", "en": "System 1 (en)"}
+            assert set(systems[0]["descriptions"]) == {"pt-br", "en"}
+
+            emulator.reset_stats()
+            group = service.classes_languages("system-1-1.0", languages=["en"])
+            assert isinstance(group, lccs.classes.ClassesGroup) and len(group.classes) == 3
+            assert group.get_class("class-1-2")["titles"] == {"en": "Class 2 (en)"}
+
+            group = service.classes_languages("system-1-1.0")
+            assert group.get_class("class-1-2")["titles"] == {"pt-br": "Class 2", "en": "Class 2 (en)"}
+            assert group.get_class("class-1-2")["title"] == "Class 2"
+            assert emulator.stats["GET"] == 3
+
+            requests = []
+            dispatch = emulator._dispatch
+            monkeypatch.setattr(emulator, "_dispatch", lambda request: requests.append(request) or dispatch(request))
+            service.mappings("system-1-1.0", "system-2-1.0")
+            service.style_formats("system-1-1.0")
+            assert requests and all("language" not in i.url.params for i in requests)
+
+            requests.clear()
+            english = lccs.LCCS(emulator.url, language="en")
+            english.mappings("system-1-1.0", "system-2-1.0")
+            english.style_formats("system-1-1.0")
+            english.available_style_formats()
+            assert [i.url.params.get("language") for i in requests[1:]] == ["en"] * (len(requests) - 1)
+
+    def test_validation(self, lccs_object):
+        from jsonschema import ValidationError
+
+        links = lccs_object["jsons"]["classes.json"]
+        assert len(lccs.classes.ClassesGroup({"classes": links}, validate=True)) == 1
+        lccs.classes.ClassesGroup({"classes": [dict(id=1, name="agua", links=links[:1])]}, validate=True)
+        with pytest.raises(ValidationError):
+            lccs.classes.ClassesGroup({"classes": [dict(id="1", name="agua")]}, validate=True)
+        with pytest.raises(ValidationError):
+            lccs.classes.ClassificationSystemClass(links[0], validate=True)
+
+        try:
+            lccs.utils.Utils.configure_validation(sample=0)
+            assert lccs.utils.Utils.validate_many([dict(id=1)], "class.json") is None
+
+            lccs.utils.Utils.configure_validation(deferred=True)
+            assert lccs.classes.ClassesGroup({"classes": [dict(name="agua")]}, validate=True) is not None
+            lccs.MappingGroup({"mappings": []}, validate=True)
+            errors = lccs.utils.Utils.flush_validation(timeout=10)
+            assert len(errors) == 1 and isinstance(errors[0], ValidationError)
+            assert lccs.utils.Utils.flush_validation(timeout=10) == []
+
+            lccs.utils.Utils.validate_many([dict(id=1)], "class.json")
+            with pytest.raises(ValidationError):
+                lccs.utils.Utils.flush_validation(timeout=10, raise_error=True)
+        finally:
+            lccs.utils.Utils.configure_validation()
+
+        with respx.mock:
+            respx.get(re.compile(url + r"/(\?|$)")).mock(
+                return_value=Response(200, json=dict(supported_language=[dict(language="pt-br")])))
+            respx.get(re.compile(url + r"/classification_systems/prodes-1.0(\?|$)")).mock(
+                return_value=Response(200, json=dict(id="1", name="prodes")))
+            service = lccs.LCCS(url, validate=True)
+            with pytest.raises(ValidationError):
+                service.classification_system("prodes-1.0")
+
+    def test_json_backend(self, monkeypatch, caplog):
+        import subprocess
+        import sys
+
+        from lccs.utils import _select_json_backend
+
+        monkeypatch.setenv("LCCS_JSON_BACKEND", "json")
+        name, loads, dumps = _select_json_backend()
+        assert name == "json" and loads(dumps({"título": [1]})) == {"título": [1]}
+
+        monkeypatch.setenv("LCCS_JSON_BACKEND", "simdjson")
+        assert _select_json_backend()[0] == "json"
+        assert "simdjson" in caplog.text
+        with pytest.raises(ImportError):
+            _select_json_backend("simdjson")
+
+        result = subprocess.run([sys.executable, "-c", "import lccs; print(lccs.utils.json_backend)"],
+                                capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == "json" and "simdjson" in result.stderr
+
+    def test_html_page(self):
+        from lccs.emulator import LCCSEmulator
+
+        group = lccs.classes.ClassesGroup({"classes": [
+            dict(id=i, name=f"class-{i}", title=f"Class {i}", class_parent_id=1 if i > 1 else None)
+            for i in range(1, 121)
+        ] + [dict(id=121, name="<b>bold</b>", title=None)]})
+        first = group.html_page()
+        assert first.count("<tr>") == 51 and "Rows 1 to 50 of 121" in first
+        assert "<td>class-1</td>" in first and "<td>None</td>" not in first
+        last = group.html_page(2, page_size=50)
+        assert last.count("<tr>") == 22 and "Rows 101 to 121 of 121" in last
+        assert "&lt;b&gt;bold&lt;/b&gt;" in last and "<b>bold</b>" not in last
+        assert "Rows" not in group.html_page(0, page_size=200)
+        assert group._repr_html_() == first
+
+        mappings = lccs.MappingGroup({"mappings": [
+            dict(source_class_id=i, target_class_id=i + 100, degree_of_similarity=1.0) for i in range(60)
+        ]})
+        assert mappings.html_page(1).count("<tr>") == 11 and "Rows 51 to 60 of 60" in mappings.html_page(1)
+        named = mappings.html_page(0, page_size=2, source_classes=group)
+        assert "<td>class-1</td>" in named and "class-101" not in named
+
+        # Templates that are not tables keep their markup and whitespace.
+        assert lccs.utils.templateEnv.autoescape is False and not lccs.utils.templateEnv.trim_blocks
+
+        with LCCSEmulator(systems=1, classes=3) as emulator:
+            service = lccs.LCCS(emulator.url)
+            system = service.classification_system("system-1-1.0")
+            emulator.reset_stats()
+            assert "Classes not loaded" in system._repr_html_()
+            assert "not loaded" in service._repr_html_()
+            assert emulator.stats["requests"] == 0
+
+            system.classes_group()
+            assert "class-1-2" in system._repr_html_()
+
+    def test_memoized_properties(self):
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=2, classes=5) as emulator:
+            service = lccs.LCCS(emulator.url)
+            group = service.mappings("system-1-1.0", "system-2-1.0")
+            system = service.classification_system("system-1-1.0")
+
+            mappings = group.mappings
+            links = system.links
+            emulator.reset_stats()
+
+            assert group.mappings is mappings and all(a is b for a, b in zip(group.mappings, mappings))
+            assert system.links is links
+            str(group), repr(group)
+            assert emulator.stats["requests"] == 0
+
+            system["links"] = system["links"][:1]
+            assert len(system.links) == 1
+            group.update(mappings=[])
+            assert group.mappings == []
+
+    def test_palette(self):
+        np = pytest.importorskip("numpy")
+
+        group = lccs.classes.ClassesGroup({"classes": [
+            dict(id=1, name="floresta", color="#00ff00"),
+            dict(id=3, name="agua", color="#0000ff80"),
+        ]})
+        assert group.palette().tolist() == [[0, 0, 0, 0], [0, 255, 0, 255], [0, 0, 0, 0], [0, 0, 255, 128]]
+
+        rgba = group.apply_palette(np.array([[1, 3], [7, -1]], dtype=np.int32), tile_rows=1, fallback=(9, 9, 9, 9))
+        assert rgba.shape == (2, 2, 4)
+        assert rgba[0].tolist() == [[0, 255, 0, 255], [0, 0, 255, 128]]
+        assert rgba[1].tolist() == [[9, 9, 9, 9], [9, 9, 9, 9]]
+
+    def test_reclassify(self):
+        np = pytest.importorskip("numpy")
+
+        source = lccs.classes.ClassesGroup({"classes": [dict(id=1, name="floresta"), dict(id=2, name="agua")]})
+        target = lccs.classes.ClassesGroup({"classes": [dict(id=10, name="forest"), dict(id=20, name="water")]})
+        group = lccs.mappings.MappingGroup({"mappings": [
+            dict(source_class_id=1, target_class_id=20, degree_of_similarity=0.2),
+            dict(source_class_id=1, target_class_id=10, degree_of_similarity=0.9),
+        ]})
+
+        assert group.lookup_table() == {1: 10}
+        assert group.reclassify(np.array([1, 2, 1]), fill_value=0).tolist() == [10, 0, 10]
+        assert group.reclassify(np.array([1, 2]), unmapped="keep").tolist() == [10, 2]
+        assert group.reclassify(np.array([-100, 1, 100], dtype=np.int8), unmapped="keep").tolist() == [-100, 10, 100]
+        assert group.reclassify(["floresta", "agua", None], by="name", to="name",
+                                source_classes=source, target_classes=target).tolist() == ["forest", None, None]
+
+        pd = pytest.importorskip("pandas")
+        series = group.reclassify(pd.Series([1, 2], index=[5, 6], name="class"), fill_value=0)
+        assert series.tolist() == [10, 0] and series.index.tolist() == [5, 6] and series.name == "class"
+        index = group.reclassify(pd.Index([2, 1], name="class"), fill_value=0)
+        assert index.tolist() == [0, 10] and index.name == "class"
+        assert group.reclassify(pd.Categorical([1, 1, 2]), fill_value=0).tolist() == [10, 10, 0]
+
+        with pytest.raises(KeyError):
+            group.reclassify([1, 2], unmapped="raise")
+        with pytest.raises(ValueError):
+            group.reclassify(["floresta"], by="name")
+
+    def test_mapping_coverage(self):
+        pytest.importorskip("numpy")
+
+        group = lccs.mappings.MappingGroup({"mappings": [
+            dict(source_class_id=1, target_class_id=10, degree_of_similarity=0.5),
+            dict(source_class_id=1, target_class_id=10, degree_of_similarity=0.5),
+            dict(source_class_id=1, target_class_id=20),
+            dict(source_class_id=9, target_class_id=20, degree_of_similarity=1.0),
+        ]})
+        source = lccs.classes.ClassesGroup({"classes": [dict(id=1), dict(id=2)]})
+        target = lccs.classes.ClassesGroup({"classes": [dict(id=10), dict(id=20)]})
+
+        coverage = group.coverage(source, target)
+        assert coverage.source["unmapped"] == [2]
+        assert coverage.source["dangling"] == [9]
+        assert coverage.target["unmapped"] == []
+        assert coverage.duplicates == [[1, 10, 2]]
+        assert coverage.source["fan_out"]["max"] == 2
+        assert coverage["many_to_many"] == 1
+        assert coverage["similarity"]["missing"] == 1
+        assert not coverage.ok
+
+        from lccs.emulator import LCCSEmulator
+
+        with LCCSEmulator(systems=2, classes=10) as emulator:
+            lccs.LCCS(emulator.url).delete_class("system-1-1.0", "class-1-5")
+            args = ["--url", emulator.url, "mapping-coverage", "--system-source", "system-1-1.0",
+                    "--system-target", "system-2-1.0", "--strict"]
+            assert lccs.cli.cli.main(args=args, standalone_mode=False) == 1
+
+    def test_agreement(self, tmp_path):
+        np = pytest.importorskip("numpy")
+
+        group = lccs.mappings.MappingGroup({"mappings": [
+            dict(source_class_id=1, target_class_id=10),
+            dict(source_class_id=2, target_class_id=10),
+            dict(source_class_id=3, target_class_id=20),
+        ]})
+        source = np.array([[1, 2, 3], [3, 7, 0]], dtype=np.uint8)
+        target = np.array([[10, 20, 20], [10, 10, 10]], dtype=np.int32)
+
+        agreement = group.agreement(source, target, nodata=0, pixel_area=900.0, tile_rows=1)
+        assert agreement.labels == [10, 20]
+        assert agreement.matrix.tolist() == [[1, 1, 0], [1, 1, 0], [1, 0, 0]]
+        assert agreement.total == 5
+        assert agreement.overall == pytest.approx(0.4)
+        assert agreement.per_class()[0]["source_area"] == 1800.0
+
+        assert (agreement + agreement).matrix.sum() == 10
+        with pytest.raises(ValueError):
+            group.agreement(source, target[:1])
+
+        rows = np.tile(source, (50, 1))
+        serial = group.agreement(rows, np.tile(target, (50, 1)), tile_rows=8)
+        parallel = group.agreement(rows, np.tile(target, (50, 1)), tile_rows=8, processes=2)
+        assert parallel.matrix.tolist() == serial.matrix.tolist()
+        assert lccs.agreement._open(rows, 8, 16).shape == (8, 3)
+
+        mapped = np.memmap(tmp_path / "source.bin", dtype=np.uint8, mode="w+", shape=rows.shape)
+        mapped[:] = rows
+        mapped.flush()
+        parallel = group.agreement(mapped, np.tile(target, (50, 1)), tile_rows=8, processes=2)
+        assert parallel.matrix.tolist() == serial.matrix.tolist()
+        assert lccs.agreement._open(mapped, 8, 16)["start"] == 8
+
+    def test_local_server(self, tmp_path, monkeypatch):
+        import stat
+        import threading
+
+        import click
+
+        from lccs.local_server import LocalServer
+
+        @click.group()
+        def group():
+            pass
+
+        @group.command()
+        @click.option("--output")
+        def write(output):
+            Path(output).write_text("ok")
+            click.echo(os.path.abspath(output))
+
+        @group.command()
+        @click.pass_context
+        def fail(ctx):
+            ctx.exit(3)
+
+        @group.command()
+        def leave():
+            sys.exit(2)
+
+        socket_path = str(tmp_path / "lccs.sock")
+        server = LocalServer(socket_path, group, lccs.cli.Config())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            assert stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077 == 0
+            assert LocalServer.is_running(socket_path)
+
+            caller = tmp_path / "caller"
+            caller.mkdir()
+            monkeypatch.chdir(caller)
+            reply = LocalServer.forward(["write", "--output", "out.txt"], socket_path)
+            assert reply["exit_code"] == 0
+            assert (caller / "out.txt").read_text() == "ok"
+            assert reply["stdout"].strip() == str(caller / "out.txt")
+
+            assert LocalServer.forward(["fail"], socket_path, timeout=5)["exit_code"] == 3
+            assert LocalServer.forward(["leave"], socket_path, timeout=5)["exit_code"] == 2
+            assert LocalServer.forward(["write", "--output", "again.txt"], socket_path, timeout=5)["exit_code"] == 0
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert LocalServer.forward(["write"], socket_path) is None
+
+    def test_local_forward(self, monkeypatch):
+        from click.testing import CliRunner
+
+        forwarded = []
+
+        def forward(args, socket_path):
+            forwarded.append(args)
+            return dict(stdout="out\n", stderr="", exit_code=4)
+
+        monkeypatch.setattr(lccs.cli.LocalServer, "forward", staticmethod(forward))
+        args = ["--local", "--url", "http://lccs.test", "mapping-coverage", "--system-source", "a-1",
+                "--system-target", "b-1", "--strict"]
+        result = CliRunner().invoke(lccs.cli.cli, args)
+        assert forwarded == [args]
+        assert result.exit_code == 4 and result.output == "out\n"
+
+    def test_client_pool(self):
+        import httpx
+
+        client = lccs.utils.Utils._client()
+        assert lccs.utils.Utils._client() is client
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=dict(supported_language=[])))
+        lccs.utils.Utils.configure_client(transport=transport)
+        try:
+            assert lccs.utils.Utils._client() is not client
+            assert lccs.utils.Utils._get(url + "/") == dict(supported_language=[])
+        finally:
+            lccs.utils.Utils.configure_client()
+        assert lccs.utils.Utils._client() is not None
+
+    def test_raster_sld(self, caplog):
+        from lxml import etree
+
+        from lccs.emulator import LCCSEmulator
+
+        classes = lccs.classes.ClassesGroup({"classes": [
+            dict(id=5, name="agua", title="Água", code="3", color="#0000ff"),
+            dict(id=1, name="floresta", title="Floresta", code="1", color="#00ff00"),
+            dict(id=2, name="nuvem", title="Nuvem", code="A1", color="#ffffff"),
+            dict(id=3, name="outros", title="Outros", code="9"),
+        ]})
+
+        sld = lccs.SldGenerator.create_raster_sld(classes, validate=True)
+        entries = etree.fromstring(sld).findall(".//{http://www.opengis.net/sld}ColorMapEntry")
+        assert [(e.get("quantity"), e.get("label")) for e in entries] == [("1", "Floresta"), ("2", "Nuvem"),
+                                                                          ("5", "Água")]
+
+        sld = lccs.SldGenerator.create_raster_sld(classes, options=dict(quantity="code"), validate=True)
+        entries = etree.fromstring(sld).findall(".//{http://www.opengis.net/sld}ColorMapEntry")
+        assert [e.get("quantity") for e in entries] == ["1", "3"]
+        assert "nuvem" in caplog.text
+
+        with LCCSEmulator(systems=1, classes=5) as emulator:
+            service = lccs.LCCS(emulator.url)
+            assert isinstance(service.classification_system("system-1-1.0").classes(), list)
+            emulator.reset_stats()
+            service.create_raster_style("system-1-1.0", "SLD-Raster")
+            assert emulator.stats["POST"] == 1
+
+    def test_style_exporters(self, tmp_path, caplog):
+        from lxml import etree
+
+        exporter = lccs.StyleExporter
+        classes = lccs.classes.ClassesGroup({"classes": [
+            dict(id=70000, name="agua", title="Água", code="3", color="#0000ff80"),
+            dict(id=2, name="floresta", title="Floresta", code="1", color="#00ff00"),
+            dict(id=4, name="nuvem", title="Nuvem", code="2", color="blue"),
+            dict(id=5, name="outros", title="Outros", code="9"),
+        ]})
+        assert [value for value, _, _ in lccs.style_exporters.color_entries(classes)] == [2, 70000]
+        assert "nuvem" in caplog.text
+
+        entries = etree.fromstring(exporter.to_qml(classes).encode()).findall(".//paletteEntry")
+        assert [(e.get("value"), e.get("color"), e.get("alpha")) for e in entries] == [
+            ("2", "#00ff00", "255"), ("70000", "#0000ff", "128")]
+
+        assert exporter.mapbox_expression(classes) == ["match", ["get", "class_id"], 2, "#00ff00", 70000,
+                                                       "#0000ff80", "rgba(0, 0, 0, 0)"]
+        assert exporter.to_gdal_clr(classes) == "2 0 255 0 255\n70000 0 0 255 128\n"
+
+        pam = etree.fromstring(exporter.to_raster_attribute_table(classes).encode())
+        assert pam.find(".//ColorTable") is None
+        rows = [[f.text for f in row.findall("F")] for row in pam.iter("Row")]
+        assert rows == [["2", "Floresta", "1", "floresta", "0", "255", "0", "255"],
+                        ["70000", "Água", "3", "agua", "0", "0", "255", "128"]]
+
+        with pytest.raises(ValueError):
+            exporter.to_vrt_color_table(classes)
+        vrt = exporter.to_vrt_color_table(classes.classes[1:])
+        assert vrt.count("<Entry") == 3
+
+        files = exporter.export(classes, path=str(tmp_path), name="system")
+        assert set(files) == {"qml", "mapbox", "clr", "rat"}
+        assert all(os.path.exists(path) for path in files.values())
+        with pytest.raises(ValueError):
+            exporter.export(classes, path=str(tmp_path), name="system", formats=["vrt"])
+
+    def test_get_style(self, tmp_path, monkeypatch):
+        from lccs.emulator import LCCSEmulator
+
+        monkeypatch.setenv("LCCS_CACHE_DIR", str(tmp_path / "cache"))
+        output = tmp_path / "output"
+        output.mkdir()
+
+        with LCCSEmulator(systems=2, classes=5) as emulator:
+            service = lccs.LCCS(emulator.url)
+            file_path = service.get_style("system-1-1.0", "QML", path=str(output))
+            assert os.path.dirname(file_path) == str(output)
+            assert os.listdir(output) == [os.path.basename(file_path)]
+            assert len(os.listdir(tmp_path / "cache" / "downloads")) == 1
+
+            emulator.reset_stats()
+            assert service.get_style("system-1-1.0", "QML", path=str(output)) == file_path
+            assert emulator.stats["bytes"] == 0
+
+            paths = service.get_styles([("system-1-1.0", "QML"), ("system-2-1.0", "QML")], path=str(output))
+            assert len(set(paths.values())) == 2
+
+            with pytest.raises(FileNotFoundError):
+                service.get_style("system-1-1.0", "QML", path=str(tmp_path / "missing"))
+            with pytest.raises(ValueError):
+                service.get_style("system-2-1.0", "QML", path=str(tmp_path), checksum="sha256:00")
+            assert not [i for i in os.listdir(tmp_path) if i.endswith(".part")]